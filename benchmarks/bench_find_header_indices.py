@@ -0,0 +1,99 @@
+# benchmarks/bench_find_header_indices.py
+# Compara el tiempo por sección de _find_header_indices (índice precompilado)
+# contra la implementación anterior (un apply por cada cabecera candidata).
+#
+# Uso (desde la raíz del proyecto):
+#   python -m benchmarks.bench_find_header_indices [n_secciones]
+
+import sys
+import time
+import random
+import pandas as pd
+from src import extract
+from benchmarks.generator import generate_sheet_rows
+from benchmarks.generator import (
+    COLUMNAS_CANTIDAD_BRUTA, CABECERA_FECHA,
+    COLUMNAS_TARIFA_BRUTA, COLUMNAS_TOTAL_BRUTA,
+    COLUMNAS_OBSERVACIONES_BRUTAS
+)
+from src.rules import ROL_FECHA
+
+# ==============================================================================
+# 1. IMPLEMENTACIÓN DE REFERENCIA (ANTERIOR)
+# ==============================================================================
+
+def _legacy_find_header_indices(sheet, section_row_start, max_rows=10):
+    """Versión anterior: re-normaliza la fila completa por cada cabecera candidata."""
+    normalize = extract._normalize_header_name
+    header_row_index = -1
+    for i in range(section_row_start, section_row_start + max_rows):
+        if i >= len(sheet): break
+        row = sheet.iloc[i]
+        if row.apply(lambda x: normalize(x) == normalize(CABECERA_FECHA)).any():
+            header_row_index = i
+            break
+
+    if header_row_index == -1: return {}, section_row_start
+
+    header_row = sheet.iloc[header_row_index]
+    header_indices = {}
+
+    fecha_index = header_row[header_row.apply(lambda x: normalize(x) == normalize(CABECERA_FECHA))].index
+    if not fecha_index.empty:
+        header_indices[ROL_FECHA] = fecha_index[0]
+
+    quantity_indices = {}
+    for original_header, normalized_name in COLUMNAS_CANTIDAD_BRUTA.items():
+        q_idx = header_row[header_row.apply(lambda x: normalize(x) == normalize(original_header))].index
+        if not q_idx.empty:
+            quantity_indices[normalized_name] = q_idx[0]
+    header_indices['QUANTITIES'] = quantity_indices
+
+    for h_map, brutos in [("TARIFA", COLUMNAS_TARIFA_BRUTA), ("TOTAL", COLUMNAS_TOTAL_BRUTA)]:
+        for original_header in brutos:
+            idx = header_row[header_row.apply(lambda x: normalize(x) == normalize(original_header))].index
+            if not idx.empty:
+                header_indices[h_map] = idx[0]
+                break
+
+    obs_map = {}
+    for obs_header in COLUMNAS_OBSERVACIONES_BRUTAS:
+        idx = header_row[header_row.apply(lambda x: normalize(x) == normalize(obs_header))].index
+        if not idx.empty:
+            obs_map[obs_header] = idx[0]
+    header_indices['OBSERVACIONES_MAP'] = obs_map
+
+    return header_indices, header_row_index + 1
+
+# ==============================================================================
+# 2. HOJA SINTÉTICA CON MUCHAS SECCIONES
+# ==============================================================================
+
+def _build_sheet(n_sections, rows_per_section=5, seed=7):
+    """Hoja sintética (como DataFrame sin cabecera) con n_sections secciones VTA (benchmarks/generator.py)."""
+    rows, starts = generate_sheet_rows(random.Random(seed), n_sections, rows_per_section)
+    return pd.DataFrame(rows), starts
+
+def _time_per_section(func, sheet, starts):
+    t0 = time.perf_counter()
+    results = [func(sheet, start, 10) for start in starts]
+    return (time.perf_counter() - t0) / len(starts), results
+
+# ==============================================================================
+# 3. EJECUCIÓN
+# ==============================================================================
+
+def main(n_sections=500):
+    sheet, starts = _build_sheet(n_sections)
+    legacy_t, legacy_res = _time_per_section(_legacy_find_header_indices, sheet, starts)
+    new_t, new_res = _time_per_section(extract._find_header_indices, sheet, starts)
+
+    print(f"Secciones: {n_sections}")
+    print(f"  Anterior : {legacy_t * 1e3:8.3f} ms/sección")
+    print(f"  Índice   : {new_t * 1e3:8.3f} ms/sección")
+    print(f"  Speedup  : {legacy_t / new_t:8.1f}x")
+    print(f"  Resultados idénticos: {legacy_res == new_res}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
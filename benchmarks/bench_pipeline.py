@@ -0,0 +1,134 @@
+# benchmarks/bench_pipeline.py
+# Rendimiento (filas/s) y memoria por etapa del ETL sobre libros sintéticos
+# (benchmarks/generator.py) a distintas escalas, sin necesitar archivos de clientes.
+#
+# Etapas medidas: extract (extract.extract_frame_from_excel), transform
+# (transform.clean_and_standardize_frame) y load (load.write_to_sinks).
+# La memoria es el pico de asignaciones de Python (tracemalloc) de cada etapa y
+# se mide en una segunda pasada, para no distorsionar los tiempos (tracemalloc
+# hace esa pasada varias veces más lenta; --skip-memory la omite).
+#
+# Uso (desde la raíz del proyecto):
+#   python -m benchmarks.bench_pipeline [--scales 1 10 100] [--files 3] [--sinks xlsx]
+#                                       [--skip-memory] [--report ruta.jsonl]
+
+import argparse
+import os
+import shutil
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from src import extract, transform, load, metrics
+from benchmarks.generator import generate_dataset
+
+# ==============================================================================
+# 1. EJECUCIÓN DE LAS ETAPAS
+# ==============================================================================
+
+def _run_stages(paths, sinks, output_dir, stage_wrapper):
+    """
+    Ejecuta extract -> transform -> load sobre todos los archivos, cada etapa completa
+    antes de la siguiente para poder medirlas por separado. `stage_wrapper(nombre)`
+    es el context manager que mide cada etapa y entrega un registro para completar.
+    """
+    with stage_wrapper('extract') as record:
+        raw_frames = [extract.extract_frame_from_excel(path) for path in paths]
+        record['rows_out'] = sum(len(frame) for frame in raw_frames)
+
+    with stage_wrapper('transform') as record:
+        record['rows_in'] = sum(len(frame) for frame in raw_frames)
+        frames = [transform.clean_and_standardize_frame(frame) for frame in raw_frames]
+        record['rows_out'] = sum(len(frame) for frame in frames)
+    del raw_frames
+
+    with stage_wrapper('load') as record:
+        record['rows_in'] = sum(len(frame) for frame in frames)
+        load.write_to_sinks(frames, sinks, output_dir)
+
+@contextmanager
+def _traced_stage(peaks, name):
+    """Mide el pico de memoria de Python (MB) de la etapa `name` con tracemalloc y lo guarda en `peaks`."""
+    tracemalloc.start()
+    try:
+        yield {}
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[name] = round(peak / (1024 * 1024), 1)
+
+# ==============================================================================
+# 2. BENCHMARK POR ESCALA
+# ==============================================================================
+
+def bench_scale(scale, n_files, sinks, work_dir, measure_memory=True, seed=7):
+    """Genera el conjunto de la escala `scale` y retorna los registros de cada etapa."""
+    data_dir = os.path.join(work_dir, f"datos_{scale}x")
+    output_dir = os.path.join(work_dir, f"salida_{scale}x")
+    paths = generate_dataset(data_dir, n_files, scale, seed)
+    input_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+    run_metrics = metrics.RunMetrics()
+    stage_fields = {'scale': scale, 'files': n_files, 'input_mb': round(input_mb, 2)}
+    _run_stages(paths, sinks, output_dir, lambda name: run_metrics.stage(name, **stage_fields))
+
+    if measure_memory:
+        peaks = {}
+        _run_stages(paths, sinks, output_dir, lambda name: _traced_stage(peaks, name))
+        for record in run_metrics.records:
+            record['py_peak_mb'] = peaks.get(record['stage'])
+
+    return run_metrics.records
+
+def _print_table(records):
+    print(f"{'escala':>6} | {'etapa':<9} | {'filas':>8} | {'pared s':>8} | {'CPU s':>8} | "
+          f"{'filas/s':>9} | {'mem. Python MB':>14} | {'RSS pico MB':>11}")
+    print("-" * 92)
+    for record in records:
+        rows = record.get('rows_out', record.get('rows_in')) or 0
+        rate = rows / record['wall_s'] if record['wall_s'] > 0 else 0
+        py_peak = record.get('py_peak_mb')
+        print(f"{str(record['scale']) + 'x':>6} | {record['stage']:<9} | {rows:>8} | {record['wall_s']:>8.2f} | "
+              f"{record['cpu_s']:>8.2f} | {rate:>9,.0f} | {'-' if py_peak is None else py_peak:>14} | "
+              f"{record['peak_rss_mb']:>11}")
+
+# ==============================================================================
+# 3. EJECUCIÓN
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del ETL sobre libros sintéticos.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Escalas a medir (multiplicador de secciones por hoja). Por defecto: 1 10 100.")
+    parser.add_argument("--files", type=int, default=3, help="Libros por escala (por defecto: 3).")
+    parser.add_argument("--sinks", nargs="+", choices=sorted(load.SINKS), default=["xlsx"],
+                        help="Salidas de la etapa load (por defecto: xlsx).")
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="Omite la pasada de memoria (tracemalloc) y solo mide tiempos.")
+    parser.add_argument("--work-dir", default=None,
+                        help="Carpeta para datos y salidas (por defecto: una temporal que se borra al terminar).")
+    parser.add_argument("--report", default=None,
+                        help="Agrega los registros a este reporte JSON lines (mismo formato que run_etl.py).")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_vta_")
+    records = []
+    try:
+        for scale in args.scales:
+            print(f"-> Escala {scale}x ({args.files} libros)...")
+            records += bench_scale(scale, args.files, args.sinks, work_dir, not args.skip_memory)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    _print_table(records)
+
+    if args.report:
+        report = metrics.RunMetrics()
+        report.extend(records)
+        run_info = {'benchmark': 'bench_pipeline', 'scales': args.scales, 'files': args.files, 'sinks': args.sinks}
+        print(f"\n-> Reporte: {metrics.write_report(report, args.report, run_info)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# benchmarks/generator.py
+# Generador de libros sintéticos con la estructura de los reportes IceStar
+# (los archivos reales de clientes son confidenciales y no salen de la red):
+#   - etiqueta "Cliente" en las primeras filas de la primera hoja,
+#   - muchas secciones "(VTA###)" con títulos, desplazamientos y filas vacías variables,
+#   - cabeceras tomadas de los mapas COLUMNAS_* de src/config.py (con variaciones de escritura),
+#   - fechas en distintos formatos y números con formato local ("1.234,56" o "1,234.56",
+#     una sola convención por sección, "$ 1,234", ...),
+#   - hojas omitidas (Resumen) y filas de totales que el ETL debe descartar.
+#
+# Uso (desde la raíz del proyecto):
+#   python -m benchmarks.generator <carpeta_salida> [--files 3] [--scale 1] [--seed 7]
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+from src.rules import current_rules, CLIENT_MAPPING_FILE
+
+# Cabeceras, clasificaciones y hojas omitidas de las reglas vigentes (reglas.json)
+RULES = current_rules()
+CABECERA_FECHA = RULES.date_header
+COLUMNAS_CANTIDAD_BRUTA = RULES.quantity_headers
+COLUMNAS_TARIFA_BRUTA = RULES.rate_headers
+COLUMNAS_TOTAL_BRUTA = RULES.total_headers
+COLUMNAS_OBSERVACIONES_BRUTAS = RULES.observation_headers
+VTA_CLASSIFICATION_MAP = RULES.vta_classification
+HOJAS_OMITIDAS = RULES.omitted_sheet_names
+
+# Tamaño de la escala 1x: cada archivo tiene SHEETS_PER_FILE hojas con
+# SECTIONS_PER_SHEET * escala secciones de ~ROWS_PER_SECTION filas
+SHEETS_PER_FILE = 3
+SECTIONS_PER_SHEET = 6
+ROWS_PER_SECTION = 25
+
+# Títulos de servicio por código VTA (los de VTA_CLASSIFICATION_MAP y algunos sin clasificar)
+SERVICE_NAMES = {
+    "VTA008": "ALMACENAMIENTO CONGELADO", "VTA010": "INGRESO DE MERCANCIA", "VTA037": "INGRESO CROSS DOCKING",
+    "VTA012": "SALIDA DE MERCANCIA", "VTA014": "DESPACHO", "VTA017": "MOVIMIENTO INTERNO",
+    "VTA029": "REUBICACION", "VTA019": "CARGUE Y/O DESCARGUE", "VTA036": "PALETIZADO",
+    "VTA011": "SELECCION", "VTA021": "ETIQUETADO", "VTA025": "HORAS EXTRA",
+    "VTA043": "PESAJE", "VTA099": "OTROS SERVICIOS",
+}
+SERVICE_CODES = sorted({code for codes in VTA_CLASSIFICATION_MAP.values() for code in codes} | set(SERVICE_NAMES))
+
+MONTHS = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+          "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+# ==============================================================================
+# 1. VALORES DE CELDA
+# ==============================================================================
+
+def _load_client_names():
+    """Nombres de cliente del mapeo (con variantes de escritura) y algunos desconocidos."""
+    try:
+        with open(CLIENT_MAPPING_FILE, 'r', encoding='utf-8') as f:
+            names = list(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        names = []
+    return names + ["DISTRIBUIDORA SINTETICA S.A.S.", "Comercializadora Demo Ltda"]
+
+def _vary_text(rng, text):
+    """Variaciones de escritura habituales en los reportes: mayúsculas, minúsculas y espacios."""
+    r = rng.random()
+    if r < 0.15:
+        return text.upper()
+    if r < 0.25:
+        return text.lower()
+    if r < 0.35:
+        return f" {text} "
+    return text
+
+def _format_number(value, decimals, decimal_comma):
+    """Número con separador de miles y `decimals` decimales: "1,234.56" o, con coma decimal, "1.234,56"."""
+    text = f"{value:,.{decimals}f}"
+    return text.replace(',', '_').replace('.', ',').replace('_', '.') if decimal_comma else text
+
+def _locale_number(rng, value, decimal_comma=False):
+    """
+    Número con alguno de los formatos que aparecen en los reportes. Los textos con
+    separadores usan la convención de la sección (`decimal_comma`): un reporte no
+    mezcla "1.234,56" y "1,234.5" en la misma columna.
+    """
+    r = rng.random()
+    if r < 0.40:
+        return int(value)
+    if r < 0.60:
+        return round(value, 2)
+    if r < 0.68:
+        return _format_number(value, 2, decimal_comma)
+    if r < 0.76:
+        return f"$ {_format_number(int(value), 0, decimal_comma)}"
+    if r < 0.82:
+        return _format_number(value, 1, decimal_comma)
+    if r < 0.88:
+        return f" {int(value)} "
+    if r < 0.92:
+        return "n/a"
+    return None
+
+def _date_cell(rng, day):
+    """Fecha como datetime, texto en varios formatos o número de serie de Excel."""
+    r = rng.random()
+    if r < 0.55:
+        return day
+    if r < 0.70:
+        return day.strftime('%d/%m/%Y')
+    if r < 0.76:
+        return day.strftime('%d-%m-%Y')
+    if r < 0.82:
+        return day.strftime('%Y-%m-%d')
+    if r < 0.86:
+        return day.strftime('%d/%m/%y')
+    if r < 0.90:
+        return (day - datetime(1899, 12, 30)).days
+    return None
+
+# ==============================================================================
+# 2. HOJAS Y SECCIONES
+# ==============================================================================
+
+def _section_headers(rng):
+    """Cabecera de una sección: Fecha + 1-3 cantidades + tarifa/total/observaciones opcionales."""
+    headers = [CABECERA_FECHA] + rng.sample(list(COLUMNAS_CANTIDAD_BRUTA), rng.randint(1, 3))
+    n_quantities = len(headers) - 1
+    if rng.random() < 0.7:
+        headers.append(rng.choice(list(COLUMNAS_TARIFA_BRUTA)))
+    if rng.random() < 0.7:
+        headers.append(rng.choice(list(COLUMNAS_TOTAL_BRUTA)))
+    headers += rng.sample(COLUMNAS_OBSERVACIONES_BRUTAS + ["Placa", "Lote"], rng.randint(0, 2))
+    return [_vary_text(rng, h) for h in headers], n_quantities
+
+def generate_section_rows(rng, rows_per_section, start_day):
+    """Filas de una sección VTA: título, cabecera, datos y (a veces) una fila de total."""
+    code = rng.choice(SERVICE_CODES)
+    title = f"{SERVICE_NAMES.get(code, 'SERVICIO')} ({code})"
+    headers, n_quantities = _section_headers(rng)
+    offset = [None] * rng.randint(0, 2)
+    # Convención decimal de la sección (una de cada tres con formato local "1.234,56")
+    decimal_comma = rng.random() < 0.35
+
+    rows = [offset + [title]]
+    if rng.random() < 0.3:
+        rows.append([None])
+    rows.append(offset + headers)
+
+    n_rows = max(1, int(rng.gauss(rows_per_section, rows_per_section / 4)))
+    for i in range(n_rows):
+        row = [_date_cell(rng, start_day + timedelta(days=i % 28))]
+        row += [_locale_number(rng, rng.uniform(0, 5000), decimal_comma) for _ in range(n_quantities)]
+        for header in headers[1 + n_quantities:]:
+            normalized = header.strip().lower()
+            if normalized.startswith('tarifa'):
+                row.append(_locale_number(rng, rng.uniform(50, 900), decimal_comma))
+            elif normalized.startswith(('total', 'subtotal')):
+                row.append(_locale_number(rng, rng.uniform(1000, 90000), decimal_comma))
+            else:
+                row.append(rng.choice([None, f"Ref {rng.randint(1, 999)}", rng.randint(1000, 9999)]))
+        rows.append(offset + row)
+
+    if rng.random() < 0.5:
+        rows.append(offset + ["TOTAL"] + [rng.randint(1000, 99999) for _ in range(n_quantities)])
+    rows.append([None])
+    return rows
+
+def generate_sheet_rows(rng, n_sections, rows_per_section=ROWS_PER_SECTION, client_name=None):
+    """
+    Filas de una hoja con `n_sections` secciones VTA (y la etiqueta "Cliente" si se indica).
+    Retorna (filas, índices de las filas de título de cada sección).
+    """
+    rows = []
+    if client_name is not None:
+        rows += [[None]] * rng.randint(0, 3)
+        label = rng.choice(["Cliente", "Cliente ", "CLIENTE", "Cliente corte"])
+        rows.append([None] * rng.randint(0, 2) + [label, client_name])
+        rows.append(["REPORTE DE SERVICIOS PRESTADOS"])
+    rows.append([None])
+
+    starts = []
+    start_day = datetime(2025, rng.randint(1, 12), 1)
+    for _ in range(n_sections):
+        if rng.random() < 0.1:
+            rows.append(["Observaciones generales del periodo"])
+        starts.append(len(rows))
+        rows += generate_section_rows(rng, rows_per_section, start_day)
+    return rows, starts
+
+def write_workbook(path, rng, n_sections, n_sheets=SHEETS_PER_FILE, rows_per_section=ROWS_PER_SECTION):
+    """Escribe un libro sintético (modo write_only) y retorna el nombre del cliente usado."""
+    client_name = _vary_text(rng, rng.choice(_load_client_names()))
+    workbook = Workbook(write_only=True)
+    months = rng.sample(MONTHS, n_sheets)
+    for sheet_idx, month in enumerate(months):
+        sheet = workbook.create_sheet(f"{month} 2025")
+        rows, _ = generate_sheet_rows(
+            rng, n_sections, rows_per_section, client_name if sheet_idx == 0 else None
+        )
+        for row in rows:
+            sheet.append(row)
+
+    # Hoja de resumen que el ETL omite sin leerla
+    summary = workbook.create_sheet(HOJAS_OMITIDAS[0].capitalize())
+    for code in SERVICE_CODES:
+        summary.append([code, rng.randint(0, 99999)])
+
+    workbook.save(path)
+    return client_name
+
+# ==============================================================================
+# 3. CONJUNTO DE ARCHIVOS
+# ==============================================================================
+
+def generate_dataset(out_dir, n_files=3, scale=1, seed=7):
+    """
+    Genera `n_files` libros en `out_dir` con SECTIONS_PER_SHEET * `scale` secciones por hoja.
+    Es determinista para una misma semilla. Retorna las rutas generadas.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for file_idx in range(n_files):
+        path = os.path.join(out_dir, f"Sintetico_{file_idx + 1:03d} 2025.xlsx")
+        write_workbook(path, rng, SECTIONS_PER_SHEET * scale)
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera libros sintéticos con la estructura de los reportes VTA.")
+    parser.add_argument("out_dir", help="Carpeta donde se escriben los libros.")
+    parser.add_argument("--files", type=int, default=3, help="Número de libros (por defecto: 3).")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplicador de secciones por hoja (por defecto: 1).")
+    parser.add_argument("--seed", type=int, default=7, help="Semilla del generador (por defecto: 7).")
+    args = parser.parse_args(argv)
+
+    paths = generate_dataset(args.out_dir, args.files, args.scale, args.seed)
+    print(f"✅ {len(paths)} libros sintéticos generados en {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 # run_etl.py
 
+import argparse
+import multiprocessing
 import os
 import shutil
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, date # ✅ CORRECCIÓN: Importación de datetime/date al inicio
-from src import extract, transform, load
-from src.config import OUTPUT_FILENAME
+from src import load, cache, staging, metrics, pipeline, frames, store, watch, layout, dedup, query, rules, summary
+from src.config import (
+    OUTPUT_FILENAME, OUTPUT_DUPLICATES_FILENAME, OUTPUT_QUERY_DIRNAME, COLUMNAS_ESTANDAR, MEDIDAS_RESUMEN,
+    REGLAS_FILENAME
+)
+from src.lazy import lazy_import, load_now
+
+# pandas y la extracción/transformación (openpyxl) se cargan al primer uso: --help y
+# `query` no las necesitan (o solo pandas)
+pd = lazy_import('pandas')
+extract = lazy_import('src.extract')
+transform = lazy_import('src.transform')
 
 # ==============================================================================
 # 1. CONFIGURACIÓN DE RUTAS
@@ -14,6 +33,15 @@ from src.config import OUTPUT_FILENAME
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 WORK_DIR = os.path.join(BASE_DIR, "Work")
 OUTPUT_DIR = os.path.join(BASE_DIR, "Export", "Reportes")
+CACHE_DIR = os.path.join(BASE_DIR, "Cache")
+METRICS_DIR = os.path.join(BASE_DIR, "Export", "Metricas")
+STORE_DIR = os.path.join(BASE_DIR, "Export", "Dataset")
+
+# Con varios procesos, los libros con al menos estas hojas a extraer se reparten por hoja
+SPLIT_SHEETS_MIN = 4
+
+# Pool de procesos que el modo servicio (--watch) mantiene entre pasadas
+_warm_pool = None
 
 # Carpeta fuente de los archivos (¡AJUSTAR ESTA RUTA!)
 SOURCE_DIR = "C:\\Users\\sopex\\Cold Chile S.A\\Excelencia Operacional - Excelencia Operacional\\Daniel\\Desarrollos\\etl_process_kilos_icestar\\Import\\Kilos_Fuente" 
@@ -23,8 +51,29 @@ SOURCE_DIR = "C:\\Users\\sopex\\Cold Chile S.A\\Excelencia Operacional - Excelen
 # 2. FUNCIONES DE SETUP Y LIMPIEZA
 # ==============================================================================
 
-def setup_environment(source_dir, work_dir):
-    """Crea directorios y copia archivos XLSX/XLSM de la fuente a la carpeta de trabajo."""
+def list_source_files(source_dir):
+    """
+    Lista los archivos XLSX/XLSM de la carpeta fuente en el orden de carga: del más
+    antiguo al más reciente (dedup.load_order; en empate, por nombre), así el archivo que se
+    conserva ante duplicados no depende de cómo se llamen los archivos.
+    """
+    # Lista de extensiones a procesar
+    valid_extensions = ('.xlsx', '.xlsm')
+    return dedup.load_order(
+        os.path.join(source_dir, filename)
+        for filename in os.listdir(source_dir)
+        # '~$...' son los archivos de bloqueo de Excel mientras un libro está abierto
+        if filename.lower().endswith(valid_extensions) and not filename.startswith('~$')
+    )
+
+def setup_environment(source_dir, work_dir, source_files=None, staging_mode='copy', run_metrics=None):
+    """
+    Crea directorios y prepara los archivos XLSX/XLSM de la fuente según el modo
+    de staging ('copy', 'link' o 'inplace'). Si se indica `source_files`, solo se
+    preparan esos archivos.
+    Retorna un iterador perezoso con la ruta a leer de cada archivo (en orden): la
+    preparación se solapa con la extracción en lugar de completarse antes.
+    """
     print(f"-> Buscando archivos en fuente original: {source_dir}")
     
     if not os.path.exists(source_dir):
@@ -33,89 +82,722 @@ def setup_environment(source_dir, work_dir):
         
     # Limpiar y crear Work/Output
     shutil.rmtree(work_dir, ignore_errors=True)
-    os.makedirs(work_dir, exist_ok=True)
+    if staging_mode != 'inplace':
+        os.makedirs(work_dir, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    copied_files = []
-    
-    # Lista de extensiones a copiar
-    valid_extensions = ('.xlsx', '.xlsm')
-    
-    for filename in os.listdir(source_dir):
-        if filename.lower().endswith(valid_extensions):
-            source_path = os.path.join(source_dir, filename)
-            dest_path = os.path.join(work_dir, filename)
-            try:
-                shutil.copy2(source_path, dest_path)
-                copied_files.append(dest_path)
-            except Exception as e:
-                print(f"❌ Error al copiar {filename}: {e}")
-                
-    if not copied_files:
+    if source_files is None:
+        source_files = list_source_files(source_dir)
+    if not source_files:
         print("⚠️ Advertencia: No se encontraron archivos XLSX/XLSM para procesar.")
         return False
-        
-    print(f"  -> ✅ {len(copied_files)} archivos copiados a {work_dir}")
-    return copied_files
+
+    print(f"  -> {len(source_files)} archivos a preparar en modo '{staging_mode}'"
+          + (f" en {work_dir}" if staging_mode != 'inplace' else " (lectura directa desde la fuente)"))
+    return staging.iter_staged_files(source_files, work_dir, staging_mode, metrics=run_metrics)
 
 
 # ==============================================================================
-# 3. PROCESO PRINCIPAL (ETL)
+# 3. PROCESAMIENTO POR ARCHIVO (SECUENCIAL O EN PARALELO)
 # ==============================================================================
 
-def main():
+def _extract_file(file_path, metrics_detail=None, sheet_names=None, client_name=None, layout_dir=None):
+    """
+    Extrae un archivo (o solo las hojas `sheet_names`, con el cliente ya resuelto).
+    Con `layout_dir` se usa la caché de diseños de hoja (src/layout.py) de esa carpeta.
+    Retorna (DataFrame bruto, métricas del archivo).
+    """
+    file_metrics = metrics.RunMetrics(metrics_detail) if metrics_detail else metrics.NO_METRICS
+    unit = {'file': os.path.basename(file_path)}
+    if sheet_names is not None:
+        unit['sheets'] = sheet_names
+    with file_metrics.stage('extract', **unit) as record:
+        layouts = layout.open_layout_cache(layout_dir) if layout_dir else None
+        raw_frame = extract.extract_frame_from_excel(file_path, file_metrics, sheet_names, client_name, layouts)
+        record['rows_out'] = len(raw_frame)
+    if file_metrics.enabled:
+        # Fuera de la etapa medida: medir la memoria recorre los textos del bloque
+        record['frame_mb'] = frames.frame_memory_mb(raw_frame)
+    return raw_frame, file_metrics
+
+def _transform_file(file_path, raw_frame, file_metrics):
+    """Transforma el DataFrame bruto de un archivo. Retorna (DataFrame, registros de métricas)."""
+    with file_metrics.stage('transform', file=os.path.basename(file_path), rows_in=len(raw_frame)) as record:
+        frame = transform.clean_and_standardize_frame(raw_frame)
+        record['rows_out'] = len(frame)
+    if file_metrics.enabled:
+        record['frame_mb'] = frames.frame_memory_mb(frame)
+    return frame, file_metrics.records
+
+def _process_file(file_path, metrics_detail=None, layout_dir=None):
+    """
+    Extrae y transforma un único archivo. Es la unidad de trabajo del pool de procesos.
+    Retorna (DataFrame, registros de métricas del archivo); las métricas se miden en
+    el proceso que hace el trabajo y viajan con el resultado.
+    """
+    raw_frame, file_metrics = _extract_file(file_path, metrics_detail, layout_dir=layout_dir)
+    return _transform_file(file_path, raw_frame, file_metrics)
+
+def _process_sheets(file_path, sheet_names, client_name, metrics_detail=None, layout_dir=None):
+    """Extrae y transforma un grupo de hojas de un libro (unidad de trabajo por hojas). Igual retorno que _process_file."""
+    raw_frame, file_metrics = _extract_file(file_path, metrics_detail, sheet_names, client_name, layout_dir)
+    return _transform_file(file_path, raw_frame, file_metrics)
+
+def _split_in_groups(items, n_groups):
+    """Divide `items` en `n_groups` grupos consecutivos de tamaño similar (conservando el orden)."""
+    size, extra = divmod(len(items), n_groups)
+    groups, start = [], 0
+    for i in range(n_groups):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(items[start:end])
+        start = end
+    return groups
+
+def _iter_work_units(files_to_process, metrics_detail=None, split_sheets=SPLIT_SHEETS_MIN, workers=1, layout_dir=None):
+    """
+    Genera las unidades de trabajo del pool como (file_path, función, argumentos), en
+    orden de archivo y, dentro del archivo, en orden de hoja. Los libros con al menos
+    `split_sheets` hojas a extraer (0 = nunca) se dividen en `workers` grupos de hojas
+    consecutivas (cada unidad abre el libro, así que no se abre una vez por hoja): la
+    lista de hojas sale del pre-escaneo del zip (src/prescan.py), ya sin las hojas
+    omitidas ni las que no tienen secciones VTA, y el cliente se resuelve una sola vez
+    y viaja con cada grupo.
+    """
+    for file_path in files_to_process:
+        sheet_names, scan = [], None
+        if split_sheets:
+            try:
+                scan = extract.prescan_workbook(file_path)
+                sheet_names = extract.sheets_to_extract(file_path, scan)
+                client_name = extract.read_client_name(file_path, scan) if len(sheet_names) >= split_sheets else None
+            except Exception:
+                # Libro ilegible: la unidad por archivo reporta el error
+                sheet_names = []
+
+        if len(sheet_names) < max(split_sheets, 1):
+            yield file_path, _process_file, (file_path, metrics_detail, layout_dir)
+            continue
+
+        groups = _split_in_groups(sheet_names, min(workers, len(sheet_names)))
+        print(f"  -> Procesando {os.path.basename(file_path)} por hojas ({len(sheet_names)} hojas en {len(groups)} grupos)...")
+        print(f"     -> Cliente identificado: {client_name}")
+        if scan is not None and extract.skipped_sheets(scan):
+            print(f"     -> Hojas sin secciones VTA omitidas (pre-escaneo): {', '.join(extract.skipped_sheets(scan))}")
+        for group in groups:
+            yield file_path, _process_sheets, (file_path, group, client_name, metrics_detail, layout_dir)
+
+def _merge_unit_results(futures):
+    """
+    Une los resultados de las unidades de un archivo en el orden de sus hojas.
+    Retorna ((DataFrame, registros de métricas), None) o (None, primer error).
+    """
+    chunks, records = [], []
+    for future in futures:
+        try:
+            chunk, unit_records = future.result()
+        except Exception as e:
+            return None, e
+        chunks.append(chunk)
+        records.extend(unit_records)
+
+    if len(chunks) == 1:
+        return (chunks[0], records), None
+    non_empty = [chunk for chunk in chunks if not chunk.empty]
+    if not non_empty:
+        return (chunks[0], records), None
+    # Las categorías difieren entre hojas: se vuelven a compactar tras la unión
+    return (frames.compact_frame(pd.concat(non_empty, ignore_index=True)), records), None
+
+def _iter_extracted(files_to_process, metrics_detail=None, layout_dir=None):
+    """Etapa de extracción secuencial: genera (file_path, (DataFrame bruto, métricas), error)."""
+    for file_path in files_to_process:
+        try:
+            extracted, error = _extract_file(file_path, metrics_detail, layout_dir=layout_dir), None
+        except Exception as e:
+            extracted, error = None, e
+        yield file_path, extracted, error
+
+def _pool_context():
+    """
+    Contexto de los procesos del pool. Los procesos no deben crearse con fork desde un
+    proceso que ya tiene hilos (staging/pipeline): en POSIX se usa forkserver, que
+    precarga los módulos del ETL una sola vez; en Windows, spawn (el único disponible).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['src.extract', 'src.transform'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+@contextmanager
+def _process_pool(workers):
+    """Pool de procesos: el pool caliente del modo servicio si existe; si no, uno nuevo para esta ejecución."""
+    if _warm_pool is not None:
+        yield _warm_pool
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as executor:
+        yield executor
+
+def process_files(files_to_process, workers=1, metrics_detail=None, queue_depth=pipeline.PIPELINE_QUEUE_DEPTH,
+                  split_sheets=SPLIT_SHEETS_MIN, layout_dir=None):
+    """
+    Procesa los archivos y genera tuplas (file_path, (filas, métricas), error) en el
+    mismo orden de entrada, sin importar el orden en que terminen los procesos.
+    Un fallo en un archivo se reporta en su tupla y no detiene el resto.
+    En modo secuencial la extracción corre en su propio hilo, conectada a la
+    transformación por una cola de `queue_depth` archivos. En paralelo los libros
+    con muchas hojas se reparten por grupos de hojas (ver _iter_work_units) y hay como máximo
+    2 unidades por proceso en vuelo, para no acumular resultados en memoria; las
+    hojas de un archivo se unen en su orden antes de entregarlo.
+    `layout_dir` es la carpeta de la caché de diseños de hoja (None = sin caché).
+    """
+    if workers <= 1:
+        extracted = pipeline.iter_in_thread(
+            _iter_extracted(files_to_process, metrics_detail, layout_dir), queue_depth, name="extract"
+        )
+        try:
+            for file_path, extracted_result, error in extracted:
+                if error is None:
+                    try:
+                        result = _transform_file(file_path, *extracted_result)
+                    except Exception as e:
+                        result, error = None, e
+                else:
+                    result = None
+                yield file_path, result, error
+        finally:
+            extracted.close()
+        return
+
+    units = _iter_work_units(files_to_process, metrics_detail, split_sheets, workers, layout_dir)
+    next_unit = next(units, None)
+    in_flight = deque()   # (file_path, [futures de sus unidades]) en orden de archivo
+
+    with _process_pool(workers) as executor:
+        while next_unit is not None or in_flight:
+            # Se llena el pool y se terminan de enviar las unidades del archivo más antiguo
+            while next_unit is not None and (
+                sum(len(futures) for _, futures in in_flight) < 2 * workers
+                or next_unit[0] == in_flight[0][0]
+            ):
+                file_path, function, function_args = next_unit
+                if not in_flight or in_flight[-1][0] != file_path:
+                    in_flight.append((file_path, []))
+                in_flight[-1][1].append(executor.submit(function, *function_args))
+                next_unit = next(units, None)
+
+            file_path, futures = in_flight.popleft()
+            result, error = _merge_unit_results(futures)
+            yield file_path, result, error
+
+def iter_file_results(entries, pending_files, staged_files, workers=1, run_metrics=None,
+                      queue_depth=pipeline.PIPELINE_QUEUE_DEPTH, split_sheets=SPLIT_SHEETS_MIN, cached_files=None):
+    """
+    Genera (nombre, DataFrame transformado) de cada archivo, en el orden de los archivos
+    fuente: los nuevos/modificados (`pending_files`, leídos desde `staged_files`, en el
+    mismo orden) se procesan al vuelo y el resto se lee de la caché (solo los de
+    `cached_files`, si se indica). Cada resultado nuevo se guarda en la caché y se
+    entrega sin acumularlo. Los archivos que fallan se quitan de `entries`.
+    """
+    run_metrics = run_metrics or metrics.NO_METRICS
+    metrics_detail = run_metrics.detail if run_metrics.enabled else None
+    to_process = {os.path.basename(file_path) for file_path in pending_files}
+    results = process_files(
+        staged_files, workers, metrics_detail, queue_depth, split_sheets, cache.layouts_dir(CACHE_DIR)
+    )
+    try:
+        for file_name, entry in list(entries.items()):
+            if file_name not in to_process:
+                if cached_files is not None and file_name not in cached_files:
+                    continue
+                with run_metrics.stage('cache.load', file=file_name) as record:
+                    frame = cache.load_result(CACHE_DIR, file_name, entry)
+                    record['rows_out'] = 0 if frame is None else len(frame)
+                if frame is not None:
+                    yield file_name, frame
+                continue
+
+            file_path, result, error = next(results)
+            # Ya no se imprime aquí, se imprime dentro de extract.extract_frame_from_excel
+
+            if error is not None:
+                print(f"    -> ❌ Error procesando {file_name}: {error}")
+                run_metrics.add({'stage': 'error', 'file': file_name, 'error': repr(error)})
+                # Sin entrada en el manifiesto: se reintenta en la próxima ejecución
+                entries.pop(file_name, None)
+                continue
+
+            transformed_chunk, file_records = result
+            run_metrics.extend(file_records)
+            with run_metrics.stage('cache.store', file=file_name, rows_in=len(transformed_chunk)):
+                cache.store_result(CACHE_DIR, file_name, entry, transformed_chunk)
+            if not transformed_chunk.empty:
+                print(f"    -> ✅ {file_name}: {len(transformed_chunk)} filas listas para consolidación.")
+            else:
+                print(f"    -> ⚠️ Archivo {file_name} procesado, pero sin datos útiles para consolidación.")
+            yield file_name, transformed_chunk
+    finally:
+        results.close()
+
+def iter_consolidated_chunks(entries, pending_files, staged_files, workers=1, run_metrics=None,
+                             queue_depth=pipeline.PIPELINE_QUEUE_DEPTH, split_sheets=SPLIT_SHEETS_MIN):
+    """
+    Genera, en el orden de los archivos fuente, el DataFrame transformado (no vacío) de
+    cada archivo para la carga: los nuevos/modificados se procesan al vuelo y el resto
+    se lee de la caché (ver iter_file_results).
+    """
+    results = iter_file_results(
+        entries, pending_files, staged_files, workers, run_metrics, queue_depth, split_sheets
+    )
+    try:
+        for _, frame in results:
+            if not frame.empty:
+                yield frame
+    finally:
+        results.close()
+
+def sync_store(data_store, entries, pending_files, staged_files, workers=1, run_metrics=None,
+               queue_depth=pipeline.PIPELINE_QUEUE_DEPTH, split_sheets=SPLIT_SHEETS_MIN):
+    """
+    Actualiza el almacén incremental (src/store.py): reemplaza las particiones de los
+    archivos nuevos o modificados, completa desde la caché las que falten o estén
+    desactualizadas, y elimina las de archivos que ya no están en la fuente (o que
+    fallaron). Los archivos sin cambios no se leen. Retorna (reemplazadas, eliminadas).
+    """
+    run_metrics = run_metrics or metrics.NO_METRICS
+    results = pipeline.iter_in_thread(
+        iter_file_results(
+            entries, pending_files, staged_files, workers, run_metrics, queue_depth, split_sheets,
+            cached_files=set(data_store.stale(entries))
+        ),
+        queue_depth, name="transform"
+    )
+    replaced = []
+    try:
+        for file_name, frame in results:
+            with run_metrics.stage('store.write', file=file_name, rows_in=len(frame)):
+                data_store.replace(file_name, entries[file_name]['sha256'], frame)
+            replaced.append(file_name)
+    finally:
+        results.close()
+
+    dropped = data_store.obsolete(entries)
+    if dropped:
+        with run_metrics.stage('store.drop', files=len(dropped)):
+            data_store.drop(dropped)
+    return replaced, dropped
+
+def iter_store_chunks(data_store, file_names, run_metrics=None):
+    """Genera el DataFrame (no vacío) de cada partición del almacén, en el orden de `file_names`."""
+    run_metrics = run_metrics or metrics.NO_METRICS
+    for file_name in file_names:
+        with run_metrics.stage('store.read', file=file_name) as record:
+            frame = data_store.read(file_name)
+            record['rows_out'] = 0 if frame is None else len(frame)
+        if frame is not None and not frame.empty:
+            yield frame
+
+
+# ==============================================================================
+# 4. PROCESO PRINCIPAL (ETL)
+# ==============================================================================
+
+def report_duplicates(detector, policy):
+    """Escribe el reporte de duplicados e informa el resultado; retorna los conteos para las métricas."""
+    report_path = os.path.join(OUTPUT_DIR, OUTPUT_DUPLICATES_FILENAME)
+    copies = detector.duplicate_files()
+    if not detector.duplicate_rows:
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        print("  -> ✅ Sin movimientos duplicados entre archivos.")
+    else:
+        action = {'report': 'informadas', 'flag': 'marcadas en OBSERVACIONES', 'drop': 'quitadas del consolidado'}[policy]
+        print(f"  -> ⚠️ {detector.duplicate_rows} de {detector.rows} filas repiten movimientos de otro archivo "
+              f"({action}). Reporte: {detector.write_report(report_path)}")
+        for name, origin in copies.items():
+            print(f"     - {name} es copia completa de {origin}")
+    return {'rows': detector.duplicate_rows, 'sections': len(detector.findings), 'files': len(copies),
+            'spilled_keys': detector.keys.spilled}
+
+def parse_args(argv=None):
+    """Opciones de línea de comandos del ETL."""
+    parser = argparse.ArgumentParser(description="ETL de consolidación de movimientos VTA.")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Número de procesos para extraer/transformar archivos en paralelo (por defecto: núcleos de CPU; 1 = secuencial)."
+    )
+    parser.add_argument(
+        "--full-refresh", action="store_true",
+        help="Ignora la caché incremental (resultados y diseños de hoja) y vuelve a procesar todos los archivos fuente."
+    )
+    parser.add_argument(
+        "--staging", choices=staging.STAGING_MODES, default="copy",
+        help="Preparación de los archivos fuente: copy (copia a Work/, solapada con la extracción), "
+             "link (reflink/enlace duro si el sistema de archivos lo permite; si no, copia) "
+             "o inplace (lectura directa desde la fuente). Por defecto: copy."
+    )
+    parser.add_argument(
+        "--sinks", nargs="+", choices=sorted(load.SINKS), default=["xlsx", "resumen"],
+        help="Salidas del consolidado (una o varias): xlsx, parquet, csv, sqlite y resumen (agregados por "
+             "cliente, NIT, mes y clasificación en un XLSX aparte). Por defecto: xlsx resumen."
+    )
+    parser.add_argument(
+        "--metrics-detail", choices=metrics.DETAIL_LEVELS, default="file",
+        help="Nivel de detalle de las métricas: file (etapas por archivo), sheet (además, apertura del libro "
+             "y cada hoja) o section (además, cada sección VTA). Por defecto: file."
+    )
+    parser.add_argument(
+        "--report", default=os.path.join(METRICS_DIR, metrics.REPORT_FILENAME),
+        help="Reporte JSON lines al que se agregan las métricas de cada ejecución "
+             "(por defecto: Export/Metricas/run_report.jsonl)."
+    )
+    parser.add_argument(
+        "--profile", choices=metrics.PROFILERS, default=None,
+        help="Perfila la ejecución con cProfile (.prof) o pyinstrument (.html) en Export/Metricas/. "
+             "Solo se perfila el proceso principal: usar junto con --workers 1."
+    )
+    parser.add_argument(
+        "--queue-depth", type=int, default=pipeline.PIPELINE_QUEUE_DEPTH,
+        help="Archivos en espera entre etapas del pipeline (extracción -> transformación -> carga). "
+             "Limita la memoria: a mayor profundidad, más solapamiento y más memoria. "
+             f"Por defecto: {pipeline.PIPELINE_QUEUE_DEPTH}."
+    )
+    parser.add_argument(
+        "--store", choices=sorted(store.STORES), default=None,
+        help="Modo incremental con almacén particionado por archivo fuente en Export/Dataset/: parquet o sqlite. "
+             "Solo se reemplazan las particiones de los archivos nuevos o modificados (y se eliminan las de "
+             "los archivos borrados); las salidas de --sinks se regeneran leyendo el almacén."
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Modo servicio: tras la primera pasada, vigila la carpeta fuente y procesa los libros "
+             "nuevos o modificados en cuanto terminan de copiarse (Ctrl+C para detener)."
+    )
+    parser.add_argument(
+        "--watch-interval", type=float, default=watch.WATCH_INTERVAL,
+        help=f"Segundos entre consultas de la carpeta en modo servicio (por defecto: {watch.WATCH_INTERVAL:g})."
+    )
+    parser.add_argument(
+        "--watch-debounce", type=float, default=watch.WATCH_DEBOUNCE,
+        help="Segundos que la carpeta debe quedar sin cambios antes de procesar, para no leer libros "
+             f"a medio copiar (por defecto: {watch.WATCH_DEBOUNCE:g})."
+    )
+    parser.add_argument(
+        "--split-sheets", type=int, default=SPLIT_SHEETS_MIN,
+        help="Con --workers > 1, reparte por grupos de hojas entre los procesos los libros con al menos N hojas "
+             f"a extraer (0 = siempre por archivo). Por defecto: {SPLIT_SHEETS_MIN}."
+    )
+    parser.add_argument(
+        "--duplicates", choices=dedup.DEDUP_POLICIES, default="report",
+        help="Movimientos repetidos entre archivos fuente (libros reenviados con otro nombre, hojas copiadas): "
+             "off (no se buscan), report (se informan en Export/Reportes/" + OUTPUT_DUPLICATES_FILENAME + "), "
+             "flag (además se marcan en OBSERVACIONES) o drop (además se quitan del consolidado). "
+             "Por defecto: report."
+    )
+    return parser.parse_args(argv)
+
+def run_once(args, extra_info=None):
+    """
+    Una ejecución completa del ETL (incremental según la caché) con las opciones `args`.
+    `extra_info` se agrega a los datos de la ejecución en el reporte de métricas.
+    """
     start_time = datetime.now()
     today_date = date.today()
+    run_metrics = metrics.RunMetrics(args.metrics_detail)
+    run_info = {
+        'started_at': start_time.isoformat(timespec='seconds'), 'workers': args.workers,
+        'staging': args.staging, 'sinks': args.sinks, 'full_refresh': args.full_refresh,
+        'metrics_detail': args.metrics_detail, 'profile': args.profile, 'queue_depth': args.queue_depth,
+        'split_sheets': args.split_sheets, 'store': args.store, 'duplicates': args.duplicates,
+        **(extra_info or {}),
+    }
     
     print("=" * 50)
     print(f"      🚀 INICIO DE PROCESO ETL - MOVIMIENTOS VTA 🚀      ")
     print(f"      Fecha de Ejecución: {today_date.strftime('%Y-%m-%d')}")
     print("=" * 50)
 
-    consolidated_data = []
-
     try:
-        # 1. SETUP Y COPIADO
-        print("\n-> Paso 1: Copiado de Archivos a Carpeta de Trabajo...")
-        files_to_process = setup_environment(SOURCE_DIR, WORK_DIR)
-        
-        if not files_to_process:
-            print("Proceso detenido.")
-            return
+        with metrics.profiled(args.profile, os.path.join(METRICS_DIR, f"perfil_{start_time:%Y%m%d_%H%M%S}")):
+            # 1. DETECCIÓN DE CAMBIOS Y COPIADO
+            print("\n-> Paso 1: Detección de Cambios y Copiado de Archivos a Carpeta de Trabajo...")
+            if not os.path.exists(SOURCE_DIR):
+                print(f"❌ ERROR: Directorio fuente no encontrado: {SOURCE_DIR}")
+                print("Proceso detenido.")
+                return
 
-        # 2. EXTRACCIÓN Y TRANSFORMACIÓN (E&T)
-        print("\n-> Paso 2: Extracción y Transformación de Archivos...")
-        
-        for file_path in files_to_process:
-            file_name = os.path.basename(file_path)
-            # Ya no se imprime aquí, se imprime dentro de extract.extract_data_from_excel
-            
-            raw_data = extract.extract_data_from_excel(file_path)
-            transformed_chunk = transform.clean_and_standardize(raw_data)
-            
-            if transformed_chunk:
-                print(f"    -> ✅ {len(transformed_chunk)} filas listas para consolidación.")
-                consolidated_data.extend(transformed_chunk)
-            else:
-                print(f"    -> ⚠️ Archivo {file_name} procesado, pero sin datos útiles para consolidación.")
+            if args.profile and args.workers > 1:
+                print("  -> ⚠️ El perfil solo cubre el proceso principal; use --workers 1 para perfilar la extracción.")
+
+            with run_metrics.stage('plan') as record:
+                source_files = list_source_files(SOURCE_DIR)
+                # Las reglas vigentes (recargadas si reglas.json cambió) forman parte de la clave de la caché
+                rules.use_compiled_dir(cache.rules_dir(CACHE_DIR))
+                current = rules.current_rules()
+                digest = rules.rules_digest()
+                manifest = {} if args.full_refresh else cache.load_manifest(CACHE_DIR, digest)
+                if args.full_refresh:
+                    cache.clear_layouts(CACHE_DIR)
+                entries, pending_files, deleted_files = cache.plan_refresh(CACHE_DIR, source_files, manifest)
+                record['files'] = len(source_files)
+            run_info.update(files=len(source_files), pending=len(pending_files), deleted=len(deleted_files),
+                            rules_version=current.version, rules_sha256=current.digest)
+            print(f"  -> Reglas: {REGLAS_FILENAME} v{current.version} ({current.digest[:12]}).")
+            print(f"  -> Incremental: {len(source_files) - len(pending_files)} sin cambios, "
+                  f"{len(pending_files)} nuevos/modificados, {len(deleted_files)} eliminados.")
+
+            if not entries:
+                print("⚠️ Advertencia: No se encontraron archivos XLSX/XLSM para procesar.")
+                print("Proceso detenido.")
+                return
 
-        # 3. CARGA (Consolidación)
-        if consolidated_data:
-            print(f"\n-> Paso 3: Carga (Consolidación) | Total: {len(consolidated_data)} filas...")
-            load.create_consolidated_xlsx(consolidated_data, OUTPUT_DIR) 
-        else:
-            print("\n-> Proceso ETL finalizado sin datos para consolidar.")
+            # Los módulos diferidos se cargan aquí, antes de los hilos de copiado y del pipeline
+            load_now(pd, *((extract, transform) if pending_files else ()))
+            staged_files = setup_environment(
+                SOURCE_DIR, WORK_DIR, pending_files, args.staging, run_metrics
+            ) if pending_files else []
+
+            # 2 y 3. EXTRACCIÓN, TRANSFORMACIÓN Y CARGA EN STREAMING
+            # Cada archivo pasa de E&T (o de la caché) directamente al escritor XLSX, sin acumular filas
+            print(f"\n-> Paso 2: Extracción y Transformación de Archivos ({args.workers} procesos)...")
+            print(f"-> Paso 3: Carga (Consolidación) en streaming | Salidas: {', '.join(args.sinks)}...")
+            # La E&T corre en un hilo productor y la carga consume los bloques a medida que llegan;
+            # la cola acotada entre ambas detiene al productor si la carga va más lenta
+            # La detección de duplicados corre en el mismo hilo productor, bloque a bloque
+            chunks = None
+            data_store = store.open_store(args.store, STORE_DIR) if args.store else None
+            detector = dedup.DuplicateDetector(args.duplicates) if args.duplicates != 'off' else None
+            filtered = detector.iter_filtered if detector is not None else (lambda source, _: source)
+            try:
+                if data_store is None:
+                    chunks = pipeline.iter_in_thread(
+                        filtered(iter_consolidated_chunks(
+                            entries, pending_files, staged_files, args.workers, run_metrics, args.queue_depth,
+                            args.split_sheets
+                        ), run_metrics),
+                        args.queue_depth, name="transform"
+                    )
+                else:
+                    # Modo incremental: solo se reemplazan en el almacén las particiones de los archivos
+                    # que cambiaron y las salidas se regeneran leyendo el almacén
+                    replaced, dropped = sync_store(
+                        data_store, entries, pending_files, staged_files, args.workers, run_metrics,
+                        args.queue_depth, args.split_sheets
+                    )
+                    print(f"  -> Almacén {args.store} ({STORE_DIR}): {len(replaced)} particiones reemplazadas, "
+                          f"{len(dropped)} eliminadas, {len(entries) - len(replaced)} sin cambios.")
+                    chunks = pipeline.iter_in_thread(
+                        filtered(iter_store_chunks(data_store, list(entries), run_metrics), run_metrics),
+                        args.queue_depth, name="store"
+                    )
+                run_info['outputs'] = load.write_to_sinks(chunks, args.sinks, OUTPUT_DIR, run_metrics)
+                if detector is not None:
+                    run_info['duplicates_found'] = report_duplicates(detector, args.duplicates)
+            finally:
+                # Detiene el pipeline antes de guardar el manifiesto (las entradas ya no cambian)
+                if chunks is not None:
+                    chunks.close()
+                cache.save_manifest(CACHE_DIR, entries, digest)
+                cache.prune_results(CACHE_DIR, entries)
+                if data_store is not None:
+                    data_store.close()
+                if detector is not None:
+                    detector.close()
 
     except Exception as e:
         print(f"\n❌ ERROR CRÍTICO EN EL PROCESO PRINCIPAL: {e}")
+        run_info['error'] = repr(e)
         
     finally:
         end_time = datetime.now()
         duration = end_time - start_time
+        metrics.print_summary(run_metrics, duration.total_seconds())
+        totals = run_metrics.summary()
+        run_info.update(
+            wall_s=round(duration.total_seconds(), 3), peak_rss_mb=metrics.peak_rss_mb(),
+            rows=sum(totals.get(stage, {}).get('rows', 0)
+                     for stage in (('store.read',) if args.store else ('transform', 'cache.load')))
+        )
+        try:
+            print(f"  -> Reporte de métricas: {metrics.write_report(run_metrics, args.report, run_info)}")
+        except OSError as e:
+            print(f"  -> ⚠️ No se pudo escribir el reporte de métricas: {e}")
         print(f"Tiempo total de ejecución: {duration.total_seconds():.2f} segundos.")
         print("=" * 50)
 
 
+def _refresh_warm_pool(workers):
+    """Crea el pool caliente del modo servicio, o lo reemplaza si un proceso murió y lo dejó inutilizable."""
+    global _warm_pool
+    if _warm_pool is not None:
+        try:
+            _warm_pool.submit(int).result()
+        except BrokenProcessPool:
+            print("  -> ⚠️ El pool de procesos quedó inutilizable; se crea uno nuevo.")
+            _warm_pool.shutdown(wait=False)
+            _warm_pool = None
+    if _warm_pool is None and workers > 1:
+        _warm_pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+
+def _stop_on_sigterm(signum, frame):
+    # El gestor de servicios detiene el proceso con SIGTERM: se trata como Ctrl+C
+    raise KeyboardInterrupt
+
+def watch_source_dir(args):
+    """
+    Modo servicio: deja el ETL al día y luego vigila SOURCE_DIR (src/watch.py). Cada vez
+    que la carpeta cambia y queda estable, ejecuta una pasada incremental: solo se
+    extraen y transforman los libros nuevos o modificados y se regeneran las salidas.
+    El proceso (reglas, mapa de clientes, patrones, memoización) y el pool de procesos se
+    mantienen calientes entre pasadas; las reglas y el mapa de clientes editados se
+    recargan en la pasada siguiente (src/rules.py). Se detiene con Ctrl+C o SIGTERM (servicio del sistema).
+    """
+    global _warm_pool
+    if not os.path.exists(SOURCE_DIR):
+        print(f"❌ ERROR: Directorio fuente no encontrado: {SOURCE_DIR}")
+        return
+
+    watcher = watch.FolderWatcher(SOURCE_DIR, list_source_files, args.watch_interval, args.watch_debounce)
+    print(f"👀 Modo servicio: vigilando {SOURCE_DIR} ({watcher.mode}; se procesa tras "
+          f"{args.watch_debounce:g} s sin cambios). Ctrl+C para detener.")
+    cycle = 0
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    try:
+        snapshot = watcher.snapshot()
+        while True:
+            cycle += 1
+            _refresh_warm_pool(args.workers)
+            cycle_start = datetime.now()
+            run_once(args, {'watch_cycle': cycle})
+            print(f"👀 Pasada {cycle} lista en {(datetime.now() - cycle_start).total_seconds():.2f} s. "
+                  f"Esperando cambios en {SOURCE_DIR}...")
+            # La reconstrucción completa solo aplica a la primera pasada
+            args.full_refresh = False
+
+            processed, snapshot = snapshot, watcher.wait_for_change(snapshot)
+            added, modified, deleted = watcher.describe_changes(processed, snapshot)
+            print(f"\n👀 Cambios detectados: {len(added)} nuevos, {len(modified)} modificados, "
+                  f"{len(deleted)} eliminados.")
+    except KeyboardInterrupt:
+        print("\n🛑 Modo servicio detenido.")
+    finally:
+        watcher.close()
+        if _warm_pool is not None:
+            _warm_pool.shutdown(cancel_futures=True)
+            _warm_pool = None
+
+# ==============================================================================
+# 5. CONSULTAS (python run_etl.py query ...)
+# ==============================================================================
+
+# Filtros de la consulta: opción -> columna de COLUMNAS_FILTRO_CONSULTA
+QUERY_FILTERS = {
+    'nit': 'NIT', 'client': 'CLIENTE_ESTANDAR', 'type': 'TIPO_MOVIMIENTO_LIMPIO',
+    'class': 'CLASIFICACION_VTA', 'subtype_class': 'CLASIFICACION_SUBTIPO',
+}
+
+def _iso_date(value):
+    """Tipo argparse: fecha 'YYYY-MM-DD'."""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{value}' (formato YYYY-MM-DD)")
+
+def _month_range(value):
+    """Tipo argparse: mes 'YYYY-MM' -> (primer día, último día) ISO."""
+    try:
+        period = pd.Period(value, freq='M')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mes inválido '{value}' (formato YYYY-MM)")
+    return period.start_time.date().isoformat(), period.end_time.date().isoformat()
+
+def parse_query_args(argv):
+    """Opciones del subcomando `query`."""
+    parser = argparse.ArgumentParser(
+        prog="run_etl.py query",
+        description="Consulta los movimientos del conjunto de datos de consulta (salida 'consulta')."
+    )
+    parser.add_argument(
+        "--dataset", default=os.path.join(OUTPUT_DIR, OUTPUT_QUERY_DIRNAME),
+        help=f"Carpeta del conjunto de datos (por defecto: Export/Reportes/{OUTPUT_QUERY_DIRNAME})."
+    )
+    parser.add_argument("--from", dest="date_from", type=_iso_date, help="Fecha inicial (YYYY-MM-DD, inclusiva).")
+    parser.add_argument("--to", dest="date_to", type=_iso_date, help="Fecha final (YYYY-MM-DD, inclusiva).")
+    parser.add_argument("--month", type=_month_range, help="Mes completo (YYYY-MM); reemplaza --from/--to.")
+    parser.add_argument("--nit", nargs="+", help="NIT (uno o varios).")
+    parser.add_argument("--client", nargs="+", help="CLIENTE_ESTANDAR (uno o varios).")
+    parser.add_argument("--type", nargs="+", help="Código VTA, TIPO_MOVIMIENTO_LIMPIO (ej. VTA019).")
+    parser.add_argument("--class", nargs="+", help="CLASIFICACION_VTA (ej. INGRESO).")
+    parser.add_argument("--subtype-class", nargs="+", help="CLASIFICACION_SUBTIPO (ej. KILOS_O_PESO).")
+    parser.add_argument(
+        "--group-by", nargs="+", choices=COLUMNAS_ESTANDAR + ['MES'],
+        help="Agrupa y suma " + " y ".join(MEDIDAS_RESUMEN) + " por estas columnas (MES = mes de la fecha)."
+    )
+    parser.add_argument(
+        "--columns", nargs="+", choices=COLUMNAS_ESTANDAR,
+        help="Columnas del detalle (por defecto: todas)."
+    )
+    parser.add_argument("--limit", type=int, default=20, help="Filas a mostrar en consola (por defecto: 20).")
+    parser.add_argument("--output", help="Guarda el resultado completo en este CSV.")
+    return parser.parse_args(argv)
+
+def run_query(args):
+    """Ejecuta una consulta sobre el conjunto de datos de consulta e imprime el resultado."""
+    start = time.perf_counter()
+    date_from, date_to = args.month if args.month else (args.date_from, args.date_to)
+    filters = {col: getattr(args, option) for option, col in QUERY_FILTERS.items() if getattr(args, option)}
+    try:
+        dataset = query.QueryDataset(args.dataset)
+    except ImportError as e:
+        print(f"❌ Las consultas requieren {e.name}.")
+        return None
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return None
+
+    columns = list(args.columns or COLUMNAS_ESTANDAR)
+    if args.group_by:
+        columns = [col for col in args.group_by if col != 'MES'] + MEDIDAS_RESUMEN
+        if 'MES' in args.group_by:
+            columns.append('FECHA_MOVIMIENTO')
+    result, fragments = dataset.query(date_from, date_to, filters, list(dict.fromkeys(columns)))
+
+    if args.group_by:
+        if 'MES' in args.group_by:
+            result['MES'] = result['FECHA_MOVIMIENTO'].map(summary.month_of)
+        result['MOVIMIENTOS'] = 1
+        result = result.groupby(args.group_by, sort=True, dropna=False, as_index=False)[
+            ['MOVIMIENTOS'] + MEDIDAS_RESUMEN
+        ].sum()
+
+    elapsed = time.perf_counter() - start
+    print(f"🔎 {len(result)} fila(s) | partes leídas: {len(fragments)} de {len(dataset.fragments)} | {elapsed:.3f} s")
+    if not args.group_by and len(result):
+        totals = ", ".join(f"{col}={result[col].sum():,.2f}" for col in MEDIDAS_RESUMEN if col in result)
+        if totals:
+            print(f"  -> Totales: {totals}")
+    if len(result):
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(result.head(args.limit).to_string(index=False))
+        if len(result) > args.limit:
+            print(f"  ... {len(result) - args.limit} fila(s) más (--limit, --output).")
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8')
+        print(f"  -> ✅ Resultado guardado: {args.output}")
+    return result
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['query']:
+        run_query(parse_query_args(argv[1:]))
+        return
+    args = parse_args(argv)
+    if args.watch:
+        watch_source_dir(args)
+    else:
+        run_once(args)
+
+
 if __name__ == "__main__":
     # La importación aquí ya no es necesaria, pero no afecta si se deja
     main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+# src/cache.py
+# Caché incremental del ETL: manifiesto de archivos fuente (tamaño, mtime y hash
+# de contenido) y resultados transformados por archivo.
+
+import hashlib
+import json
+import os
+import shutil
+from src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+MANIFEST_FILENAME = "manifest.json"
+RESULTS_DIRNAME = "resultados"
+LAYOUTS_DIRNAME = "disenos"
+RULES_DIRNAME = "reglas"
+
+# Se incrementa cuando cambia la lógica de extracción/transformación (o el tipado de las
+# salidas que guarda el almacén incremental) para invalidar la caché
+CACHE_VERSION = 6
+
+# ==============================================================================
+# 1. MANIFIESTO
+# ==============================================================================
+
+def load_manifest(cache_dir, rules_digest=None):
+    """
+    Carga el manifiesto de la caché. Retorna un manifiesto vacío si no existe, es de otra
+    versión o se generó con otras reglas o mapa de clientes (`rules_digest`, ver rules.rules_digest).
+    """
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+    if manifest.get('version') != CACHE_VERSION:
+        print("  -> ⚠️ Caché de otra versión del ETL: se reconstruye por completo.")
+        return {}
+    if manifest.get('rules') != rules_digest:
+        print("  -> Reglas o mapa de clientes cambiaron: se reprocesan todos los archivos.")
+        return {}
+    return manifest.get('files', {})
+
+def save_manifest(cache_dir, manifest, rules_digest=None):
+    """Guarda el manifiesto de forma atómica (archivo temporal + replace)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'rules': rules_digest, 'files': manifest}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """Hash SHA-256 del contenido del archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def plan_refresh(cache_dir, source_files, manifest):
+    """
+    Compara los archivos fuente con el manifiesto.
+    Solo se calcula el hash de los archivos cuyo tamaño o mtime cambió.
+
+    Retorna (entradas, pendientes, eliminados):
+      - entradas: {nombre: {'size', 'mtime_ns', 'sha256'}} de todos los archivos fuente actuales
+      - pendientes: rutas de archivos nuevos o con contenido distinto
+      - eliminados: nombres presentes en el manifiesto que ya no están en la fuente
+    """
+    entries = {}
+    pending = []
+
+    for file_path in source_files:
+        name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        previous = manifest.get(name)
+
+        cached = previous is not None and has_result(cache_dir, name, previous)
+
+        if cached and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            entries[name] = previous
+            continue
+
+        sha256 = file_hash(file_path)
+        entries[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        if cached and previous['sha256'] == sha256:
+            # Solo cambió el mtime (ej. archivo re-sincronizado): se reutiliza el resultado
+            entries[name]['rows'] = previous['rows']
+        else:
+            pending.append(file_path)
+
+    deleted = [name for name in manifest if name not in entries]
+    return entries, pending, deleted
+
+# ==============================================================================
+# 2. RESULTADOS POR ARCHIVO
+# ==============================================================================
+
+def _result_filename(name, entry):
+    """Nombre del resultado: depende del nombre del archivo (FUENTE_ARCHIVO) y del hash de su contenido."""
+    key = hashlib.sha256(f"{name}\0{entry['sha256']}".encode('utf-8')).hexdigest()
+    return f"{key}.pkl"
+
+def _result_path(cache_dir, name, entry):
+    return os.path.join(cache_dir, RESULTS_DIRNAME, _result_filename(name, entry))
+
+def store_result(cache_dir, name, entry, frame):
+    """
+    Guarda el DataFrame transformado de un archivo, indexado por su nombre y el hash de su contenido.
+    Se usa pickle de pandas (bloques columnares) porque TARIFA/TOTAL conservan los valores
+    brutos de la celda, con tipos mixtos que un formato Arrow no admite sin convertirlos.
+    """
+    os.makedirs(os.path.join(cache_dir, RESULTS_DIRNAME), exist_ok=True)
+    frame.to_pickle(_result_path(cache_dir, name, entry))
+    entry['rows'] = len(frame)
+
+def has_result(cache_dir, name, entry):
+    """Indica si el resultado de la entrada del manifiesto está disponible en la caché."""
+    return 'rows' in entry and os.path.exists(_result_path(cache_dir, name, entry))
+
+def load_result(cache_dir, name, entry):
+    """Carga el DataFrame transformado de un archivo. Retorna None si no está en la caché."""
+    if not has_result(cache_dir, name, entry):
+        return None
+    return pd.read_pickle(_result_path(cache_dir, name, entry))
+
+def prune_results(cache_dir, manifest):
+    """Elimina los resultados que ya no referencia ningún archivo del manifiesto."""
+    results_dir = os.path.join(cache_dir, RESULTS_DIRNAME)
+    if not os.path.isdir(results_dir):
+        return 0
+
+    referenced = {_result_filename(name, entry) for name, entry in manifest.items()}
+    removed = 0
+    for filename in os.listdir(results_dir):
+        if filename not in referenced:
+            os.remove(os.path.join(results_dir, filename))
+            removed += 1
+    return removed
+
+# ==============================================================================
+# 3. DISEÑOS DE HOJA
+# ==============================================================================
+
+def layouts_dir(cache_dir):
+    """Carpeta de la caché de diseños de hoja (src/layout.py)."""
+    return os.path.join(cache_dir, LAYOUTS_DIRNAME)
+
+def rules_dir(cache_dir):
+    """Carpeta de las reglas compiladas (src/rules.py)."""
+    return os.path.join(cache_dir, RULES_DIRNAME)
+
+def clear_layouts(cache_dir):
+    """Elimina los diseños guardados (reconstrucción completa: se vuelven a detectar)."""
+    shutil.rmtree(layouts_dir(cache_dir), ignore_errors=True)
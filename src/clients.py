@@ -0,0 +1,157 @@
+# src/clients.py
+# Resolución del cliente estandarizado y NIT a partir del nombre extraído del reporte.
+# El índice se construye una sola vez desde el mapeo (client_mapping.json):
+#   1. nombre exacto,
+#   2. clave normalizada (sin tildes, puntuación ni sufijos societarios),
+#   3. búsqueda aproximada por trigramas con umbral de confianza.
+# Cada nombre bruto distinto se resuelve una sola vez (memoización).
+
+import re
+import unicodedata
+from collections import Counter
+from src.config import SUFIJOS_SOCIETARIOS, UMBRAL_SIMILITUD_CLIENTE, MARGEN_SIMILITUD_CLIENTE
+
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+# Candidatos (los que más trigramas comparten) que se puntúan en la búsqueda aproximada
+MAX_FUZZY_CANDIDATES = 10
+
+# Métodos de resolución (para estadísticas y avisos)
+METODO_EXACTO = 'exacto'
+METODO_NORMALIZADO = 'normalizado'
+METODO_APROXIMADO = 'aproximado'
+METODO_NO_ENCONTRADO = 'no_encontrado'
+
+# ==============================================================================
+# 1. NORMALIZACIÓN DE NOMBRES
+# ==============================================================================
+
+def _strip_accents(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+def normalize_client_name(name):
+    """
+    Clave de comparación de un nombre de cliente: mayúsculas, sin tildes ni puntuación,
+    iniciales sueltas unidas ("C. I." -> "CI", "S A S" -> "SAS") y sin sufijos societarios.
+    Ej.: "C.I. AGROFRUT S.A.S." y "c.i. Agrofrut SAS" -> "CI AGROFRUT".
+    """
+    text = _PUNCTUATION_PATTERN.sub('', _strip_accents(str(name)).upper())
+
+    tokens = []
+    joining_initials = False
+    for token in text.split():
+        if len(token) == 1 and joining_initials:
+            tokens[-1] += token
+        else:
+            tokens.append(token)
+            joining_initials = len(token) == 1
+
+    suffixes = set(SUFIJOS_SOCIETARIOS)
+    core = [token for token in tokens if token not in suffixes]
+    return ' '.join(core or tokens)
+
+def _identity(entry):
+    return entry.get('estandar'), entry.get('nit')
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# ==============================================================================
+# 2. RESOLUTOR
+# ==============================================================================
+
+class ClientResolver:
+    """
+    Resuelve nombres de cliente contra el mapeo {nombre: {'estandar', 'nit'}}.
+    Construye los índices una vez; `resolve` memoriza el resultado de cada nombre bruto.
+    """
+
+    def __init__(self, mapping, threshold=UMBRAL_SIMILITUD_CLIENTE, margin=MARGEN_SIMILITUD_CLIENTE):
+        self.mapping = mapping
+        self.threshold = threshold
+        self.margin = margin
+        self._memo = {}
+        self.stats = Counter()
+
+        # Clave normalizada -> entrada. Si dos nombres con la misma clave apuntan a
+        # clientes distintos, la clave es ambigua y no se usa.
+        self._by_key = {}
+        ambiguous = set()
+        for raw_name, entry in mapping.items():
+            key = normalize_client_name(raw_name)
+            previous = self._by_key.get(key)
+            if previous is not None and _identity(previous) != _identity(entry):
+                ambiguous.add(key)
+            self._by_key.setdefault(key, entry)
+        for key in ambiguous:
+            del self._by_key[key]
+
+        # Trigrama -> claves normalizadas que lo contienen
+        self._key_trigrams = {key: _trigrams(key) for key in self._by_key}
+        self._trigram_index = {}
+        for key, grams in self._key_trigrams.items():
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(key)
+
+    def match(self, client_name):
+        """
+        Busca la entrada del mapeo para `client_name` (sin memoización).
+        Retorna (entrada o None, método, similitud).
+        """
+        client_key = str(client_name).strip()
+        entry = self.mapping.get(client_key)
+        if entry is not None:
+            return entry, METODO_EXACTO, 1.0
+
+        key = normalize_client_name(client_key)
+        entry = self._by_key.get(key)
+        if entry is not None:
+            return entry, METODO_NORMALIZADO, 1.0
+
+        return self._fuzzy_match(key)
+
+    def _fuzzy_match(self, key):
+        grams = _trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_index.get(gram, ()))
+        if not shared:
+            return None, METODO_NO_ENCONTRADO, 0.0
+
+        scored = sorted(
+            ((2 * count / (len(grams) + len(self._key_trigrams[candidate])), candidate)
+             for candidate, count in shared.most_common(MAX_FUZZY_CANDIDATES)),
+            reverse=True
+        )
+        best_score, best_key = scored[0]
+        second_score = scored[1][0] if len(scored) > 1 else 0.0
+        if best_score >= self.threshold and best_score - second_score >= self.margin:
+            return self._by_key[best_key], METODO_APROXIMADO, round(best_score, 3)
+        return None, METODO_NO_ENCONTRADO, round(best_score, 3)
+
+    def resolve(self, client_name):
+        """
+        Retorna (Cliente Estandarizado, NIT) del nombre extraído. Los nombres no
+        encontrados se retornan en mayúsculas con NIT "NO ENCONTRADO".
+        """
+        if not client_name:
+            return "SIN CLIENTE", "SIN NIT"
+
+        cached = self._memo.get(client_name)
+        if cached is not None:
+            return cached
+
+        client_key = str(client_name).strip()
+        entry, method, score = self.match(client_key)
+        self.stats[method] += 1
+        if entry is None:
+            result = (client_key.upper(), "NO ENCONTRADO")
+        else:
+            result = (entry.get('estandar', client_key.upper()), entry.get('nit', "SIN NIT"))
+            if method == METODO_APROXIMADO:
+                print(f"     -> ⚠️ Cliente '{client_key}' asociado por similitud ({score:.2f}) a '{result[0]}'. "
+                      f"Revise client_mapping.json.")
+
+        self._memo[client_name] = result
+        return result
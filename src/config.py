@@ -6,8 +6,20 @@
 # ==============================================================================
 
 OUTPUT_FILENAME = "Movimientos_VTA_Consolidado.xlsx" 
+OUTPUT_PARQUET_FILENAME = "Movimientos_VTA_Consolidado.parquet"
+OUTPUT_CSV_FILENAME = "Movimientos_VTA_Consolidado.csv"
+OUTPUT_SQLITE_FILENAME = "Movimientos_VTA_Consolidado.sqlite"
+OUTPUT_SUMMARY_FILENAME = "Movimientos_VTA_Resumen.xlsx"
+OUTPUT_DUPLICATES_FILENAME = "Movimientos_VTA_Duplicados.csv"
+OUTPUT_QUERY_DIRNAME = "Movimientos_VTA_Consulta"
+QUERY_STATS_FILENAME = "estadisticas.json"
+SQLITE_TABLE = "movimientos_vta"
 SAC_LOG_FILENAME = "SAC_Reporte_Cumplimiento.log"
 
+# Almacén incremental (opción --store de run_etl.py): una partición por archivo fuente
+STORE_SQLITE_FILENAME = "Movimientos_VTA.sqlite"
+STORE_INDEX_FILENAME = "particiones.json"
+
 # Columna Estándar de Salida (Estructura final con 17 columnas)
 COLUMNAS_ESTANDAR = [
     'FECHA_MOVIMIENTO', 
@@ -29,75 +41,75 @@ COLUMNAS_ESTANDAR = [
     'FUENTE_ARCHIVO'         
 ]
 
-# ==============================================================================
-# 2. LÓGICA DE EXTRACCIÓN DINÁMICA
-# ==============================================================================
+# Tipo de cada columna estándar en las salidas tipadas (Parquet, CSV, SQLite)
+# 'fecha' = fecha ISO, 'numero' = decimal, 'texto' = cadena
+TIPOS_COLUMNAS_ESTANDAR = {
+    col: ('fecha' if col == 'FECHA_MOVIMIENTO'
+          else 'numero' if col in ('CANTIDAD_MOVIMIENTO', 'TARIFA', 'TOTAL')
+          else 'texto')
+    for col in COLUMNAS_ESTANDAR
+}
 
-CABECERA_FECHA = "Fecha"
-
-# Mapeo de Cabeceras de Cantidad/Valor (Bruto -> Estándar)
-COLUMNAS_CANTIDAD_BRUTA = {
-    "Cargue": "CARGUE",     
-    "Descargue": "DESCARGUE", 
-    "Entradas": "ENTRADA",   
-    "Salidas": "SALIDA",     
-    "Cantidad": "CANTIDAD",   
-    "Horas": "HORAS",        
-    "Kg Cargue": "KG_CARGUE_VTA43", 
-    "Kg Descargue": "KG_DESCARGUE",
-    "Cargue cx": "CARGUE_CX",
-    "Descargue cx": "DESCARGUE_CX",
-    "Posiciones Contratadas": "POSICIONES_CONTRATADAS",
-    "Posiciones Ocupadas": "POSICIONES_OCUPADAS",
-    "DIFERENCIA":"POS ADICIONALES",
-    "Saldo cobro":"POSICIONES_OCUPADAS",
-    "Saldo inventario":"POSICIONES_OCUPADAS",
-    "Canastas":"CANTIDAD"
+# Columnas indexadas en la salida SQLite
+COLUMNAS_INDICE_SQLITE = ['FECHA_MOVIMIENTO', 'NIT', 'TIPO_MOVIMIENTO_LIMPIO']
 
-}
+# Columnas del índice (no único) de la tabla del almacén incremental SQLite, para buscar
+# movimientos. Un archivo fuente puede repetir un movimiento legítimo, así que las cargas
+# no reemplazan por esta clave: reemplazan la partición completa de cada archivo
+# (FUENTE_ARCHIVO, la primera columna)
+CLAVE_MOVIMIENTO = ['FUENTE_ARCHIVO', 'ORIGEN_HOJA', 'ORIGEN_SECCION', 'FECHA_MOVIMIENTO', 'SUBTIPO_MOVIMIENTO']
 
-# Mapeo de Cabeceras de Tarifa (Bruto -> Estándar)
-COLUMNAS_TARIFA_BRUTA = {
-    "Tarifa": "TARIFA",
-    "Tarifas": "TARIFA",
-    "Tarifa c/u": "TARIFA",
-    "Tarifa unitaria": "TARIFA"
-}
+# Columnas con pocos valores distintos por archivo (fechas, cliente, sección, hoja,
+# clasificaciones...) que se mantienen en memoria como categóricas (src/frames.py)
+COLUMNAS_CATEGORICAS = [
+    'FECHA_MOVIMIENTO', 'CLIENTE', 'CLIENTE_ESTANDAR', 'NIT',
+    'TIPO_MOVIMIENTO', 'TIPO_MOVIMIENTO_LIMPIO', 'CLASIFICACION_VTA',
+    'SUBTIPO_MOVIMIENTO', 'SUBTIPO_MOVIMIENTO_LIMPIO', 'CLASIFICACION_SUBTIPO',
+    'ORIGEN_SECCION', 'ORIGEN_HOJA', 'FUENTE_ARCHIVO'
+]
 
-# Mapeo de Cabeceras de Total (Bruto -> Estándar)
-COLUMNAS_TOTAL_BRUTA = {
-    "Total": "TOTAL",
-    "Subtotal": "TOTAL",
-    "Total General": "TOTAL"
-}
+# Resúmenes agregados (salida 'resumen'): medidas que se suman y dimensiones del
+# acumulador. 'MES' es el mes (YYYY-MM) de FECHA_MOVIMIENTO
+MEDIDAS_RESUMEN = ['CANTIDAD_MOVIMIENTO', 'TOTAL']
+DIMENSIONES_RESUMEN = ['CLIENTE_ESTANDAR', 'NIT', 'MES', 'CLASIFICACION_VTA', 'CLASIFICACION_SUBTIPO']
+
+# Columnas filtrables en las consultas (salida 'consulta' y `run_etl.py query`): cada
+# partición (mes y NIT) guarda su mínimo y máximo para descartarla sin leerla
+COLUMNAS_FILTRO_CONSULTA = [
+    'FECHA_MOVIMIENTO', 'NIT', 'CLIENTE_ESTANDAR', 'TIPO_MOVIMIENTO_LIMPIO',
+    'CLASIFICACION_VTA', 'CLASIFICACION_SUBTIPO'
+]
 
-# Cabeceras que contienen información de observaciones o texto descriptivo
-COLUMNAS_OBSERVACIONES_BRUTAS = [
-    "Nota",                       
-    "Facturas correspondientes",  
-    "Proveedor",
-    "Remision"                     # Remisión se incluye para contexto
+# Clave canónica de un movimiento para detectar duplicados entre archivos (src/dedup.py):
+# no incluye el origen (archivo, hoja, sección) para reconocer libros reenviados o copiados
+CLAVE_DUPLICADOS = [
+    'NIT', 'CLIENTE_ESTANDAR', 'TIPO_MOVIMIENTO_LIMPIO', 'SUBTIPO_MOVIMIENTO_LIMPIO',
+    'FECHA_MOVIMIENTO', 'CANTIDAD_MOVIMIENTO', 'TARIFA', 'TOTAL'
 ]
 
+# Hojas del resumen (nombre -> dimensiones agrupadas, subconjunto de DIMENSIONES_RESUMEN)
+RESUMENES = {
+    'Cliente y Mes': ['CLIENTE_ESTANDAR', 'NIT', 'MES'],
+    'Clasificacion y Mes': ['MES', 'CLASIFICACION_VTA', 'CLASIFICACION_SUBTIPO'],
+    'Cliente y Clasificacion': DIMENSIONES_RESUMEN,
+}
+
 # ==============================================================================
-# 3. CLASIFICACIÓN DE MOVIMIENTOS Y CLIENTES
+# 2. REGLAS DE EXTRACCIÓN, CLASIFICACIÓN Y CLIENTES
 # ==============================================================================
 
-# Clasificación de VTA (Usando TIPO_MOVIMIENTO_LIMPIO = VTA###)
-VTA_CLASSIFICATION_MAP = {
-    "INGRESO": ["VTA010", "VTA037"], 
-    "SALIDA": ["VTA012", "VTA014"],
-    "INTERNO": ["VTA017", "VTA029"],
-    "SERVICIO_OPERACIONAL": ["VTA019", "VTA036", "VTA011", "VTA021"],
-    "SERVICIO_AUXILIAR": ["VTA025"],
-    "ALMACENAMIENTO": ["VTA008"]
-}
+# Cabeceras reconocidas (fecha, cantidades, tarifa, total, observaciones), hojas
+# omitidas y clasificaciones VTA/subtipo: archivo versionado en la raíz del proyecto,
+# compilado y recargado en caliente por src/rules.py
+REGLAS_FILENAME = "reglas.json"
 
-# Clasificación de Subtipos (Usando SUBTIPO_MOVIMIENTO_LIMPIO)
-SUBTIPO_CLASSIFICATION_MAP = {
-    "KILOS_O_PESO": ["KG_CARGUE_VTA43", "KG_DESCARGUE"],
-    "UNIDADES_Y_OTROS": ["CARGUE", "DESCARGUE", "CARGUE_CX", "DESCARGUE_CX", "CANTIDAD", "POSICIONES_CONTRATADAS", "POSICIONES_OCUPADAS"],
-    "TIEMPO_O_COSTO": ["HORAS"]
-}
+# Mapa de clientes {nombre: {'nit', 'estandar'}} (src/rules.py lo carga al primer uso)
+CLIENT_MAPPING_FILENAME = "client_mapping.json"
 
-# Nota: CLIENT_MAPPING se carga desde 'client_mapping.json' en transform.py
\ No newline at end of file
+# Resolución de clientes (src/clients.py)
+# Sufijos societarios que se ignoran al comparar nombres (ya sin puntuación ni espacios internos)
+SUFIJOS_SOCIETARIOS = ['SAS', 'SA', 'LTDA', 'LIMITADA', 'SENC', 'SENCS', 'SCA', 'SCS', 'EU', 'EIRL']
+# Similitud mínima (coeficiente de Dice sobre trigramas, 0-1) para aceptar una coincidencia aproximada
+UMBRAL_SIMILITUD_CLIENTE = 0.8
+# Diferencia mínima con el segundo mejor candidato (evita asociar nombres ambiguos)
+MARGEN_SIMILITUD_CLIENTE = 0.05
\ No newline at end of file
@@ -0,0 +1,263 @@
+# src/dedup.py
+# Detección de movimientos duplicados entre archivos fuente, en streaming.
+#
+# El mismo libro se reenvía a veces con otro nombre, o una hoja se copia en dos
+# archivos: sin control, el consolidado cuenta dos veces CANTIDAD_MOVIMIENTO y TOTAL.
+# Cada fila transformada se resume en un hash de 64 bits de su clave canónica
+# (CLAVE_DUPLICADOS: cliente, NIT, código VTA, subtipo, fecha, cantidad, tarifa y
+# total). Una fila es duplicada si su clave ya apareció en un archivo anterior (en el
+# orden de carga, del archivo más antiguo al más reciente según load_order: el
+# original es el que existía primero, no el primero por nombre, que podría ser
+# "Reporte Copia_001.xlsx"); las repeticiones dentro de un mismo archivo se conservan, porque
+# pueden ser movimientos legítimos iguales. Además, cada sección tiene un resumen de
+# su contenido (suma de los hashes de sus filas, independiente del orden) para
+# reconocer secciones completas repetidas.
+#
+# Las claves vistas se guardan en un diccionario {hash: archivo}; al superar
+# MAX_CLAVES_EN_MEMORIA se vuelcan a una tabla SQLite temporal, así la memoria queda
+# acotada sin importar el total de filas.
+
+import os
+import sqlite3
+import tempfile
+from src.config import CLAVE_DUPLICADOS, MEDIDAS_RESUMEN
+from src.parsing import numbers_to_float
+from src.metrics import NO_METRICS
+from src.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Políticas ante duplicados (opción --duplicates de run_etl.py)
+DEDUP_POLICIES = ('off', 'report', 'flag', 'drop')
+
+# Claves en memoria antes de volcarlas a disco
+MAX_CLAVES_EN_MEMORIA = 1000000
+
+# Marca que la política 'flag' antepone a OBSERVACIONES
+FLAG_PREFIX = '[DUPLICADO de {}]'
+
+# Regla que decide cuál archivo es el original (columna CRITERIO del reporte)
+CRITERIO_ORIGINAL = 'se conserva el archivo con la fecha de modificación más antigua (en empate, el primero por nombre)'
+
+_SECTION_COLUMNS = ['FUENTE_ARCHIVO', 'ORIGEN_HOJA', 'ORIGEN_SECCION']
+
+# Columnas numéricas de la clave: se comparan como número (igual que las salidas tipadas)
+_NUMERIC_KEY_COLUMNS = set(MEDIDAS_RESUMEN) | {'TARIFA'}
+
+# ==============================================================================
+# 1. ÍNDICE DE CLAVES CON VOLCADO A DISCO
+# ==============================================================================
+
+class _KeyIndex:
+    """Conjunto {hash de clave: id de archivo} en memoria, con volcado a SQLite al superar `max_memory_keys`."""
+
+    def __init__(self, max_memory_keys=MAX_CLAVES_EN_MEMORIA):
+        self.max_memory_keys = max_memory_keys
+        self._memory = {}
+        self._conn = None
+        self._path = None
+        self.spilled = 0
+
+    def lookup(self, hashes):
+        """Archivo de origen de cada hash de `hashes` (array int64 sin repetidos); -1 si no se ha visto."""
+        origins = np.fromiter((self._memory.get(h, -1) for h in hashes.tolist()), dtype=np.int64, count=len(hashes))
+        missing = origins == -1
+        if self._conn is not None and missing.any():
+            self._conn.execute('DELETE FROM consulta')
+            self._conn.executemany('INSERT INTO consulta VALUES (?)', ((h,) for h in hashes[missing].tolist()))
+            found = dict(self._conn.execute('SELECT c.h, k.archivo FROM consulta c JOIN claves k ON k.h = c.h'))
+            if found:
+                origins[missing] = [found.get(h, -1) for h in hashes[missing].tolist()]
+        return origins
+
+    def add(self, hashes, file_ids):
+        """Registra hashes nuevos (no vistos) con su archivo de origen."""
+        self._memory.update(zip(hashes.tolist(), file_ids.tolist()))
+        if len(self._memory) > self.max_memory_keys:
+            self._spill()
+
+    def _spill(self):
+        if self._conn is None:
+            fd, self._path = tempfile.mkstemp(prefix='duplicados_', suffix='.sqlite')
+            os.close(fd)
+            self._conn = sqlite3.connect(self._path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = OFF")
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.execute('CREATE TABLE claves (h INTEGER PRIMARY KEY, archivo INTEGER)')
+            self._conn.execute('CREATE TEMP TABLE consulta (h INTEGER)')
+        self._conn.execute("BEGIN")
+        self._conn.executemany('INSERT OR IGNORE INTO claves VALUES (?, ?)', self._memory.items())
+        self._conn.execute("COMMIT")
+        self.spilled += len(self._memory)
+        self._memory.clear()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            os.remove(self._path)
+            self._conn = None
+
+# ==============================================================================
+# 2. DETECTOR
+# ==============================================================================
+
+def load_order(file_paths):
+    """Rutas en el orden de carga de CRITERIO_ORIGINAL: fecha de modificación más antigua primero y luego el nombre."""
+    keyed = []
+    for path in file_paths:
+        try:
+            keyed.append((os.stat(path).st_mtime_ns, os.path.basename(path), path))
+        except FileNotFoundError:
+            # Borrado entre el listado y el stat
+            continue
+    return [path for _, _, path in sorted(keyed)]
+
+def row_hashes(frame):
+    """Hash de 64 bits (int64) de la clave CLAVE_DUPLICADOS de cada fila."""
+    key = pd.DataFrame({
+        col: numbers_to_float(frame[col]) if col in _NUMERIC_KEY_COLUMNS else frame[col]
+        for col in CLAVE_DUPLICADOS
+    })
+    return pd.util.hash_pandas_object(key, index=False).to_numpy().view(np.int64)
+
+class DuplicateDetector:
+    """
+    Detecta filas y secciones duplicadas entre archivos en los bloques que recibe
+    `iter_filtered`, y aplica la política: 'report' (solo informa), 'flag' (marca
+    OBSERVACIONES) o 'drop' (quita las filas duplicadas). `findings` acumula una
+    entrada por sección con duplicados para el reporte.
+    """
+
+    def __init__(self, policy='report', max_memory_keys=MAX_CLAVES_EN_MEMORIA):
+        self.policy = policy
+        self.keys = _KeyIndex(max_memory_keys)
+        self.files = []          # id de archivo -> nombre
+        self._file_ids = {}
+        self._sections = {}      # resumen de contenido -> (archivo, hoja, sección)
+        self.findings = []
+        self._file_counts = {}   # id de archivo -> [filas, filas duplicadas, {archivo origen: filas}]
+        self.rows = 0
+        self.duplicate_rows = 0
+
+    def _file_id(self, name):
+        if name not in self._file_ids:
+            self._file_ids[name] = len(self.files)
+            self.files.append(name)
+        return self._file_ids[name]
+
+    def _origins(self, hashes, file_ids):
+        """Archivo donde apareció primero cada clave: uno anterior, o el primero de este bloque."""
+        unique, first_pos, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        origins = self.keys.lookup(unique)
+        new = origins == -1
+        origins[new] = file_ids[first_pos[new]]
+        self.keys.add(unique[new], origins[new])
+        return origins[inverse]
+
+    def process(self, chunk):
+        """Detecta duplicados en el bloque y retorna el bloque según la política."""
+        if len(chunk) == 0:
+            return chunk
+        hashes = row_hashes(chunk)
+        # Un id por nombre distinto (un bloque suele venir de un solo archivo)
+        codes, names = pd.factorize(chunk['FUENTE_ARCHIVO'].astype(object), use_na_sentinel=False)
+        file_ids = np.array([self._file_id(name) for name in names], dtype=np.int64)[codes]
+        origins = self._origins(hashes, file_ids)
+        duplicated = origins != file_ids
+
+        self.rows += len(chunk)
+        self.duplicate_rows += int(duplicated.sum())
+        self._count_files(file_ids, duplicated, origins)
+        self._record_sections(chunk, hashes, duplicated, origins)
+        if not duplicated.any():
+            return chunk
+
+        if self.policy == 'drop':
+            return chunk[~duplicated]
+        if self.policy == 'flag':
+            chunk = chunk.copy()
+            marks = pd.Series([FLAG_PREFIX.format(self.files[i]) for i in origins[duplicated]],
+                              index=chunk.index[duplicated])
+            observations = chunk.loc[duplicated, 'OBSERVACIONES'].fillna('').astype(str)
+            chunk.loc[duplicated, 'OBSERVACIONES'] = (marks + ' ' + observations).str.rstrip()
+        return chunk
+
+    def _count_files(self, file_ids, duplicated, origins):
+        for file_id, rows in zip(*np.unique(file_ids, return_counts=True)):
+            self._file_counts.setdefault(int(file_id), [0, 0, {}])[0] += int(rows)
+        pairs, counts = np.unique(np.stack([file_ids[duplicated], origins[duplicated]]), axis=1, return_counts=True)
+        for (file_id, origin), rows in zip(pairs.T.tolist(), counts.tolist()):
+            entry = self._file_counts[file_id]
+            entry[1] += rows
+            entry[2][origin] = entry[2].get(origin, 0) + rows
+
+    def _record_sections(self, chunk, hashes, duplicated, origins):
+        """Resumen de contenido por sección y entrada de reporte de las secciones con duplicados."""
+        sections = pd.DataFrame({
+            **{col: chunk[col].astype(object).to_numpy() for col in _SECTION_COLUMNS},
+            'h': hashes.view(np.uint64), 'dup': duplicated, 'origen': origins,
+        })
+        for (file_name, sheet, section), group in sections.groupby(_SECTION_COLUMNS, sort=False, dropna=False):
+            # Suma módulo 2^64 de los hashes: no depende del orden de las filas
+            digest = (int(group['h'].sum()), len(group))
+            same_as = self._sections.setdefault(digest, (file_name, sheet, section))
+            whole_copy = same_as[0] != file_name
+            dup_rows = int(group['dup'].sum())
+            if not dup_rows:
+                continue
+            origin = self.files[int(group.loc[group['dup'], 'origen'].mode().iloc[0])]
+            self.findings.append({
+                'ARCHIVO': file_name, 'HOJA': sheet, 'SECCION': section,
+                'FILAS_SECCION': len(group), 'FILAS_DUPLICADAS': dup_rows,
+                'TIPO': 'seccion completa' if whole_copy else 'filas',
+                'DUPLICA_A': ' / '.join(str(v) for v in same_as) if whole_copy else origin,
+                'CRITERIO': CRITERIO_ORIGINAL,
+            })
+
+    def iter_filtered(self, chunks, metrics=None):
+        """Genera los bloques de `chunks` con la política aplicada (en streaming)."""
+        metrics = metrics or NO_METRICS
+        try:
+            for chunk in chunks:
+                with metrics.stage('dedup', rows_in=len(chunk)) as record:
+                    chunk = self.process(chunk)
+                    record['rows_out'] = len(chunk)
+                if len(chunk):
+                    yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def duplicate_files(self):
+        """Archivos repetidos completos: {archivo: archivo que duplica} (todas sus filas vienen de uno solo)."""
+        copies = {}
+        for file_id, (rows, dup_rows, origins) in self._file_counts.items():
+            if rows and dup_rows == rows and len(origins) == 1:
+                copies[self.files[file_id]] = self.files[next(iter(origins))]
+        return copies
+
+    def write_report(self, output_path):
+        """
+        Escribe el reporte CSV: una fila por archivo repetido completo y una por sección
+        con duplicados, con la regla que eligió el original (CRITERIO). Retorna la ruta,
+        o None si no hubo duplicados.
+        """
+        if not self.findings:
+            return None
+        copies = self.duplicate_files()
+        file_rows = [
+            {'ARCHIVO': name, 'HOJA': '', 'SECCION': '',
+             'FILAS_SECCION': self._file_counts[self._file_ids[name]][0],
+             'FILAS_DUPLICADAS': self._file_counts[self._file_ids[name]][1],
+             'TIPO': 'archivo completo', 'DUPLICA_A': origin, 'CRITERIO': CRITERIO_ORIGINAL}
+            for name, origin in copies.items()
+        ]
+        report = pd.DataFrame(file_rows + self.findings)
+        tmp_path = output_path + '.tmp'
+        report.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, output_path)
+        return output_path
+
+    def close(self):
+        self.keys.close()
@@ -4,11 +4,15 @@ import pandas as pd
 import numpy as np
 import re
 import os 
-from src.config import (
-    COLUMNAS_CANTIDAD_BRUTA, CABECERA_FECHA, 
-    COLUMNAS_TARIFA_BRUTA, COLUMNAS_TOTAL_BRUTA, 
-    COLUMNAS_OBSERVACIONES_BRUTAS
-)
+import zipfile
+from contextlib import closing
+from openpyxl import load_workbook
+from src.rules import current_rules, header_key, ROL_FECHA, ROL_CANTIDAD, ROL_TARIFA, ROL_TOTAL, ROL_OBSERVACION
+from src.metrics import NO_METRICS
+from src.parsing import numbers_to_float, dates_to_iso, detect_date_format
+from src.frames import compact_frame
+from src.layout import sheet_fingerprint, FINGERPRINT_ROWS
+from src.prescan import scan_workbook, list_sheet_parts, sheet_last_rows
 
 # ==============================================================================
 # FUNCIONES AUXILIARES DE BÚSQUEDA Y NORMALIZACIÓN
@@ -18,9 +22,7 @@ def _normalize_header_name(header):
     """Limpia y normaliza el nombre de una cabecera para búsqueda."""
     if pd.isna(header):
         return ""
-    s = str(header).strip().upper()
-    s = re.sub(r'[^\w\s]', '', s) 
-    return s.replace(' ', '')
+    return header_key(header)
 
 def _normalize_cell_content(cell_value):
     """Limpia y normaliza el contenido de una celda para buscar 'Cliente'."""
@@ -47,160 +49,528 @@ def _find_client_name(sheet, max_rows=20):
 # FUNCIONES DE EXTRACCIÓN DE SECCIONES
 # ==============================================================================
 
-def _find_header_indices(sheet, section_row_start, max_rows=10):
-    """Identifica las columnas de Fecha, Cantidad, Tarifa, Total y Observaciones."""
-    header_row_index = -1
-    for i in range(section_row_start, section_row_start + max_rows):
-        if i >= len(sheet): break
-        row = sheet.iloc[i]
-        if row.apply(lambda x: _normalize_header_name(x) == _normalize_header_name(CABECERA_FECHA)).any():
-            header_row_index = i
-            break
-            
-    if header_row_index == -1: return {}, None, section_row_start
-        
-    header_row = sheet.iloc[header_row_index]
+# Las cabeceras reconocidas y su índice (cabecera normalizada -> rol, nombre estándar,
+# prioridad) vienen de las reglas compiladas (src/rules.py, reglas.json). En
+# header_info, la columna de fecha queda bajo la clave ROL_FECHA.
+
+def _resolve_header_row(normalized_row, header_index):
+    """
+    Resuelve en una sola pasada una fila de cabeceras ya normalizada
+    (lista de pares (columna, cabecera_normalizada)) con el índice de cabeceras de las reglas.
+    """
+    first_cols = {}
+    for col_idx, key in normalized_row:
+        if key in header_index and key not in first_cols:
+            first_cols[key] = col_idx
+
     header_indices = {}
-    
-    # 1. Índice de Fecha
-    fecha_index = header_row[header_row.apply(lambda x: _normalize_header_name(x) == _normalize_header_name(CABECERA_FECHA))].index
-    if not fecha_index.empty:
-        header_indices[CABECERA_FECHA] = fecha_index[0]
-        
-    # 2. Índices de Cantidades (Múltiples posibles)
     quantity_indices = {}
-    for original_header, normalized_name in COLUMNAS_CANTIDAD_BRUTA.items():
-        q_idx = header_row[header_row.apply(lambda x: _normalize_header_name(x) == _normalize_header_name(original_header))].index
-        if not q_idx.empty:
-            quantity_indices[normalized_name] = q_idx[0]
+    obs_map = {}
+    for key in sorted(first_cols, key=lambda k: header_index[k][2]):
+        role, estandar, _ = header_index[key]
+        col_idx = first_cols[key]
+        if role == ROL_FECHA:
+            header_indices[ROL_FECHA] = col_idx
+        elif role == ROL_CANTIDAD:
+            quantity_indices[estandar] = col_idx
+        elif role in (ROL_TARIFA, ROL_TOTAL):
+            header_indices.setdefault(estandar, col_idx)
+        elif role == ROL_OBSERVACION:
+            obs_map[estandar] = col_idx
+
     header_indices['QUANTITIES'] = quantity_indices
+    header_indices['OBSERVACIONES_MAP'] = obs_map
+    return header_indices
 
-    # 3. Tarifa y Total
-    for h_map, brutos in [( "TARIFA", COLUMNAS_TARIFA_BRUTA), ("TOTAL", COLUMNAS_TOTAL_BRUTA)]:
-        for original_header in brutos:
-            idx = header_row[header_row.apply(lambda x: _normalize_header_name(x) == _normalize_header_name(original_header))].index
-            if not idx.empty:
-                header_indices[h_map] = idx[0]
-                break
-        
-    # 4. Observaciones
-    obs_map = {}
-    for obs_header in COLUMNAS_OBSERVACIONES_BRUTAS:
-        idx = header_row[header_row.apply(lambda x: _normalize_header_name(x) == _normalize_header_name(obs_header))].index
-        if not idx.empty:
-            obs_map[obs_header] = idx[0]
-    header_indices['OBSERVACIONES_MAP'] = obs_map 
-    
-    return header_indices, header_row_index + 1
+def _find_header_indices(sheet, section_row_start, max_rows=10):
+    """Identifica las columnas de Fecha, Cantidad, Tarifa, Total y Observaciones."""
+    rules = current_rules()
+    for i in range(section_row_start, min(section_row_start + max_rows, len(sheet))):
+        row = sheet.iloc[i]
+        normalized_row = [(col_idx, _normalize_header_name(value)) for col_idx, value in row.items()]
+        if any(key == rules.date_key for _, key in normalized_row):
+            return _resolve_header_row(normalized_row, rules.header_index), i + 1
 
-def _extract_data_from_section(sheet, section_title, section_range, sheet_name, file_name, client_name):
-    """Extrae datos permitiendo múltiples métricas por fila (ej. Cargue y Descargue)."""
+    return {}, section_row_start
+
+# Columnas de la salida de extracción (mismo contenido que los antiguos diccionarios por fila)
+COLUMNAS_EXTRACCION = [
+    'FECHA_MOVIMIENTO',
+    'CLIENTE',
+    'TIPO_MOVIMIENTO',
+    'ORIGEN_SECCION',
+    'ORIGEN_HOJA',
+    'FUENTE_ARCHIVO',
+    'SUBTIPO_MOVIMIENTO',
+    'CANTIDAD_MOVIMIENTO',
+    'TARIFA',
+    'TOTAL',
+    'OBSERVACIONES'
+]
+
+def _empty_extraction_frame():
+    """DataFrame vacío con las columnas de extracción."""
+    return pd.DataFrame(columns=COLUMNAS_EXTRACCION)
+
+def _build_observations(block, obs_map):
+    """Construye la columna de observaciones ('Nota: x | Proveedor: y') para cada fila del bloque."""
+    observations = pd.Series('', index=block.index, dtype=object)
+    for name, idx in obs_map.items():
+        column = block.iloc[:, idx]
+        has_value = column.notna()
+        part = (name + ': ' + column.map(str)).where(has_value, '')
+        separator = pd.Series(np.where(has_value & (observations != ''), ' | ', ''), index=block.index)
+        observations = observations + separator + part
+    return observations
+
+def _column_numbers(column):
+    """
+    Columna de la sección como float (NaN si no es número), con la convención decimal
+    detectada en la propia columna. Las celdas VERDADERO/FALSO no cuentan como número.
+    """
+    numbers = numbers_to_float(column)
+    is_bool = np.fromiter((isinstance(v, (bool, np.bool_)) for v in column.to_numpy(dtype=object)), dtype=bool, count=len(column))
+    return numbers.mask(is_bool) if is_bool.any() else numbers
+
+def _section_numbers(block, col_idx):
+    """Columna de la sección como número; las celdas que no son número se conservan tal cual."""
+    raw = block.iloc[:, col_idx]
+    numbers = _column_numbers(raw)
+    return numbers.astype(object).where(numbers.notna(), raw)
+
+def _extract_section_frame(sheet, section_title, section_range, sheet_name, file_name, client_name, header=None):
+    """
+    Extracción columnar de una sección: toma el bloque de datos una sola vez,
+    pasa las columnas de cantidad a formato largo (una fila por métrica) y
+    filtra fechas vacías y cantidades cero con máscaras booleanas.
+    El formato de fecha se detecta una vez por sección y la convención decimal una vez
+    por columna de origen de la sección (src/parsing.py): las fechas salen como
+    'YYYY-MM-DD' y las cantidades, la tarifa y el total como número (las celdas de
+    fecha, tarifa o total que no se pueden interpretar se conservan tal cual).
+    `header` es el resultado de _find_header_indices, si ya se conoce.
+    """
     start_row, end_row = section_range
-    extracted_data = []
 
-    header_info, data_row_start = _find_header_indices(sheet, start_row, end_row - start_row)
+    header_info, data_row_start = header or _find_header_indices(sheet, start_row, end_row - start_row)
     
-    if CABECERA_FECHA not in header_info or not header_info.get('QUANTITIES'):
-        return []
+    if ROL_FECHA not in header_info or not header_info.get('QUANTITIES'):
+        return _empty_extraction_frame()
         
-    fecha_idx = header_info[CABECERA_FECHA]
+    fecha_idx = header_info[ROL_FECHA]
     quant_map = header_info['QUANTITIES']
     tarifa_idx = header_info.get("TARIFA") 
     total_idx = header_info.get("TOTAL")   
     obs_map = header_info.get('OBSERVACIONES_MAP', {})
-    
-    for i in range(data_row_start, end_row):
-        row = sheet.iloc[i] 
-        fecha_val = row.iloc[fecha_idx] if fecha_idx < len(row) else np.nan 
-
-        if pd.isna(fecha_val):
-            continue
-
-        # Procesar cada columna de cantidad detectada de forma independiente
-        for q_name, q_idx in quant_map.items():
-            val = row.iloc[q_idx] if q_idx < len(row) else np.nan
-            
-            try:
-                # Limpieza y validación numérica
-                num_val = float(str(val).replace('$', '').replace('.', '').replace(',', '').strip()) if pd.notna(val) else 0
-                
-                if num_val != 0:
-                    # Construir observaciones
-                    observations = []
-                    for name, idx in obs_map.items():
-                        obs_val = row.iloc[idx] if idx < len(row) else None
-                        if pd.notna(obs_val): observations.append(f"{name}: {obs_val}")
-
-                    row_data = {
-                        'FECHA_MOVIMIENTO': fecha_val,
-                        'CLIENTE': client_name,
-                        'TIPO_MOVIMIENTO': section_title,
-                        'ORIGEN_SECCION': section_title,
-                        'ORIGEN_HOJA': sheet_name,
-                        'FUENTE_ARCHIVO': file_name,
-                        'SUBTIPO_MOVIMIENTO': q_name,
-                        'CANTIDAD_MOVIMIENTO': val, # Se mantiene el original para transform.py
-                        'TARIFA': row.iloc[tarifa_idx] if tarifa_idx is not None else None,    
-                        'TOTAL': row.iloc[total_idx] if total_idx is not None else None,     
-                        'OBSERVACIONES': ' | '.join(observations)
-                    }
-                    extracted_data.append(row_data)
-            except (ValueError, TypeError):
-                continue
-
-    return extracted_data
+
+    block = sheet.iloc[data_row_start:end_row]
+    block = block[block.iloc[:, fecha_idx].notna().to_numpy()]
+    if block.empty:
+        return _empty_extraction_frame()
+
+    # Cada columna de origen se interpreta con su propia convención decimal, antes de
+    # pasar a formato largo: una columna sin evidencia no toma la de las demás
+    quantities = pd.DataFrame({q_name: _column_numbers(block.iloc[:, q_idx]) for q_name, q_idx in quant_map.items()})
+    # Formato largo: (fila, métrica) en orden de fila y, dentro de la fila, en el orden de quant_map
+    long = quantities.melt(var_name='SUBTIPO_MOVIMIENTO', value_name='CANTIDAD_MOVIMIENTO', ignore_index=False)
+    long = long.sort_index(kind='stable')
+
+    num_vals = long['CANTIDAD_MOVIMIENTO']
+    keep = (num_vals.notna() & (num_vals != 0)).to_numpy()
+    long, num_vals = long[keep], num_vals[keep]
+    if long.empty:
+        return _empty_extraction_frame()
+
+    rows = block.loc[long.index]
+    observations = _build_observations(block, obs_map).loc[long.index]
+    raw_dates = rows.iloc[:, fecha_idx]
+    fechas = dates_to_iso(raw_dates, detect_date_format(block.iloc[:, fecha_idx]))
+
+    return pd.DataFrame({
+        'FECHA_MOVIMIENTO': fechas.where(fechas.notna(), raw_dates).to_numpy(),
+        'CLIENTE': client_name,
+        'TIPO_MOVIMIENTO': section_title,
+        'ORIGEN_SECCION': section_title,
+        'ORIGEN_HOJA': sheet_name,
+        'FUENTE_ARCHIVO': file_name,
+        'SUBTIPO_MOVIMIENTO': long['SUBTIPO_MOVIMIENTO'].to_numpy(),
+        'CANTIDAD_MOVIMIENTO': num_vals.to_numpy(),
+        'TARIFA': _section_numbers(block, tarifa_idx).loc[long.index].to_numpy() if tarifa_idx is not None else None,
+        'TOTAL': _section_numbers(block, total_idx).loc[long.index].to_numpy() if total_idx is not None else None,
+        'OBSERVACIONES': observations.to_numpy()
+    }, columns=COLUMNAS_EXTRACCION)
+
+def _extract_data_from_section(sheet, section_title, section_range, sheet_name, file_name, client_name):
+    """Extrae datos permitiendo múltiples métricas por fila (ej. Cargue y Descargue)."""
+    frame = _extract_section_frame(sheet, section_title, section_range, sheet_name, file_name, client_name)
+    return frame.to_dict('records')
+
+# ==============================================================================
+# DETECCIÓN DE SECCIONES VTA
+# ==============================================================================
+
+VTA_PATTERN = re.compile(r'\(VTA\d{3}\)')
+
+def _find_vta_anchors(sheet):
+    """
+    Escanea la hoja completa de forma vectorizada y retorna la lista de anclas
+    (fila, columna, título) de las secciones VTA, una por fila (la primera
+    celda que coincide), en orden de fila.
+    """
+    values = sheet.to_numpy(dtype=object)
+    row_idx, col_idx = np.nonzero(pd.notna(values))
+    if len(row_idx) == 0:
+        return []
+
+    # Celdas no vacías apiladas en orden fila-columna: una sola pasada str/upper + regex
+    cells = pd.Series(values[row_idx, col_idx], dtype=object)
+    matches = cells.astype(str).str.upper().str.contains(VTA_PATTERN, na=False).to_numpy()
+
+    hit_rows, hit_cols, hit_values = row_idx[matches], col_idx[matches], cells.to_numpy()[matches]
+    first_in_row = np.concatenate(([True], hit_rows[1:] != hit_rows[:-1])) if len(hit_rows) else hit_rows.astype(bool)
+
+    return [
+        (int(r), int(c), str(v))
+        for r, c, v in zip(hit_rows[first_in_row], hit_cols[first_in_row], hit_values[first_in_row])
+    ]
+
+# ==============================================================================
+# LECTURA EN STREAMING (OPENPYXL, UNA SOLA PASADA)
+# ==============================================================================
+
+# Filas por bloque del recorrido en streaming (la detección de secciones se vectoriza por bloque)
+STREAM_BLOCK_ROWS = 2000
+
+# Filas iniciales de la primera hoja donde se busca la etiqueta 'Cliente'
+CLIENT_SEARCH_ROWS = 20
+
+# Textos que pandas interpreta como vacíos al leer Excel (na_values por defecto) y errores de Excel
+_NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!'
+])
+
+def _convert_cell_value(value):
+    """Convierte el valor de una celda igual que pd.read_excel (vacíos -> NaN, 1.0 -> 1)."""
+    if value is None:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in _NA_STRINGS:
+        return np.nan
+    return value
+
+def _rows_to_frame(rows):
+    """
+    DataFrame (dtype object, como las columnas con cabeceras de pd.read_excel) a partir de
+    filas de valores. Sin dimensión, cada fila trae hasta su última celda: se completa con NaN.
+    """
+    width = max((len(row) for row in rows), default=0)
+    return pd.DataFrame(
+        [[_convert_cell_value(v) for v in row] + [np.nan] * (width - len(row)) for row in rows], dtype=object
+    )
+
+def _iter_row_blocks(rows, block_rows=STREAM_BLOCK_ROWS):
+    """Agrupa el iterador de filas en bloques (DataFrames) de hasta `block_rows` filas."""
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= block_rows:
+            yield _rows_to_frame(block)
+            block = []
+    if block:
+        yield _rows_to_frame(block)
+
+def _iter_sheet_sections(rows, block_rows=STREAM_BLOCK_ROWS, find_anchors=None):
+    """
+    Recorre las filas de una hoja una sola vez y genera (ancla, bloque) por cada
+    sección VTA, donde el ancla es (fila en la hoja, columna, título) y el bloque va
+    desde la fila del título hasta la fila anterior al siguiente título (o al final
+    de la hoja). Solo se mantiene en memoria la sección en curso.
+    `find_anchors(bloque, fila_inicial)` retorna las anclas de cada bloque de filas
+    (por defecto, _find_vta_anchors).
+    """
+    anchor, pieces, base = None, [], 0
+
+    for block in _iter_row_blocks(rows, block_rows):
+        cut = 0
+        block_anchors = find_anchors(block, base) if find_anchors else _find_vta_anchors(block)
+        for row_idx, col_idx, anchor_title in block_anchors:
+            if anchor is not None:
+                pieces.append(block.iloc[cut:row_idx])
+                yield anchor, pd.concat(pieces, ignore_index=True)
+            anchor, pieces, cut = (base + row_idx, col_idx, anchor_title), [], row_idx
+        if anchor is not None:
+            pieces.append(block.iloc[cut:])
+        base += len(block)
+
+    if anchor is not None:
+        yield anchor, pd.concat(pieces, ignore_index=True)
+
+class _SheetLayout:
+    """
+    Diseño de una hoja durante su recorrido (src/layout.py). Con un diseño guardado
+    para la huella de la hoja, las anclas y cabeceras se verifican en sus celdas en
+    lugar de buscarse; al primer desajuste de un ancla se vuelve a la detección
+    completa para el resto de la hoja. Acumula el diseño encontrado para guardarlo.
+    """
+
+    def __init__(self, layouts, sheet_name, last_row):
+        self.layouts = layouts
+        self.sheet_name = sheet_name
+        self.last_row = last_row
+        self.fingerprint = None
+        self.expected = None
+        self.status = 'miss'
+        self.sections = []
+
+    def find_anchors(self, block, base):
+        if base == 0:
+            head = block.iloc[:FINGERPRINT_ROWS].itertuples(index=False, name=None)
+            # Las reglas entran en la huella: otras cabeceras reconocidas, otro diseño
+            self.fingerprint = sheet_fingerprint(self.sheet_name, self.last_row, head, current_rules().digest)
+            cached = self.layouts.get(self.fingerprint)
+            if cached is not None:
+                self.expected, self.status = cached['sections'], 'hit'
+        if self.expected is None:
+            return _find_vta_anchors(block)
+
+        end = base + len(block)
+        anchors = []
+        for section in self.expected:
+            row = section['row'] - base
+            if base <= section['row'] < end:
+                if section['col'] >= block.shape[1] or block.iat[row, section['col']] != section['title']:
+                    # La hoja ya no coincide con la plantilla: detección completa
+                    self.expected, self.status = None, 'mismatch'
+                    return _find_vta_anchors(block)
+                anchors.append((row, section['col'], section['title']))
+        return anchors
+
+    def find_header(self, anchor, section):
+        """Cabeceras de la sección: las del diseño si sus celdas coinciden; si no, _find_header_indices."""
+        cached = None
+        if self.expected is not None:
+            cached = next((s for s in self.expected if s['row'] == anchor[0]), None)
+        if cached is not None and _header_matches(section, cached):
+            header = cached['header'], cached['header_row'] + 1
+        else:
+            header = _find_header_indices(section, 0, len(section))
+        self.sections.append({
+            'row': anchor[0], 'col': anchor[1], 'title': anchor[2],
+            'header_row': header[1] - 1 if header[0] else None, 'header': header[0],
+        })
+        return header
+
+    def save(self):
+        if self.fingerprint is not None:
+            self.layouts.put(self.fingerprint, {'sections': self.sections})
+
+def _header_matches(section, cached):
+    """Verifica en la fila de cabeceras guardada la cabecera de fecha y las de cantidad."""
+    header_row, header_info = cached['header_row'], cached['header']
+    if header_row is None:
+        return False
+    if header_row >= len(section):
+        return False
+    row = section.iloc[header_row]
+    rules = current_rules()
+    expected = {header_info[ROL_FECHA]: rules.date_header}
+    expected.update({idx: name for name, idx in header_info['QUANTITIES'].items()})
+    for col_idx, name in expected.items():
+        if col_idx >= len(row):
+            return False
+        key = _normalize_header_name(row.iloc[col_idx])
+        if key not in rules.header_index or rules.header_index[key][1] != name:
+            return False
+    return True
+
+def _extract_sheet_frames(rows, sheet_name, file_name, client_name, metrics=NO_METRICS, sheet_layout=None):
+    """
+    Extrae (en streaming) los DataFrames de todas las secciones VTA de una hoja.
+    Con `sheet_layout` (_SheetLayout) se usa y actualiza la caché de diseños.
+    """
+    section_metrics = metrics if metrics.wants('section') else NO_METRICS
+    find_anchors = sheet_layout.find_anchors if sheet_layout is not None else None
+    frames = []
+    for anchor, section in _iter_sheet_sections(rows, find_anchors=find_anchors):
+        title = anchor[2]
+        with section_metrics.stage('extract.section', file=file_name, sheet=sheet_name, section=title) as record:
+            header = sheet_layout.find_header(anchor, section) if sheet_layout is not None else None
+            frame = _extract_section_frame(
+                section, title, (0, len(section)), sheet_name, file_name, client_name, header
+            )
+            record['rows_in'] = len(section)
+            record['rows_out'] = len(frame)
+        if not frame.empty:
+            frames.append(frame)
+    if sheet_layout is not None:
+        sheet_layout.save()
+    return frames
+
+def _read_client_name(worksheet):
+    """Busca el cliente en las primeras filas de la hoja (lectura parcial, sin recorrer el resto)."""
+    # La dimensión declarada puede estar mal: se leen las filas tal como están en el XML
+    worksheet.reset_dimensions()
+    head = list(worksheet.iter_rows(max_row=CLIENT_SEARCH_ROWS, values_only=True))
+    return _find_client_name(_rows_to_frame(head), CLIENT_SEARCH_ROWS) if head else ""
+
+def _resolve_client_name(workbook, file_name, has_label=True):
+    """
+    Cliente del libro: etiqueta 'Cliente' de la primera hoja o, si no está, el inicio del
+    nombre del archivo. Con `has_label` False (el pre-escaneo no la encontró) no se busca.
+    """
+    client_name = ""
+    if has_label and workbook.sheetnames:
+        client_name = _read_client_name(workbook[workbook.sheetnames[0]])
+
+    if not client_name:
+        client_name = file_name.split(' ')[0].split('-')[0].split('_')[0]
+    return client_name
+
+def _is_omitted_sheet(sheet_name):
+    return sheet_name.lower() in current_rules().omitted_sheets
+
+# ==============================================================================
+# LISTADO Y PRE-ESCANEO DE HOJAS (SIN ABRIR EL LIBRO)
+# ==============================================================================
+
+def list_sheet_names(file_path):
+    """
+    Nombres de las hojas del libro, en orden, leídos de xl/workbook.xml dentro del
+    zip (sin cargar estilos, textos compartidos ni datos de las hojas).
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        return [name for name, _ in list_sheet_parts(archive)]
+
+def prescan_workbook(file_path):
+    """Pre-escaneo del libro (src/prescan.py), o None si no se pudo leer como zip (openpyxl reportará el error)."""
+    try:
+        return scan_workbook(file_path)
+    except Exception:
+        return None
+
+def _sheet_last_rows(file_path, sheet_names):
+    """Última fila de cada hoja (prescan.sheet_last_rows), o {} si no se pudo leer el zip (sin caché de diseños)."""
+    try:
+        return sheet_last_rows(file_path, sheet_names)
+    except Exception:
+        return {}
+
+def sheets_to_extract(file_path, scan=None):
+    """
+    Hojas del libro que se extraen, en el orden del libro: las que tienen títulos de
+    sección VTA según el pre-escaneo `scan` (se hace si no se pasa), menos las de
+    las hojas omitidas de las reglas. Si el pre-escaneo falla, todas menos las omitidas.
+    """
+    scan = scan or prescan_workbook(file_path)
+    if scan is None:
+        return [name for name in list_sheet_names(file_path) if not _is_omitted_sheet(name)]
+    return [name for name, has_vta in scan.sheets if has_vta and not _is_omitted_sheet(name)]
+
+def skipped_sheets(scan):
+    """Hojas que el pre-escaneo descarta por no tener secciones VTA (sin contar las hojas omitidas de las reglas)."""
+    return [name for name, has_vta in scan.sheets if not has_vta and not _is_omitted_sheet(name)]
+
+def read_client_name(file_path, scan=None):
+    """Cliente del libro (ver _resolve_client_name), para resolverlo una sola vez por archivo."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        return _resolve_client_name(workbook, os.path.basename(file_path), scan is None or scan.has_client_label)
+    finally:
+        workbook.close()
 
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
 
+def _extract_sheet(workbook, sheet_name, file_name, client_name, metrics, layouts=None, last_row=None):
+    """
+    Extrae una hoja del libro abierto. Retorna la lista de DataFrames de sus secciones.
+    `last_row` (última fila del XML, prescan.sheet_last_rows) entra en la huella del diseño:
+    sin ella no se usa la caché de diseños, que no distinguiría hojas con más filas o secciones.
+    """
+    sheet_metrics = metrics if metrics.wants('sheet') else NO_METRICS
+    with sheet_metrics.stage('extract.sheet', file=file_name, sheet=sheet_name) as record:
+        worksheet = workbook[sheet_name]
+        # Como pd.read_excel: la dimensión declarada puede estar mal y recortar filas o columnas
+        worksheet.reset_dimensions()
+        sheet_layout = None
+        if layouts is not None and last_row is not None:
+            sheet_layout = _SheetLayout(layouts, sheet_name, last_row)
+        rows = worksheet.iter_rows(values_only=True)
+        sheet_frames = _extract_sheet_frames(rows, sheet_name, file_name, client_name, metrics, sheet_layout)
+        record['sections'] = len(sheet_frames)
+        record['rows_out'] = sum(len(frame) for frame in sheet_frames)
+        if sheet_layout is not None:
+            record['layout'] = sheet_layout.status
+    return sheet_frames
+
+def extract_frame_from_excel(file_path, metrics=None, sheet_names=None, client_name=None, layouts=None):
+    """
+    Procesa un archivo Excel extrayendo todas las secciones VTA en un único DataFrame
+    compacto (columnas de cliente, archivo, hoja y sección como categóricas).
+    El libro se abre una sola vez (openpyxl read_only/data_only) y cada hoja se
+    recorre en una sola pasada; las hojas omitidas nunca se leen.
+    Sin `sheet_names`, un pre-escaneo del zip (src/prescan.py) descarta antes de abrir
+    el libro las hojas sin títulos de sección VTA, y el libro completo si ninguna tiene.
+    Con `sheet_names` solo se extraen esas hojas (unidad de trabajo por hoja) y con
+    `client_name` se usa ese cliente, ya resuelto para el libro, sin volver a buscarlo.
+    Con `layouts` (src.layout.LayoutCache) las hojas de una plantilla ya vista usan
+    su diseño guardado en lugar de buscar secciones y cabeceras.
+    Con `metrics` (src.metrics.RunMetrics) se registra la apertura del libro y cada
+    hoja/sección según su nivel de detalle.
+    Un libro que no se puede leer (dañado, bloqueado) lanza la excepción: quien llama
+    decide (run_etl.py lo informa y no lo guarda en la caché, para reintentarlo).
+    """
+    metrics = metrics or NO_METRICS
+    sheet_metrics = metrics if metrics.wants('sheet') else NO_METRICS
+    file_name = os.path.basename(file_path)
+    scan = None
+    if sheet_names is None:
+        with metrics.stage('extract.prescan', file=file_name) as record:
+            scan = prescan_workbook(file_path)
+            if scan is not None:
+                sheet_names = sheets_to_extract(file_path, scan)
+                record['sheets'] = len(sheet_names)
+                record['skipped_sheets'] = len(skipped_sheets(scan))
+        if scan is not None and not sheet_names:
+            print(f"  -> ⚠️ {file_name} omitido sin abrirlo: ninguna hoja tiene secciones VTA (pre-escaneo).")
+            return _empty_extraction_frame()
+    if not sheet_names and sheet_names is not None:
+        return _empty_extraction_frame()
+
+    with sheet_metrics.stage('extract.open', file=file_name):
+        workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    # El libro se cierra también si la extracción falla (la excepción sigue a quien llama)
+    with closing(workbook):
+        frames = []
+
+        if client_name is None:
+            print(f"  -> Procesando {file_name}...")
+            client_name = _resolve_client_name(workbook, file_name, scan is None or scan.has_client_label)
+            print(f"     -> Cliente identificado: {client_name}")
+            if scan is not None and skipped_sheets(scan):
+                print(f"     -> Hojas sin secciones VTA omitidas (pre-escaneo): {', '.join(skipped_sheets(scan))}")
+
+        if sheet_names is None:
+            sheet_names = [name for name in workbook.sheetnames if not _is_omitted_sheet(name)]
+
+        last_rows = _sheet_last_rows(file_path, sheet_names) if layouts is not None else {}
+        for sheet_name in sheet_names:
+            frames.extend(_extract_sheet(
+                workbook, sheet_name, file_name, client_name, metrics, layouts, last_rows.get(sheet_name)
+            ))
+
+        return compact_frame(pd.concat(frames, ignore_index=True)) if frames else _empty_extraction_frame()
+
 def extract_data_from_excel(file_path):
-    """Procesa un archivo Excel extrayendo todas las secciones VTA."""
+    """
+    Procesa un archivo Excel extrayendo todas las secciones VTA (lista de diccionarios por fila).
+    Un libro que no se puede leer se informa en consola y retorna una lista vacía.
+    """
     try:
-        xls = pd.ExcelFile(file_path, engine='openpyxl')
-        all_data = []
-        file_name = os.path.basename(file_path)
-        print(f"  -> Procesando {file_name}...")
-        
-        client_name = ""
-        if xls.sheet_names:
-            first_sheet = xls.parse(xls.sheet_names[0], header=None)
-            client_name = _find_client_name(first_sheet) 
-
-        if not client_name:
-            client_name = file_name.split(' ')[0].split('-')[0].split('_')[0]
-            
-        print(f"     -> Cliente identificado: {client_name}")
-        
-        vta_pattern = re.compile(r'\(VTA\d{3}\)', re.IGNORECASE)
-
-        for sheet_name in xls.sheet_names:
-            if sheet_name.lower() in ['resumen', 'general', 'datos', 'cierre', 'factura']:
-                continue
-                
-            sheet = xls.parse(sheet_name, header=None)
-            vta_sections = []
-            current_title, current_start = None, -1
-            
-            for row_idx in range(len(sheet)):
-                row = sheet.iloc[row_idx]
-                match = row.apply(lambda x: vta_pattern.search(str(x).upper())).dropna()
-                
-                if not match.empty:
-                    if current_title is not None:
-                        vta_sections.append({'title': current_title, 'range': (current_start, row_idx)})
-                    current_title = str(row.loc[match.index[0]])
-                    current_start = row_idx
-                
-            if current_title is not None:
-                vta_sections.append({'title': current_title, 'range': (current_start, len(sheet))})
-
-            for section in vta_sections:
-                data = _extract_data_from_section(sheet, section['title'], section['range'], sheet_name, file_name, client_name)
-                all_data.extend(data)
-                
-        return all_data
-
+        return extract_frame_from_excel(file_path).to_dict('records')
     except Exception as e:
         print(f"  -> ❌ Error en {os.path.basename(file_path)}: {e}")
-        return []
\ No newline at end of file
+        return []
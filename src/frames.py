@@ -0,0 +1,44 @@
+# src/frames.py
+# Representación compacta de las filas en memoria.
+#
+# Las filas viajan entre etapas como DataFrames columnares (un bloque por archivo).
+# Las columnas de COLUMNAS_CATEGORICAS repiten unos pocos textos miles de veces
+# (cliente, archivo, hoja, título de sección, clasificaciones): como categóricas,
+# cada texto se guarda una sola vez y cada fila solo lleva un código entero.
+# Esto reduce la memoria de los bloques en cola y el costo de enviarlos entre
+# procesos (pickle) y de guardarlos en la caché.
+
+from src.config import COLUMNAS_CATEGORICAS
+from src.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+def compact_frame(frame):
+    """Convierte a categóricas las columnas de COLUMNAS_CATEGORICAS presentes en `frame` (en el mismo objeto)."""
+    for col in COLUMNAS_CATEGORICAS:
+        if col in frame.columns and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype('category')
+    return frame
+
+def map_distinct(values, func):
+    """
+    Aplica `func` una sola vez por valor distinto de la serie `values` y retorna
+    el resultado como serie categórica con el mismo índice. None y NaN cuentan como
+    valores distintos (factorize los agrupa, pero `func` puede tratarlos distinto).
+    """
+    codes, uniques = pd.factorize(values)
+    results = [func(value) for value in uniques]
+    missing = np.flatnonzero(codes == -1)
+    if len(missing):
+        is_none = np.array([value is None for value in values.to_numpy(dtype=object)[missing]])
+        for kind in (is_none, ~is_none):
+            if kind.any():
+                codes[missing[kind]] = len(results)
+                results.append(func(values.iloc[missing[kind][0]]))
+    mapped = pd.Categorical(results)
+    return pd.Series(pd.Categorical.from_codes(mapped.codes[codes], dtype=mapped.dtype), index=values.index)
+
+def frame_memory_mb(frame):
+    """Memoria ocupada por el DataFrame (incluidos los textos) en MB."""
+    return round(frame.memory_usage(deep=True).sum() / (1024 * 1024), 2)
@@ -0,0 +1,83 @@
+# src/layout.py
+# Caché de diseños de hoja: cada cliente envía cada período el mismo libro plantilla.
+#
+# La huella de una hoja (nombre, última fila con datos y tipo de las celdas de las
+# primeras filas) identifica la plantilla sin depender de los datos del período. El
+# diseño guardado para la huella son las anclas de las secciones VTA (fila, columna,
+# título) y, por sección, la fila de cabeceras con sus índices de columna ya resueltos.
+# Con un acierto, la extracción solo verifica esas celdas en lugar de buscar secciones
+# y cabeceras; si alguna no coincide, vuelve a la detección completa (src/extract.py).
+#
+# Cada diseño es un JSON por huella en la carpeta de la caché, escrito de forma
+# atómica: los procesos del pool comparten la carpeta sin coordinarse.
+
+import hashlib
+import json
+import os
+from datetime import date, datetime
+
+# Se incrementa cuando cambia la detección de secciones/cabeceras para invalidar los diseños
+LAYOUT_VERSION = 3
+
+# Filas iniciales de la hoja que entran en la huella
+FINGERPRINT_ROWS = 12
+
+def _cell_kind(value):
+    """Tipo de una celda para la huella: vacía, texto, número o fecha."""
+    if value is None or value != value:
+        return ''
+    if isinstance(value, str):
+        return 's'
+    if isinstance(value, (datetime, date)):
+        return 'd'
+    return 'n'
+
+def sheet_fingerprint(sheet_name, last_row, head_rows, rules_digest=''):
+    """
+    Huella de la plantilla de una hoja: nombre, última fila con datos (leída del XML,
+    no de la dimensión declarada) y tipo de cada celda de `head_rows` (primeras filas).
+    `rules_digest` (huella de reglas.json) separa los diseños de reglas distintas.
+    """
+    shape = '|'.join(''.join(_cell_kind(v) or '.' for v in row).rstrip('.') for row in head_rows)
+    key = json.dumps([LAYOUT_VERSION, rules_digest, sheet_name, last_row, shape], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class LayoutCache:
+    """Diseños por huella: {'sections': [{'row', 'col', 'title', 'header_row', 'header'}, ...]}."""
+
+    def __init__(self, layout_dir):
+        self.layout_dir = layout_dir
+        self._memo = {}
+
+    def _path(self, fingerprint):
+        return os.path.join(self.layout_dir, fingerprint + '.json')
+
+    def get(self, fingerprint):
+        """Diseño guardado para la huella, o None."""
+        if fingerprint not in self._memo:
+            try:
+                with open(self._path(fingerprint), 'r', encoding='utf-8') as f:
+                    self._memo[fingerprint] = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+        return self._memo[fingerprint]
+
+    def put(self, fingerprint, layout):
+        """Guarda el diseño de la huella (si cambió)."""
+        if self._memo.get(fingerprint) == layout:
+            return
+        os.makedirs(self.layout_dir, exist_ok=True)
+        path = self._path(fingerprint)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(layout, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._memo[fingerprint] = layout
+
+_caches = {}
+
+def open_layout_cache(layout_dir):
+    """LayoutCache de la carpeta, uno por proceso (conserva lo leído entre archivos y pasadas)."""
+    if layout_dir not in _caches:
+        _caches[layout_dir] = LayoutCache(layout_dir)
+    return _caches[layout_dir]
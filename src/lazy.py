@@ -0,0 +1,30 @@
+# src/lazy.py
+# Importación diferida de módulos pesados (pandas, numpy, openpyxl y los módulos del
+# ETL que los usan). lazy_import retorna el módulo sin ejecutarlo: se carga en el
+# primer acceso a un atributo. Así los comandos cortos (--help, query) no pagan la
+# importación de lo que no usan.
+
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Módulo `name` con carga diferida al primer acceso a un atributo (o el ya importado)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def load_now(*modules):
+    """
+    Carga ya los módulos diferidos. Se llama antes de iniciar hilos que los usen: la
+    primera carga de un módulo diferido no está protegida entre hilos.
+    """
+    for module in modules:
+        module.__dict__
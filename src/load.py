@@ -1,38 +1,368 @@
 # src/load.py
 
 import os
-from openpyxl import Workbook
-from src.config import OUTPUT_FILENAME, COLUMNAS_ESTANDAR 
+import sqlite3
+from src.lazy import lazy_import
+from src.config import (
+    OUTPUT_FILENAME, COLUMNAS_ESTANDAR, TIPOS_COLUMNAS_ESTANDAR,
+    OUTPUT_PARQUET_FILENAME, OUTPUT_CSV_FILENAME, OUTPUT_SQLITE_FILENAME,
+    SQLITE_TABLE, COLUMNAS_INDICE_SQLITE, OUTPUT_SUMMARY_FILENAME, MEDIDAS_RESUMEN,
+    OUTPUT_QUERY_DIRNAME
+)
+from src.metrics import NO_METRICS
+from src.parsing import numbers_to_float
+from src.summary import SummaryAccumulator
+from src.query import QueryDatasetWriter
 
-def create_consolidated_xlsx(data, output_dir):
+pd = lazy_import('pandas')
+
+# Límite de filas por hoja de Excel (incluida la cabecera)
+EXCEL_MAX_ROWS = 1048576
+SHEET_TITLE = "Movimientos VTA Consolidados"
+
+# ==============================================================================
+# 1. AUXILIARES DE FILAS Y TIPOS
+# ==============================================================================
+
+def _iter_row_values(data):
+    """Genera los valores de cada fila en el orden de COLUMNAS_ESTANDAR (lista de diccionarios o DataFrame)."""
+    if hasattr(data, 'itertuples'):
+        yield from data.reindex(columns=COLUMNAS_ESTANDAR).itertuples(index=False, name=None)
+        return
+    for row_dict in data:
+        # Aseguramos que los datos se lean en el orden correcto
+        yield [row_dict.get(col, '') for col in COLUMNAS_ESTANDAR]
+
+def to_typed_frame(data):
     """
-    Crea el archivo Excel XLSX consolidado usando openpyxl.
+    Retorna un DataFrame con las columnas y el orden de COLUMNAS_ESTANDAR y los
+    tipos de TIPOS_COLUMNAS_ESTANDAR (para las salidas tipadas).
+    """
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data), dtype=object)
+    frame = frame.reindex(columns=COLUMNAS_ESTANDAR)
+
+    typed = {}
+    for col in COLUMNAS_ESTANDAR:
+        kind = TIPOS_COLUMNAS_ESTANDAR[col]
+        if kind == 'fecha':
+            typed[col] = pd.to_datetime(frame[col], format='%Y-%m-%d', errors='coerce')
+        elif kind == 'numero':
+            typed[col] = numbers_to_float(frame[col])
+        else:
+            typed[col] = frame[col].map(lambda v: None if pd.isna(v) else str(v)).astype(object)
+    return pd.DataFrame(typed, columns=COLUMNAS_ESTANDAR)
+
+def arrow_schema():
+    """Esquema Arrow de las columnas estándar según TIPOS_COLUMNAS_ESTANDAR. Requiere pyarrow."""
+    import pyarrow as pa
+
+    arrow_types = {'fecha': pa.date32(), 'numero': pa.float64(), 'texto': pa.string()}
+    return pa.schema([(col, arrow_types[TIPOS_COLUMNAS_ESTANDAR[col]]) for col in COLUMNAS_ESTANDAR])
+
+_SQL_TYPES = {'fecha': 'TEXT', 'numero': 'REAL', 'texto': 'TEXT'}
+
+def sqlite_columns_sql():
+    """Definición SQL de las columnas estándar ('"COL" TIPO, ...')."""
+    return ", ".join(f'"{col}" {_SQL_TYPES[TIPOS_COLUMNAS_ESTANDAR[col]]}' for col in COLUMNAS_ESTANDAR)
+
+def sqlite_rows(chunk):
+    """Filas tipadas del bloque para executemany (fechas ISO, vacíos como NULL)."""
+    typed = to_typed_frame(chunk)
+    typed['FECHA_MOVIMIENTO'] = typed['FECHA_MOVIMIENTO'].dt.strftime('%Y-%m-%d')
+    typed = typed.astype(object).where(typed.notna(), None)
+    return typed.itertuples(index=False, name=None)
+
+# ==============================================================================
+# 2. SALIDAS (SINKS)
+# Cada salida implementa write(chunk), close() -> ruta y abort().
+# ==============================================================================
+
+class XlsxSink:
+    """
+    XLSX en modo streaming (openpyxl write_only, con lxml si está instalado).
+    Al llegar al límite de filas de Excel continúa en una hoja nueva.
+    """
+    name = 'xlsx'
+
+    def __init__(self, output_dir):
+        self.output_path = os.path.join(output_dir, OUTPUT_FILENAME)
+        self.tmp_path = self.output_path + ".tmp"
+        from openpyxl import Workbook
+
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.rows = 0
+
+    def _new_sheet(self):
+        n = len(self.workbook.worksheets) + 1
+        self.sheet = self.workbook.create_sheet(SHEET_TITLE if n == 1 else f"{SHEET_TITLE} {n}")
+        # Escribir las cabeceras (en cada hoja)
+        self.sheet.append(COLUMNAS_ESTANDAR)
+        self.sheet_rows = 1
+
+    def write(self, chunk):
+        for row_values in _iter_row_values(chunk):
+            if self.sheet is None or self.sheet_rows >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(list(row_values))
+            self.sheet_rows += 1
+            self.rows += 1
+
+    def close(self):
+        self.workbook.save(self.tmp_path)
+        os.replace(self.tmp_path, self.output_path)
+        print(f"  -> ✅ Reporte consolidado XLSX guardado exitosamente: {self.output_path} "
+              f"({self.rows} filas, {len(self.workbook.worksheets)} hoja(s))")
+        return self.output_path
+
+    def abort(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class ParquetSink:
+    """Parquet tipado y comprimido (zstd), escrito por grupos de filas. Requiere pyarrow."""
+    name = 'parquet'
+
+    def __init__(self, output_dir):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = arrow_schema()
+        self.output_path = os.path.join(output_dir, OUTPUT_PARQUET_FILENAME)
+        self.tmp_path = self.output_path + ".tmp"
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression='zstd')
+        self.rows = 0
+
+    def write(self, chunk):
+        typed = to_typed_frame(chunk)
+        self.writer.write_table(self._pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False))
+        self.rows += len(typed)
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.tmp_path, self.output_path)
+        print(f"  -> ✅ Parquet consolidado guardado: {self.output_path} ({self.rows} filas)")
+        return self.output_path
+
+    def abort(self):
+        self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class CsvSink:
+    """CSV (UTF-8, separador ',') escrito por bloques, con fechas ISO y números con punto decimal."""
+    name = 'csv'
+
+    def __init__(self, output_dir):
+        self.output_path = os.path.join(output_dir, OUTPUT_CSV_FILENAME)
+        self.tmp_path = self.output_path + ".tmp"
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+        self.rows = 0
+
+    def write(self, chunk):
+        typed = to_typed_frame(chunk)
+        typed.to_csv(self.file, header=self.rows == 0, index=False, date_format='%Y-%m-%d')
+        self.rows += len(typed)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.output_path)
+        print(f"  -> ✅ CSV consolidado guardado: {self.output_path} ({self.rows} filas)")
+        return self.output_path
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class SqliteSink:
+    """
+    Base SQLite: inserción masiva (executemany) en una sola transacción e
+    índices sobre COLUMNAS_INDICE_SQLITE, creados al final de la carga.
     """
-    if not data:
-        print("  -> Advertencia: No hay datos para consolidar. Se omite la creación del XLSX.")
-        return None
+    name = 'sqlite'
 
-    output_path = os.path.join(output_dir, OUTPUT_FILENAME)
-    
+    def __init__(self, output_dir):
+        self.output_path = os.path.join(output_dir, OUTPUT_SQLITE_FILENAME)
+        self.tmp_path = self.output_path + ".tmp"
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+        self.conn = sqlite3.connect(self.tmp_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(f'CREATE TABLE "{SQLITE_TABLE}" ({sqlite_columns_sql()})')
+        self.conn.execute("BEGIN")
+        placeholders = ", ".join("?" for _ in COLUMNAS_ESTANDAR)
+        self.insert_sql = f'INSERT INTO "{SQLITE_TABLE}" VALUES ({placeholders})'
+        self.rows = 0
+
+    def write(self, chunk):
+        self.conn.executemany(self.insert_sql, sqlite_rows(chunk))
+        self.rows += len(chunk)
+
+    def close(self):
+        for col in COLUMNAS_INDICE_SQLITE:
+            self.conn.execute(f'CREATE INDEX "idx_{SQLITE_TABLE}_{col.lower()}" ON "{SQLITE_TABLE}" ("{col}")')
+        self.conn.execute("COMMIT")
+        self.conn.close()
+        os.replace(self.tmp_path, self.output_path)
+        print(f"  -> ✅ SQLite consolidado guardado: {self.output_path} (tabla {SQLITE_TABLE}, {self.rows} filas)")
+        return self.output_path
+
+    def abort(self):
+        self.conn.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class SummarySink:
+    """
+    Resúmenes agregados (src/summary.py) en un XLSX aparte, una hoja por resumen de
+    RESUMENES. Se acumulan bloque a bloque durante la carga; no se guarda el detalle.
+    """
+    name = 'resumen'
+
+    def __init__(self, output_dir):
+        self.output_path = os.path.join(output_dir, OUTPUT_SUMMARY_FILENAME)
+        self.tmp_path = self.output_path + ".tmp"
+        self.summary = SummaryAccumulator()
+        self.rows = 0
+
+    def write(self, chunk):
+        frame = chunk if isinstance(chunk, pd.DataFrame) else pd.DataFrame(list(chunk), dtype=object)
+        frame = frame.reindex(columns=COLUMNAS_ESTANDAR)
+        # Mismas medidas numéricas que las salidas tipadas
+        self.summary.add(frame, {col: numbers_to_float(frame[col]) for col in MEDIDAS_RESUMEN})
+        self.rows += len(frame)
+
+    def close(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        tables = self.summary.tables()
+        for title, table in tables.items():
+            sheet = workbook.create_sheet(title)
+            sheet.append(list(table.columns))
+            for row_values in table.itertuples(index=False, name=None):
+                sheet.append(list(row_values))
+        workbook.save(self.tmp_path)
+        os.replace(self.tmp_path, self.output_path)
+        print(f"  -> ✅ Resumen agregado guardado: {self.output_path} "
+              f"({len(tables)} hoja(s), {self.rows} filas resumidas)")
+        return self.output_path
+
+    def abort(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class QuerySink:
+    """
+    Conjunto de datos de consulta (src/query.py): Parquet tipado particionado por mes y
+    NIT, con mínimo y máximo por partición, para `run_etl.py query`. Requiere pyarrow.
+    """
+    name = 'consulta'
+
+    def __init__(self, output_dir):
+        self.output_path = os.path.join(output_dir, OUTPUT_QUERY_DIRNAME)
+        self.writer = QueryDatasetWriter(self.output_path, arrow_schema())
+        self.rows = 0
+
+    def write(self, chunk):
+        typed = to_typed_frame(chunk)
+        self.writer.write(typed)
+        self.rows += len(typed)
+
+    def close(self):
+        self.writer.close()
+        print(f"  -> ✅ Conjunto de consulta guardado: {self.output_path} "
+              f"({self.rows} filas, {len(self.writer.fragments)} partes)")
+        return self.output_path
+
+    def abort(self):
+        self.writer.abort()
+
+# Salidas disponibles por nombre (opción --sinks de run_etl.py)
+SINKS = {sink.name: sink for sink in (XlsxSink, ParquetSink, CsvSink, SqliteSink, SummarySink, QuerySink)}
+
+# ==============================================================================
+# 3. CARGA
+# ==============================================================================
+
+def _abort_quietly(sink):
+    try:
+        sink.abort()
+    except Exception:
+        pass
+
+def write_to_sinks(chunks, sink_names, output_dir, metrics=None):
+    """
+    Consume los bloques de filas (DataFrames o listas de diccionarios) a medida que
+    llegan y los entrega a cada salida, sin acumularlos en memoria. Las salidas
+    escriben en un temporal, así un fallo no deja un archivo a medias; el fallo de
+    una salida no detiene las demás.
+    Con `metrics` se registran las etapas 'load' (cada bloque en cada salida),
+    'load.close' (cierre de cada salida) y el evento 'load.first_chunk' (latencia
+    hasta el primer bloque escrito).
+    Retorna {nombre_salida: ruta} de las salidas generadas.
+    """
+    metrics = metrics or NO_METRICS
+    os.makedirs(output_dir, exist_ok=True)
+    sinks = []
+    for sink_name in sink_names:
+        try:
+            sinks.append(SINKS[sink_name](output_dir))
+        except ImportError as e:
+            print(f"  -> ❌ Salida '{sink_name}' no disponible (falta dependencia: {e.name}).")
+        except Exception as e:
+            print(f"  -> ❌ ERROR al preparar la salida '{sink_name}': {e}")
+
+    total_rows = 0
     try:
-        workbook = Workbook()
-        sheet = workbook.active
-        sheet.title = "Movimientos VTA Consolidados"
-        
-        # 1. Escribir las cabeceras
-        sheet.append(COLUMNAS_ESTANDAR)
-        
-        # 2. Escribir los datos
-        for row_dict in data:
-            # Aseguramos que los datos se lean en el orden correcto
-            row_values = [row_dict.get(col, '') for col in COLUMNAS_ESTANDAR] 
-            sheet.append(row_values)
-            
-        workbook.save(output_path)
-            
-        print(f"  -> ✅ Reporte consolidado XLSX guardado exitosamente: {output_path}")
-        return output_path
-        
-    except Exception as e:
-        print(f"  -> ❌ ERROR al escribir el XLSX consolidado: {e}")
-        return None
\ No newline at end of file
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            total_rows += len(chunk)
+            for sink in list(sinks):
+                try:
+                    with metrics.stage('load', sink=sink.name) as record:
+                        record['rows_in'] = len(chunk)
+                        sink.write(chunk)
+                except Exception as e:
+                    print(f"  -> ❌ ERROR al escribir la salida '{sink.name}': {e}")
+                    _abort_quietly(sink)
+                    sinks.remove(sink)
+            if total_rows == len(chunk):
+                metrics.mark('load.first_chunk', rows_in=len(chunk))
+    except Exception:
+        for sink in sinks:
+            _abort_quietly(sink)
+        raise
+
+    if total_rows == 0:
+        print("  -> Advertencia: No hay datos para consolidar. Se omite la creación de las salidas.")
+        for sink in sinks:
+            _abort_quietly(sink)
+        return {}
+
+    outputs = {}
+    for sink in sinks:
+        try:
+            with metrics.stage('load.close', sink=sink.name, rows_out=sink.rows):
+                outputs[sink.name] = sink.close()
+        except Exception as e:
+            print(f"  -> ❌ ERROR al cerrar la salida '{sink.name}': {e}")
+            _abort_quietly(sink)
+    return outputs
+
+def create_consolidated_xlsx_streaming(chunks, output_dir):
+    """Escribe el XLSX consolidado consumiendo los bloques de filas en streaming."""
+    return write_to_sinks(chunks, ['xlsx'], output_dir).get('xlsx')
+
+def create_consolidated_xlsx(data, output_dir):
+    """
+    Crea el archivo Excel XLSX consolidado usando openpyxl.
+    Acepta una lista de diccionarios o un DataFrame con las columnas estándar.
+    """
+    return create_consolidated_xlsx_streaming([data] if data is not None else [], output_dir)
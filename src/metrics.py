@@ -0,0 +1,200 @@
+# src/metrics.py
+# Instrumentación del ETL: tiempo de pared, tiempo de CPU, filas de entrada/salida y
+# pico de memoria (RSS) por etapa y por archivo (opcionalmente por hoja y sección).
+# Los registros se escriben como JSON lines para comparar ejecuciones entre sí.
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Niveles de detalle de los registros (cada nivel incluye los anteriores)
+DETAIL_LEVELS = ('file', 'sheet', 'section')
+
+REPORT_FILENAME = "run_report.jsonl"
+
+# ==============================================================================
+# 1. MEMORIA
+# ==============================================================================
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso actual en MB (None si la plataforma no lo permite)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en bytes en macOS y en KB en Linux
+        return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+
+# ==============================================================================
+# 2. REGISTRO DE ETAPAS
+# ==============================================================================
+
+class RunMetrics:
+    """
+    Acumula los registros de las etapas de una ejecución.
+    Cada registro es un diccionario con 'stage', los campos propios de la etapa
+    (file, sheet, section, sink, rows_in, rows_out...) y las medidas wall_s, cpu_s
+    y peak_rss_mb. Es seguro usarlo desde varios hilos (staging + principal).
+    """
+
+    def __init__(self, detail='file', enabled=True):
+        self.detail = detail
+        self.enabled = enabled
+        self.records = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wants(self, level):
+        """Indica si se registran etapas del nivel de detalle `level` ('file', 'sheet' o 'section')."""
+        return self.enabled and DETAIL_LEVELS.index(level) <= DETAIL_LEVELS.index(self.detail)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        Mide el bloque `with` como la etapa `name`. El diccionario entregado puede
+        completarse dentro del bloque (ej. record['rows_out'] = len(frame)).
+        El tiempo de CPU es el del hilo actual, así la copia en segundo plano no se
+        suma a la etapa que se está midiendo.
+        """
+        record = {'stage': name, **fields}
+        if not self.enabled:
+            yield record
+            return
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_s'] = round(time.thread_time() - cpu_start, 6)
+            record['pid'] = os.getpid()
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.add(record)
+
+    def mark(self, name, **fields):
+        """Registra un evento puntual con los segundos transcurridos desde el inicio de la ejecución."""
+        self.add({'stage': name, **fields, 'since_start_s': round(time.perf_counter() - self.started, 6)})
+
+    def add(self, record):
+        if self.enabled:
+            with self._lock:
+                self.records.append(record)
+
+    def extend(self, records):
+        """Agrega registros medidos en otro proceso (workers del pool)."""
+        if self.enabled and records:
+            with self._lock:
+                self.records.extend(records)
+
+    def summary(self):
+        """
+        Totales por etapa medida: {etapa: {'count', 'wall_s', 'cpu_s', 'rows'}} en orden de aparición.
+        'rows' suma las filas de salida de cada registro (o las de entrada si no tiene salida).
+        """
+        totals = {}
+        for record in self.records:
+            if 'wall_s' not in record:
+                continue
+            total = totals.setdefault(record['stage'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0})
+            total['count'] += 1
+            total['wall_s'] += record.get('wall_s', 0.0)
+            total['cpu_s'] += record.get('cpu_s', 0.0)
+            total['rows'] += record.get('rows_out', record.get('rows_in')) or 0
+        return totals
+
+# Registro deshabilitado: permite instrumentar el código sin comprobar si hay métricas
+NO_METRICS = RunMetrics(enabled=False)
+
+# ==============================================================================
+# 3. REPORTE DE LA EJECUCIÓN
+# ==============================================================================
+
+def print_summary(metrics, total_seconds):
+    """Imprime el tiempo y el rendimiento (filas/s) acumulado de cada etapa."""
+    totals = metrics.summary()
+    if not totals:
+        return
+    print("-> Métricas por etapa (tiempo acumulado; en paralelo puede superar el total):")
+    for stage_name, total in totals.items():
+        line = (f"  -> {stage_name:<18} {total['count']:>6} reg. | pared {total['wall_s']:>9.2f} s"
+                f" | CPU {total['cpu_s']:>9.2f} s")
+        if total['rows'] and total['wall_s'] > 0:
+            line += f" | {total['rows']} filas ({total['rows'] / total['wall_s']:,.0f} filas/s)"
+        print(line)
+    for record in metrics.records:
+        if 'since_start_s' in record:
+            print(f"  -> {record['stage']:<18} a los {record['since_start_s']:.2f} s del inicio")
+    print(f"  -> Pico de memoria del proceso principal: {peak_rss_mb()} MB | Total: {total_seconds:.2f} s")
+
+def write_report(metrics, report_path, run_info):
+    """
+    Agrega los registros de la ejecución al reporte JSON lines `report_path`:
+    una línea 'run' con `run_info` seguida de una línea por registro, todas con
+    el mismo run_id para poder comparar ejecuciones.
+    """
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    run_id = datetime.now().strftime('%Y%m%dT%H%M%S') + f"-{os.getpid()}"
+    with open(report_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'run_id': run_id, 'stage': 'run', **run_info}, ensure_ascii=False, default=str) + "\n")
+        for record in metrics.records:
+            f.write(json.dumps({'run_id': run_id, **record}, ensure_ascii=False, default=str) + "\n")
+    return report_path
+
+# ==============================================================================
+# 4. PERFILADO OPCIONAL
+# ==============================================================================
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+@contextmanager
+def profiled(profiler, output_base):
+    """
+    Perfila el bloque `with` con cProfile (`<output_base>.prof`, legible con pstats
+    o snakeviz) o pyinstrument (`<output_base>.html`). Solo perfila el proceso
+    principal: con workers > 1 la extracción ocurre en otros procesos.
+    """
+    if profiler is None:
+        yield None
+        return
+
+    os.makedirs(os.path.dirname(output_base) or '.', exist_ok=True)
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        prof = Profiler()
+        prof.start()
+        try:
+            yield prof
+        finally:
+            prof.stop()
+            output_path = output_base + ".html"
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(prof.output_html())
+            print(f"  -> Perfil pyinstrument guardado: {output_path}")
+        return
+
+    import cProfile
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        output_path = output_base + ".prof"
+        prof.dump_stats(output_path)
+        print(f"  -> Perfil cProfile guardado: {output_path}")
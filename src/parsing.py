@@ -0,0 +1,187 @@
+# src/parsing.py
+# Interpretación de fechas y números compartida por extract.py y transform.py.
+#
+# Los reportes repiten unos pocos cientos de textos de fecha y de cantidad miles de
+# veces: cada texto distinto se interpreta una sola vez (lru_cache) y las columnas se
+# convierten por valores únicos. Un detector muestrea la columna de cada sección para
+# fijar un formato de fecha y una convención decimal ('1.234,56' frente a '1,234.56').
+
+import math
+import re
+from datetime import datetime
+from functools import lru_cache
+from src.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Formatos de fecha aceptados en celdas de texto (en orden de prioridad)
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d %b')
+
+# Convenciones de separador decimal
+DECIMAL_PUNTO = 'punto'   # 1,234.56 (la coma separa miles)
+DECIMAL_COMA = 'coma'     # 1.234,56 (el punto separa miles)
+
+# Textos distintos que se muestrean para detectar formatos
+DETECTION_SAMPLE = 200
+
+_PARSE_CACHE_SIZE = 65536
+
+# Solo separadores de miles: '1,234' / '1,234,567' o '1.234' (ambiguos por sí solos)
+_THOUSANDS_COMMA = re.compile(r'-?\d{1,3}(,\d{3})+')
+_THOUSANDS_DOT = re.compile(r'-?\d{1,3}(\.\d{3})+')
+
+# ==============================================================================
+# 1. FECHAS
+# ==============================================================================
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def parse_date_text(text, preferred_format=None):
+    """
+    Interpreta un texto de fecha y retorna 'YYYY-MM-DD' (None si no es una fecha).
+    Se prueba primero `preferred_format` (el detectado para la columna) y luego
+    DATE_FORMATS en orden.
+    """
+    text = text.strip()
+    formats = DATE_FORMATS if preferred_format is None else (preferred_format,) + DATE_FORMATS
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+def parse_date(value, preferred_format=None):
+    """Fecha de una celda: datetime -> 'YYYY-MM-DD', texto -> parse_date_text, otro tipo -> None."""
+    if isinstance(value, datetime):
+        return None if value is pd.NaT else value.strftime('%Y-%m-%d')
+    if isinstance(value, str):
+        return parse_date_text(value, preferred_format)
+    return None
+
+def _sample_strings(values, sample_size):
+    strings = []
+    for value in pd.unique(np.asarray(values, dtype=object)):
+        if isinstance(value, str):
+            strings.append(value.strip())
+            if len(strings) >= sample_size:
+                break
+    return strings
+
+def detect_date_format(values, sample_size=DETECTION_SAMPLE):
+    """
+    Formato de DATE_FORMATS que interpreta más textos de una muestra de la columna
+    (en empate gana el de mayor prioridad). None si la columna no tiene fechas en texto.
+    """
+    sample = _sample_strings(values, sample_size)
+    best_format, best_hits = None, 0
+    for fmt in DATE_FORMATS:
+        hits = 0
+        for text in sample:
+            try:
+                datetime.strptime(text, fmt)
+                hits += 1
+            except ValueError:
+                pass
+        if hits > best_hits:
+            best_format, best_hits = fmt, hits
+    return best_format
+
+def dates_to_iso(values, date_format=None):
+    """
+    Convierte una serie de celdas a 'YYYY-MM-DD' (None si no es una fecha),
+    interpretando cada valor distinto una sola vez. Sin `date_format`, se detecta.
+    """
+    if date_format is None:
+        date_format = detect_date_format(values)
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    parsed = np.array([parse_date(value, date_format) for value in uniques] + [None], dtype=object)
+    return pd.Series(parsed[codes], index=values.index, dtype=object)
+
+# ==============================================================================
+# 2. NÚMEROS
+# ==============================================================================
+
+def _is_thousands(text, separator):
+    pattern = _THOUSANDS_COMMA if separator == ',' else _THOUSANDS_DOT
+    return text.count(separator) > 1 or pattern.fullmatch(text) is not None
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def parse_number_text(text, decimal=DECIMAL_PUNTO):
+    """
+    Interpreta un texto numérico ('$ 1,234.5', '1.234,56', ' 12 ', '1.5') y retorna
+    float o None si el texto no es un número finito.
+    Con ambos separadores, el último es el decimal. Con uno solo, es separador de
+    miles si se repite o forma grupos de tres dígitos ('1,234' / '1.234'); en ese
+    último caso, ambiguo, decide la convención `decimal` de la columna.
+    """
+    text = text.replace('$', '').strip()
+    last_dot, last_comma = text.rfind('.'), text.rfind(',')
+    if last_dot >= 0 and last_comma >= 0:
+        if last_comma > last_dot:
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif last_comma >= 0:
+        if _is_thousands(text, ',') and (text.count(',') > 1 or decimal == DECIMAL_PUNTO):
+            text = text.replace(',', '')
+        else:
+            text = text.replace(',', '.')
+    elif last_dot >= 0:
+        if _is_thousands(text, '.') and (text.count('.') > 1 or decimal == DECIMAL_COMA):
+            text = text.replace('.', '')
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+def parse_number(value, decimal=DECIMAL_PUNTO):
+    """Número de una celda: numérico -> float, texto -> parse_number_text, otro tipo -> None."""
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, str):
+        return parse_number_text(value, decimal)
+    return None
+
+def _decimal_vote(text):
+    """Convención decimal que un texto deja ver sin ambigüedad (None si no permite decidir)."""
+    text = text.replace('$', '').strip()
+    last_dot, last_comma = text.rfind('.'), text.rfind(',')
+    if last_dot >= 0 and last_comma >= 0:
+        return DECIMAL_COMA if last_comma > last_dot else DECIMAL_PUNTO
+    if last_comma >= 0:
+        if text.count(',') > 1:
+            return DECIMAL_PUNTO
+        return None if _is_thousands(text, ',') else DECIMAL_COMA
+    if last_dot >= 0:
+        if text.count('.') > 1:
+            return DECIMAL_COMA
+        return None if _is_thousands(text, '.') else DECIMAL_PUNTO
+    return None
+
+def detect_decimal_separator(values, sample_size=DETECTION_SAMPLE):
+    """
+    Convención decimal de la columna, para interpretar los textos ambiguos ('1,234').
+    Se asume DECIMAL_COMA solo si la muestra la evidencia sin ninguna evidencia de
+    DECIMAL_PUNTO; en columnas mezcladas o sin evidencia se mantiene DECIMAL_PUNTO,
+    la interpretación histórica del ETL.
+    """
+    votes = {DECIMAL_PUNTO: 0, DECIMAL_COMA: 0}
+    for text in _sample_strings(values, sample_size):
+        vote = _decimal_vote(text)
+        if vote is not None:
+            votes[vote] += 1
+    return DECIMAL_COMA if votes[DECIMAL_COMA] and not votes[DECIMAL_PUNTO] else DECIMAL_PUNTO
+
+def numbers_to_float(values, decimal=None):
+    """
+    Convierte una serie de celdas a float (NaN si no es un número), interpretando
+    cada valor distinto una sola vez. Sin `decimal`, la convención se detecta.
+    """
+    if decimal is None:
+        decimal = detect_decimal_separator(values)
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    parsed = [parse_number(value, decimal) for value in uniques] + [None]
+    numbers = np.array([np.nan if number is None else number for number in parsed], dtype=float)
+    return pd.Series(numbers[codes], index=values.index, dtype=float)
@@ -0,0 +1,62 @@
+# src/pipeline.py
+# Conexión de las etapas del ETL (staging -> extracción -> transformación -> carga)
+# mediante colas acotadas: cada etapa corre en su propio hilo y se bloquea cuando
+# la cola hacia la siguiente está llena (backpressure). La memoria queda limitada
+# por la profundidad de las colas y no por el total de filas.
+
+import queue
+import threading
+
+# Elementos (archivos / bloques de filas) en espera entre dos etapas
+PIPELINE_QUEUE_DEPTH = 2
+
+_END = object()
+
+class _Failure:
+    """Excepción del productor, transportada por la cola para relanzarla en el consumidor."""
+
+    def __init__(self, error):
+        self.error = error
+
+def iter_in_thread(iterable, maxsize=PIPELINE_QUEUE_DEPTH, name="pipeline"):
+    """
+    Recorre `iterable` en un hilo productor y genera sus elementos, en el mismo
+    orden, a través de una cola de `maxsize` elementos. Mientras el consumidor
+    procesa un elemento, el productor ya prepara los siguientes.
+    Una excepción del productor se relanza en el consumidor. Si el consumidor
+    termina antes (o falla), el productor se detiene y se cierra `iterable`.
+    """
+    items = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                items.put(item)
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            items.put(_Failure(e))
+        finally:
+            if stop.is_set() and hasattr(iterable, 'close'):
+                iterable.close()
+            items.put(_END)
+
+    thread = threading.Thread(target=producer, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # El consumidor terminó (o abandonó): liberar al productor si está bloqueado en put()
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
@@ -0,0 +1,179 @@
+# src/prescan.py
+# Pre-escaneo del libro (.xlsx/.xlsm) leyendo el zip directamente, sin openpyxl.
+#
+# Los títulos de sección VTA y la etiqueta 'Cliente' son textos: en sharedStrings.xml
+# (celdas t="s" que apuntan a su índice) o escritos en la propia celda (t="inlineStr"
+# o el resultado de una fórmula, t="str"). Se lee sharedStrings.xml una vez (iterparse)
+# para saber qué índices son títulos VTA o etiquetas de cliente, y el XML de cada hoja
+# se recorre por trozos de bytes buscando esos índices o el patrón VTA literal; cada
+# hoja se deja de leer en cuanto aparece una sección. Así se sabe qué hojas pueden
+# aportar filas antes de pagar el análisis completo de openpyxl.
+
+import posixpath
+import re
+import zipfile
+from collections import namedtuple
+from xml.etree import ElementTree
+
+_SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+WORKBOOK_PART = 'xl/workbook.xml'
+_WORKBOOK_RELS_PART = 'xl/_rels/workbook.xml.rels'
+_SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+
+# Bytes leídos por trozo del XML de una hoja, y bytes del trozo anterior que se
+# conservan para no perder una celda partida entre dos trozos
+SCAN_CHUNK_BYTES = 1024 * 1024
+_SCAN_OVERLAP_BYTES = 1024
+
+# Mismo patrón que extract.VTA_PATTERN (allí se compara el texto en mayúsculas)
+_VTA_TEXT = re.compile(r'\(VTA\d{3}\)')
+_VTA_BYTES = re.compile(rb'\(vta\d{3}\)', re.IGNORECASE)
+
+# Etiquetas de cliente normalizadas (mayúsculas, sin espacios), como extract._find_client_name
+_CLIENT_LABELS = ('CLIENTE', 'CLIENTECORTE')
+_CLIENT_LABEL_BYTES = re.compile(rb'<(?:\w+:)?t(?:\s[^>]*)?>\s*cliente\s*(?:corte\s*)?</', re.IGNORECASE)
+
+# Celda de texto compartido: <c ... t="s" ...><v>índice</v>
+_SHARED_CELL = re.compile(rb'<(?:\w+:)?c\s[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)</')
+
+# Resultado: `sheets` es [(nombre, tiene_secciones_vta)] en el orden del libro y
+# `has_client_label` indica si la primera hoja tiene la etiqueta 'Cliente'
+WorkbookScan = namedtuple('WorkbookScan', ['sheets', 'has_client_label'])
+
+# ==============================================================================
+# 1. ESTRUCTURA DEL LIBRO
+# ==============================================================================
+
+def list_sheet_parts(archive):
+    """[(nombre de la hoja, ruta de su XML en el zip)] en el orden del libro (xl/workbook.xml y sus relaciones)."""
+    workbook = ElementTree.fromstring(archive.read(WORKBOOK_PART))
+    try:
+        rels = ElementTree.fromstring(archive.read(_WORKBOOK_RELS_PART))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{_PACKAGE_RELS_NS}Relationship')}
+    except KeyError:
+        targets = {}
+
+    sheets = []
+    for sheet in workbook.iter(f'{_SPREADSHEET_NS}sheet'):
+        target = targets.get(sheet.get(f'{_RELATIONSHIP_NS}id'))
+        if target is None:
+            part = None
+        elif target.startswith('/'):
+            part = target.lstrip('/')
+        else:
+            part = posixpath.normpath(posixpath.join('xl', target))
+        sheets.append((sheet.get('name'), part))
+    return sheets
+
+def _shared_string_text(si):
+    """Texto de un <si>: simple (<t>) o enriquecido (<r><t>); las guías fonéticas (<rPh>) no cuentan."""
+    parts = []
+    for child in si:
+        if child.tag == f'{_SPREADSHEET_NS}t':
+            parts.append(child.text or '')
+        elif child.tag == f'{_SPREADSHEET_NS}r':
+            parts.extend(node.text or '' for node in child.findall(f'{_SPREADSHEET_NS}t'))
+    return ''.join(parts)
+
+def _shared_string_ids(archive):
+    """Índices de sharedStrings.xml que son títulos VTA y que son etiquetas de cliente."""
+    vta_ids, label_ids = set(), set()
+    try:
+        source = archive.open(_SHARED_STRINGS_PART)
+    except KeyError:
+        return vta_ids, label_ids
+
+    with source:
+        index = 0
+        for _, element in ElementTree.iterparse(source):
+            if element.tag != f'{_SPREADSHEET_NS}si':
+                continue
+            text = _shared_string_text(element).upper()
+            if _VTA_TEXT.search(text):
+                vta_ids.add(index)
+            if text.replace(' ', '') in _CLIENT_LABELS:
+                label_ids.add(index)
+            index += 1
+            element.clear()
+    return vta_ids, label_ids
+
+# ==============================================================================
+# 2. RECORRIDO DE LAS HOJAS
+# ==============================================================================
+
+def _scan_sheet(archive, part, vta_ids, label_ids=None):
+    """
+    Recorre el XML de la hoja por trozos. Retorna (tiene_secciones_vta, tiene_etiqueta_cliente);
+    la etiqueta solo se busca si se pasa `label_ids`. Se detiene en cuanto tiene la respuesta.
+    """
+    has_vta, has_label = False, label_ids is None
+    tail = b''
+    with archive.open(part) as source:
+        while not (has_vta and has_label):
+            chunk = source.read(SCAN_CHUNK_BYTES)
+            if not chunk:
+                break
+            window = tail + chunk
+            shared = [int(m.group(1)) for m in _SHARED_CELL.finditer(window)] if vta_ids or label_ids else []
+            if not has_vta:
+                has_vta = _VTA_BYTES.search(window) is not None or any(i in vta_ids for i in shared)
+            if not has_label:
+                has_label = _CLIENT_LABEL_BYTES.search(window) is not None or any(i in label_ids for i in shared)
+            tail = window[-_SCAN_OVERLAP_BYTES:]
+    return has_vta, has_label
+
+def scan_workbook(file_path):
+    """
+    Pre-escanea el libro: qué hojas tienen títulos de sección VTA y si la primera hoja
+    tiene la etiqueta 'Cliente'. Una hoja cuyo XML no se encuentra se marca con
+    secciones (openpyxl decide). Lanza excepción si el archivo no es un libro válido.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        vta_ids, label_ids = _shared_string_ids(archive)
+        sheets, has_client_label = [], False
+        for position, (name, part) in enumerate(list_sheet_parts(archive)):
+            if part is None or part not in archive.NameToInfo:
+                sheets.append((name, True))
+                continue
+            has_vta, has_label = _scan_sheet(archive, part, vta_ids, label_ids if position == 0 else None)
+            if position == 0:
+                has_client_label = has_label
+            sheets.append((name, has_vta))
+    return WorkbookScan(sheets, has_client_label)
+
+# ==============================================================================
+# 3. EXTENSIÓN REAL DE LAS HOJAS
+# ==============================================================================
+
+# Fila del XML de la hoja: <row r="N" ...>
+_ROW_NUMBER = re.compile(rb'<(?:\w+:)?row\s[^>]*?\br="(\d+)"')
+
+def _last_row(archive, part):
+    """Número de la última fila del XML de la hoja (None si no tiene filas numeradas)."""
+    previous, last = b'', b''
+    with archive.open(part) as source:
+        for chunk in iter(lambda: source.read(SCAN_CHUNK_BYTES), b''):
+            previous, last = last, chunk
+    # La última fila empieza en uno de los dos últimos trozos
+    match = None
+    for match in _ROW_NUMBER.finditer(previous + last):
+        pass
+    return int(match.group(1)) if match else None
+
+def sheet_last_rows(file_path, sheet_names):
+    """
+    {hoja: número de su última fila} de las hojas `sheet_names`, leído de las filas del
+    XML (no de la dimensión declarada, que algunos programas escriben mal). Las hojas
+    cuyo XML no se encuentra quedan fuera; las que no numeran sus filas, en None.
+    Lanza excepción si el archivo no es un libro válido.
+    """
+    wanted = set(sheet_names)
+    with zipfile.ZipFile(file_path) as archive:
+        return {
+            name: _last_row(archive, part)
+            for name, part in list_sheet_parts(archive)
+            if name in wanted and part is not None and part in archive.NameToInfo
+        }
@@ -0,0 +1,196 @@
+# src/query.py
+# Conjunto de datos para consultas locales del consolidado (salida 'consulta') y su
+# motor de consultas (`python run_etl.py query ...`).
+#
+# La salida 'consulta' guarda el consolidado tipado en Parquet particionado por mes de
+# FECHA_MOVIMIENTO y por NIT: MES=YYYY-MM/NIT=<nit>/parte-NNNNN.parquet (una parte por
+# archivo fuente que aporta filas a la partición). Un índice JSON (estadisticas.json)
+# lista cada parte con su número de filas y el mínimo y máximo de cada columna de
+# COLUMNAS_FILTRO_CONSULTA. Una consulta descarta con el índice las partes que no pueden
+# cumplir los filtros y lee de las restantes solo las columnas necesarias, así
+# responder "VTA019 en kilos del NIT X en marzo" no requiere abrir el XLSX completo.
+#
+# Los textos se comparan sin distinguir mayúsculas: el índice guarda mínimo y máximo
+# en mayúsculas y los valores de los filtros se pasan a mayúsculas.
+
+import json
+import os
+import shutil
+from datetime import date
+from urllib.parse import quote
+from src.config import COLUMNAS_ESTANDAR, COLUMNAS_FILTRO_CONSULTA, QUERY_STATS_FILENAME
+from src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Se incrementa cuando cambia el formato de las partes o del índice
+QUERY_DATASET_VERSION = 1
+
+# Partición de las filas sin fecha válida
+SIN_FECHA = 'sin_fecha'
+
+# ==============================================================================
+# 1. ESCRITURA DEL CONJUNTO DE DATOS
+# ==============================================================================
+
+def _fragment_stats(table, pc):
+    """Mínimo y máximo de cada columna de COLUMNAS_FILTRO_CONSULTA en la parte (fechas ISO, textos en mayúsculas)."""
+    stats = {}
+    for col in COLUMNAS_FILTRO_CONSULTA:
+        values = table[col]
+        if col != 'FECHA_MOVIMIENTO':
+            values = pc.utf8_upper(values)
+        bounds = pc.min_max(values)
+        low, high = bounds['min'].as_py(), bounds['max'].as_py()
+        if col == 'FECHA_MOVIMIENTO' and low is not None:
+            low, high = low.isoformat(), high.isoformat()
+        stats[col] = [low, high]
+    return stats
+
+class QueryDatasetWriter:
+    """
+    Escribe el conjunto de datos de consulta en `dataset_dir`. `write` recibe cada bloque
+    ya tipado (load.to_typed_frame) y escribe una parte por partición (mes, NIT). Se
+    escribe en una carpeta temporal que reemplaza a la anterior al cerrar. Requiere pyarrow.
+    """
+
+    def __init__(self, dataset_dir, schema):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        self._pa, self._pc, self._pq = pa, pc, pq
+        self.schema = schema
+        self.dataset_dir = dataset_dir
+        self.tmp_dir = dataset_dir + ".tmp"
+        if os.path.exists(self.tmp_dir):
+            shutil.rmtree(self.tmp_dir)
+        os.makedirs(self.tmp_dir)
+        self.fragments = []
+
+    def write(self, typed):
+        table = self._pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False)
+        # Partición (mes, NIT) de cada fila; la fecha puede llegar categórica (bloques compactos)
+        fechas = typed['FECHA_MOVIMIENTO'].astype('datetime64[ns]')
+        months = (fechas.dt.year * 100 + fechas.dt.month).fillna(0).astype(int).to_numpy()
+        nits = typed['NIT'].astype(object).fillna('').to_numpy()
+        groups = pd.DataFrame({'mes': months, 'nit': nits}).groupby(['mes', 'nit'], sort=False).indices
+        for (month, nit), rows in groups.items():
+            month = f"{month // 100:04d}-{month % 100:02d}" if month else SIN_FECHA
+            relative = f"MES={month}/NIT={quote(nit, safe='') or '_'}/parte-{len(self.fragments):05d}.parquet"
+            path = os.path.join(self.tmp_dir, *relative.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = table.take(rows)
+            self._pq.write_table(part, path, compression='zstd')
+            self.fragments.append({
+                'path': relative, 'mes': month, 'nit': nit, 'filas': len(rows),
+                'stats': _fragment_stats(part, self._pc),
+            })
+
+    def close(self):
+        """Guarda el índice y reemplaza el conjunto de datos anterior. Retorna la carpeta."""
+        index = {'version': QUERY_DATASET_VERSION, 'columns': COLUMNAS_FILTRO_CONSULTA, 'fragments': self.fragments}
+        with open(os.path.join(self.tmp_dir, QUERY_STATS_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        old_dir = self.dataset_dir + ".old"
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(self.dataset_dir):
+            os.replace(self.dataset_dir, old_dir)
+        os.replace(self.tmp_dir, self.dataset_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return self.dataset_dir
+
+    def abort(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+# ==============================================================================
+# 2. CONSULTAS
+# ==============================================================================
+
+def _normalize_filters(filters):
+    """{columna: [valores en mayúsculas]} sin filtros vacíos; valida que las columnas sean filtrables."""
+    normalized = {}
+    for col, values in (filters or {}).items():
+        if col not in COLUMNAS_FILTRO_CONSULTA or col == 'FECHA_MOVIMIENTO':
+            raise ValueError(f"La columna '{col}' no se puede filtrar por valor.")
+        if values:
+            normalized[col] = [str(v).strip().upper() for v in values]
+    return normalized
+
+def _may_match(fragment, date_from, date_to, filters):
+    """True si la parte puede tener filas que cumplen los filtros (según su mínimo y máximo)."""
+    stats = fragment['stats']
+    low, high = stats['FECHA_MOVIMIENTO']
+    if (date_from or date_to) and low is None:
+        return False
+    if date_from and high < date_from:
+        return False
+    if date_to and low > date_to:
+        return False
+    for col, values in filters.items():
+        low, high = stats[col]
+        if low is None or not any(low <= v <= high for v in values):
+            return False
+    return True
+
+class QueryDataset:
+    """Conjunto de datos de consulta escrito por la salida 'consulta'. Requiere pyarrow."""
+
+    def __init__(self, dataset_dir):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.dataset_dir = dataset_dir
+        index_path = os.path.join(dataset_dir, QUERY_STATS_FILENAME)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(
+                f"No existe el conjunto de datos de consulta en {dataset_dir}; "
+                "genérelo con la salida 'consulta' (--sinks ... consulta)."
+            )
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != QUERY_DATASET_VERSION:
+            raise ValueError(f"El conjunto de datos de {dataset_dir} es de otra versión; vuelva a generarlo.")
+        self.fragments = index['fragments']
+
+    def prune(self, date_from=None, date_to=None, filters=None):
+        """Partes que pueden cumplir los filtros (fechas 'YYYY-MM-DD' inclusivas, {columna: [valores]})."""
+        filters = _normalize_filters(filters)
+        return [f for f in self.fragments if _may_match(f, date_from, date_to, filters)]
+
+    def query(self, date_from=None, date_to=None, filters=None, columns=None):
+        """
+        Movimientos que cumplen los filtros, con las columnas `columns` (todas si es None).
+        Retorna (DataFrame, partes leídas). Las fechas salen como 'YYYY-MM-DD'.
+        """
+        columns = list(columns or COLUMNAS_ESTANDAR)
+        fragments = self.prune(date_from, date_to, filters)
+        filters = _normalize_filters(filters)
+
+        needed = list(dict.fromkeys(columns + list(filters) + (['FECHA_MOVIMIENTO'] if date_from or date_to else [])))
+        tables = [
+            self._pq.read_table(os.path.join(self.dataset_dir, *f['path'].split('/')), columns=needed)
+            for f in fragments
+        ]
+        if not tables:
+            return pd.DataFrame(columns=columns), fragments
+        frame = self._pa.concat_tables(tables).to_pandas()
+
+        mask = pd.Series(True, index=frame.index)
+        if date_from or date_to:
+            fechas = pd.to_datetime(frame['FECHA_MOVIMIENTO'], errors='coerce')
+            if date_from:
+                mask &= fechas >= pd.Timestamp(date_from)
+            if date_to:
+                mask &= fechas <= pd.Timestamp(date_to)
+        for col, values in filters.items():
+            mask &= frame[col].str.upper().isin(values).fillna(False).astype(bool)
+
+        result = frame.loc[mask, columns].reset_index(drop=True)
+        if 'FECHA_MOVIMIENTO' in result:
+            result['FECHA_MOVIMIENTO'] = result['FECHA_MOVIMIENTO'].map(
+                lambda d: d.isoformat() if isinstance(d, date) else None
+            )
+        return result, fragments
@@ -0,0 +1,239 @@
+# src/rules.py
+# Reglas de extracción y clasificación (reglas.json) y mapa de clientes
+# (client_mapping.json), compilados y con recarga en caliente.
+#
+# reglas.json tiene un campo "version" (formato del archivo) y los mapas que antes
+# vivían en config.py: cabecera de fecha, cabeceras de cantidad, tarifa, total y
+# observaciones, hojas omitidas y clasificaciones VTA y de subtipo. Se compila a
+# tablas de búsqueda directa: cabecera normalizada -> (rol, nombre estándar,
+# prioridad) y código -> categoría. Durante una ejecución del ETL la forma compilada
+# se guarda en la caché (<CACHE_DIR>/reglas/<sha256 del archivo>.pickle): mientras el
+# archivo no cambie, se lee sin volver a compilar. Fuera de una ejecución (benchmarks,
+# pruebas) se compila en memoria y no se escribe nada en disco.
+#
+# current_rules() y current_client_resolver() revisan el mtime del archivo en cada
+# llamada (un stat) y recargan si cambió; así el modo servicio (--watch) y el pool
+# caliente aplican las reglas editadas sin reiniciar. Si el archivo editado no es
+# válido, se avisa y se mantienen las reglas anteriores.
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from src.config import REGLAS_FILENAME, CLIENT_MAPPING_FILENAME
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RULES_FILE = os.path.join(PROJECT_ROOT, REGLAS_FILENAME)
+CLIENT_MAPPING_FILE = os.path.join(PROJECT_ROOT, CLIENT_MAPPING_FILENAME)
+
+# Versión del formato de reglas.json que entiende el ETL
+RULES_FORMAT_VERSION = 1
+
+# Se incrementa cuando cambia la compilación para invalidar las reglas compiladas en disco
+COMPILER_VERSION = 1
+
+# Roles de las cabeceras reconocidas
+ROL_FECHA = 'FECHA'
+ROL_CANTIDAD = 'CANTIDAD'
+ROL_TARIFA = 'TARIFA'
+ROL_TOTAL = 'TOTAL'
+ROL_OBSERVACION = 'OBSERVACION'
+
+_REQUIRED_KEYS = {
+    'cabecera_fecha': str, 'hojas_omitidas': list, 'columnas_cantidad_bruta': dict,
+    'columnas_tarifa_bruta': dict, 'columnas_total_bruta': dict, 'columnas_observaciones_brutas': list,
+    'clasificacion_vta': dict, 'clasificacion_subtipo': dict,
+}
+
+_HEADER_CLEAN_PATTERN = re.compile(r'[^\w\s]')
+
+def header_key(text):
+    """Clave de búsqueda de una cabecera: mayúsculas, sin puntuación ni espacios."""
+    return _HEADER_CLEAN_PATTERN.sub('', str(text).strip().upper()).replace(' ', '')
+
+# ==============================================================================
+# 1. COMPILACIÓN
+# ==============================================================================
+
+def _invert_classification_map(classification_map):
+    """Invierte {categoría: [códigos]} a {código: categoría} (gana la primera categoría, como en el recorrido lineal)."""
+    inverted = {}
+    for category, codes in classification_map.items():
+        for code in codes:
+            inverted.setdefault(code, category)
+    return inverted
+
+class CompiledRules:
+    """
+    Reglas de reglas.json listas para usar. Conserva los mapas tal como están en el
+    archivo (date_header, quantity_headers, omitted_sheet_names, ...) y sus formas compiladas:
+      - header_index: cabecera normalizada -> (rol, nombre estándar, prioridad); la
+        prioridad es el orden de declaración y resuelve igual que el recorrido de los mapas,
+      - vta_category_by_code / subtipo_category_by_code: código -> categoría,
+      - omitted_sheets: nombres de hoja omitidos, en minúsculas.
+    `digest` es el sha256 del contenido del archivo.
+    """
+
+    def __init__(self, raw, digest):
+        self.digest = digest
+        self.version = raw['version']
+        self.date_header = raw['cabecera_fecha']
+        self.quantity_headers = dict(raw['columnas_cantidad_bruta'])
+        self.rate_headers = dict(raw['columnas_tarifa_bruta'])
+        self.total_headers = dict(raw['columnas_total_bruta'])
+        self.observation_headers = list(raw['columnas_observaciones_brutas'])
+        self.vta_classification = dict(raw['clasificacion_vta'])
+        self.subtipo_classification = dict(raw['clasificacion_subtipo'])
+        self.omitted_sheet_names = list(raw['hojas_omitidas'])
+        self.omitted_sheets = frozenset(name.lower() for name in self.omitted_sheet_names)
+
+        candidates = [(self.date_header, ROL_FECHA, self.date_header)]
+        candidates += [(bruto, ROL_CANTIDAD, estandar) for bruto, estandar in self.quantity_headers.items()]
+        candidates += [(bruto, ROL_TARIFA, "TARIFA") for bruto in self.rate_headers]
+        candidates += [(bruto, ROL_TOTAL, "TOTAL") for bruto in self.total_headers]
+        candidates += [(bruto, ROL_OBSERVACION, bruto) for bruto in self.observation_headers]
+        self.header_index = {}
+        for priority, (bruto, role, estandar) in enumerate(candidates):
+            self.header_index.setdefault(header_key(bruto), (role, estandar, priority))
+        self.date_key = header_key(self.date_header)
+
+        self.vta_category_by_code = _invert_classification_map(self.vta_classification)
+        self.subtipo_category_by_code = _invert_classification_map(self.subtipo_classification)
+
+def _parse_rules(content):
+    """Valida el contenido de reglas.json (bytes) y retorna el diccionario."""
+    raw = json.loads(content.decode('utf-8'))
+    if not isinstance(raw, dict) or raw.get('version') != RULES_FORMAT_VERSION:
+        version = raw.get('version') if isinstance(raw, dict) else None
+        raise ValueError(f"versión de reglas {version!r} no soportada (se espera {RULES_FORMAT_VERSION})")
+    for key, kind in _REQUIRED_KEYS.items():
+        if not isinstance(raw.get(key), kind):
+            raise ValueError(f"falta '{key}' o no es {'texto' if kind is str else 'una lista' if kind is list else 'un objeto'}")
+    return raw
+
+def compile_rules(file_path, compiled_dir=None):
+    """
+    Reglas compiladas del archivo: las guardadas en `compiled_dir` para su sha256 o,
+    si no existen, las compila y las guarda. Sin `compiled_dir` solo las compila.
+    Lanza excepción si el archivo no es válido.
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    compiled_path = os.path.join(compiled_dir, f"{digest}.v{COMPILER_VERSION}.pickle") if compiled_dir else None
+
+    if compiled_path:
+        try:
+            with open(compiled_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass
+
+    rules = CompiledRules(_parse_rules(content), digest)
+    if compiled_path:
+        try:
+            os.makedirs(compiled_dir, exist_ok=True)
+            tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, compiled_path)
+        except OSError:
+            # Sin caché en disco (carpeta de solo lectura): se usan las reglas en memoria
+            pass
+    return rules
+
+# ==============================================================================
+# 2. RECARGA EN CALIENTE
+# ==============================================================================
+
+# Por archivo: (firma (mtime_ns, tamaño) del archivo cargado, objeto cargado)
+_loaded = {}
+
+# Carpeta de las reglas compiladas en disco (None = solo en memoria); la fija run_etl.py
+_compiled_dir = None
+
+def use_compiled_dir(compiled_dir):
+    """Guarda y busca las reglas compiladas en `compiled_dir` (None = solo en memoria)."""
+    global _compiled_dir
+    _compiled_dir = compiled_dir
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _reload_if_changed(file_path, load, description):
+    """
+    Objeto cargado de `file_path` con `load(file_path)`, recargado si cambió el mtime o
+    el tamaño. Si la recarga falla se conservan las reglas anteriores (con aviso);
+    si falla la primera carga, se propaga el error.
+    """
+    signature = _file_signature(file_path)
+    previous = _loaded.get(file_path)
+    if previous is not None and previous[0] == signature:
+        return previous[1]
+
+    try:
+        value = load(file_path)
+    except Exception as e:
+        if previous is None:
+            raise
+        print(f"  -> ⚠️ No se pudo recargar {description} ({os.path.basename(file_path)}): {e}. "
+              f"Se mantiene la versión anterior.")
+        _loaded[file_path] = (signature, previous[1])
+        return previous[1]
+
+    if previous is not None:
+        print(f"  -> 🔄 Recarga de {description}: {os.path.basename(file_path)} cambió.")
+    _loaded[file_path] = (signature, value)
+    return value
+
+def current_rules(file_path=RULES_FILE):
+    """Reglas compiladas vigentes (se recargan si el archivo cambió desde la última llamada)."""
+    try:
+        return _reload_if_changed(file_path, lambda path: compile_rules(path, _compiled_dir), 'las reglas')
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No se encontró el archivo de reglas {file_path}.")
+    except ValueError as e:
+        raise ValueError(f"El archivo de reglas {file_path} no es válido: {e}")
+
+def _load_client_resolver(file_path):
+    # clients.py solo se importa al resolver el primer cliente
+    from src.clients import ClientResolver
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+    except FileNotFoundError:
+        print(f"  -> ⚠️ Advertencia: Archivo de mapeo de clientes no encontrado en {file_path}. "
+              f"No se aplicará estandarización de clientes.")
+        mapping = {}
+    return ClientResolver(mapping)
+
+def current_client_resolver(file_path=CLIENT_MAPPING_FILE):
+    """ClientResolver del mapa de clientes vigente (se carga al primer uso y se recarga si el archivo cambió)."""
+    try:
+        return _reload_if_changed(file_path, _load_client_resolver, 'el mapa de clientes')
+    except json.JSONDecodeError:
+        from src.clients import ClientResolver
+
+        print(f"  -> ❌ Error: El archivo de mapeo de clientes {file_path} no es un JSON válido.")
+        resolver = ClientResolver({})
+        _loaded[file_path] = (_file_signature(file_path), resolver)
+        return resolver
+
+def rules_digest(rules_file=RULES_FILE, client_mapping_file=CLIENT_MAPPING_FILE):
+    """
+    Huella de las reglas vigentes y del mapa de clientes: los resultados transformados
+    en caché solo valen para la misma huella.
+    """
+    digest = hashlib.sha256(current_rules(rules_file).digest.encode('ascii'))
+    try:
+        with open(client_mapping_file, 'rb') as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        pass
+    return digest.hexdigest()
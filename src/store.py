@@ -0,0 +1,218 @@
+# src/store.py
+# Almacén incremental del consolidado (opción --store de run_etl.py): una partición
+# por archivo fuente (FUENTE_ARCHIVO), en Parquet (un archivo por partición) o en
+# SQLite (una tabla, con un índice de búsqueda por CLAVE_MOVIMIENTO). Cada ejecución
+# reemplaza completas las particiones de los archivos nuevos o modificados y elimina
+# las de los archivos que ya no están; las salidas (XLSX, ...) se regeneran leyendo el
+# almacén, sin volver a procesar ni a leer de la caché los archivos sin cambios.
+#
+# Las filas se guardan tipadas (to_typed_frame). Las celdas de TARIFA y TOTAL que no
+# son número se guardan además como texto (TARIFA_TEXTO, TOTAL_TEXTO), así el XLSX
+# regenerado desde el almacén es igual al del modo normal.
+#
+# Cada almacén lleva un índice {archivo: sha256 del archivo fuente} de las particiones
+# que contiene, para saber cuáles están al día respecto del manifiesto de la caché.
+
+import json
+import os
+import sqlite3
+from urllib.parse import quote
+from src.config import (
+    COLUMNAS_ESTANDAR, CLAVE_MOVIMIENTO, SQLITE_TABLE,
+    STORE_SQLITE_FILENAME, STORE_INDEX_FILENAME
+)
+from src.frames import compact_frame
+from src.load import to_typed_frame, arrow_schema, sqlite_columns_sql, sqlite_rows
+from src.parsing import numbers_to_float
+from src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Columna que define la partición: una carga reemplaza todas las filas de un archivo fuente
+_PARTITION_COLUMN = CLAVE_MOVIMIENTO[0]
+
+# Columna numérica -> columna con el texto original de sus celdas que no son número
+_RAW_TEXT_COLUMNS = {'TARIFA': 'TARIFA_TEXTO', 'TOTAL': 'TOTAL_TEXTO'}
+
+# ==============================================================================
+# 1. AUXILIARES
+# ==============================================================================
+
+def _raw_texts(frame):
+    """Texto original de las celdas de TARIFA y TOTAL que no son número (None en el resto), por columna de texto."""
+    texts = {}
+    for col, text_col in _RAW_TEXT_COLUMNS.items():
+        if col not in frame.columns:
+            texts[text_col] = pd.Series([None] * len(frame.index), index=frame.index, dtype=object)
+            continue
+        raw = frame[col].astype(object)
+        is_text = (numbers_to_float(raw).isna() & raw.notna()).to_numpy()
+        texts[text_col] = pd.Series(
+            [str(value) if text else None for value, text in zip(raw.tolist(), is_text)], index=frame.index, dtype=object
+        )
+    return pd.DataFrame(texts, index=frame.index)
+
+def _standard_frame(typed):
+    """
+    Convierte un bloque leído del almacén al formato de transform.py (fechas 'YYYY-MM-DD',
+    categóricas), con el texto original en las tarifas y totales que no son número.
+    """
+    frame = typed.reindex(columns=COLUMNAS_ESTANDAR)
+    for col, text_col in _RAW_TEXT_COLUMNS.items():
+        if text_col in typed.columns:
+            texts = typed[text_col]
+            frame[col] = frame[col].astype(object).where(texts.isna(), texts)
+    fechas = pd.to_datetime(frame['FECHA_MOVIMIENTO'], errors='coerce')
+    frame['FECHA_MOVIMIENTO'] = fechas.dt.strftime('%Y-%m-%d').astype(object).where(fechas.notna(), None)
+    return compact_frame(frame)
+
+class _PartitionedStore:
+    """
+    Base de los almacenes: `index` es {archivo: sha256} de las particiones guardadas.
+    Las subclases implementan replace(name, sha256, frame), drop(names) y _read(name).
+    """
+    name = None
+
+    def stale(self, entries):
+        """Archivos del manifiesto (`entries`) cuya partición falta o es de otro contenido."""
+        return [name for name, entry in entries.items() if self.index.get(name) != entry['sha256']]
+
+    def obsolete(self, entries):
+        """Particiones de archivos que ya no están en el manifiesto."""
+        return [name for name in self.index if name not in entries]
+
+    def read(self, name):
+        """DataFrame de la partición del archivo `name` (formato de transform.py) o None si no existe."""
+        if name not in self.index:
+            return None
+        return _standard_frame(self._read(name))
+
+    def close(self):
+        pass
+
+# ==============================================================================
+# 2. ALMACENES
+# ==============================================================================
+
+class ParquetStore(_PartitionedStore):
+    """Un archivo Parquet tipado (zstd) por archivo fuente. El índice es un JSON en la misma carpeta. Requiere pyarrow."""
+    name = 'parquet'
+
+    def __init__(self, store_dir):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.schema = arrow_schema()
+        for text_col in _RAW_TEXT_COLUMNS.values():
+            self.schema = self.schema.append(pa.field(text_col, pa.string()))
+        self.store_dir = os.path.join(store_dir, self.name)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.index_path = os.path.join(self.store_dir, STORE_INDEX_FILENAME)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def partition_path(self, name):
+        return os.path.join(self.store_dir, quote(name, safe='') + '.parquet')
+
+    def replace(self, name, sha256, frame):
+        """Reemplaza la partición del archivo `name` por las filas de `frame` (DataFrame de transform)."""
+        path = self.partition_path(name)
+        typed = pd.concat([to_typed_frame(frame), _raw_texts(frame)], axis=1)
+        table = self._pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False)
+        self._pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+        self.index[name] = sha256
+        self._save_index()
+
+    def drop(self, names):
+        """Elimina las particiones de los archivos `names`."""
+        for name in names:
+            path = self.partition_path(name)
+            if os.path.exists(path):
+                os.remove(path)
+            self.index.pop(name, None)
+        self._save_index()
+
+    def _read(self, name):
+        return self._pq.read_table(self.partition_path(name)).to_pandas()
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+class SqliteStore(_PartitionedStore):
+    """
+    Base SQLite persistente: tabla SQLITE_TABLE (columnas estándar más las de texto de
+    _RAW_TEXT_COLUMNS) con un índice de búsqueda por CLAVE_MOVIMIENTO, y tabla 'particiones'
+    como índice de particiones. Cada reemplazo (borrado de la partición + inserción + índice)
+    es una transacción.
+    """
+    name = 'sqlite'
+
+    def __init__(self, store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_path = os.path.join(store_dir, STORE_SQLITE_FILENAME)
+        # Las particiones se escriben y luego se leen desde hilos distintos del pipeline,
+        # nunca a la vez
+        self.conn = sqlite3.connect(self.store_path, isolation_level=None, check_same_thread=False)
+        text_columns_sql = ", ".join(f'"{col}" TEXT' for col in _RAW_TEXT_COLUMNS.values())
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{SQLITE_TABLE}" ({sqlite_columns_sql()}, {text_columns_sql})')
+        # Bases creadas antes de guardar el texto original: se agregan las columnas (CACHE_VERSION
+        # reprocesa entonces todos los archivos y sus particiones se reemplazan)
+        existing = {row[1] for row in self.conn.execute(f'PRAGMA table_info("{SQLITE_TABLE}")')}
+        for text_col in _RAW_TEXT_COLUMNS.values():
+            if text_col not in existing:
+                self.conn.execute(f'ALTER TABLE "{SQLITE_TABLE}" ADD COLUMN "{text_col}" TEXT')
+        key_columns = ", ".join(f'"{col}"' for col in CLAVE_MOVIMIENTO)
+        self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{SQLITE_TABLE}_clave" ON "{SQLITE_TABLE}" ({key_columns})')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS particiones (archivo TEXT PRIMARY KEY, sha256 TEXT, filas INTEGER)')
+        self.index = dict(self.conn.execute('SELECT archivo, sha256 FROM particiones'))
+        columns = COLUMNAS_ESTANDAR + list(_RAW_TEXT_COLUMNS.values())
+        column_names = ", ".join(f'"{col}"' for col in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        self.insert_sql = f'INSERT INTO "{SQLITE_TABLE}" ({column_names}) VALUES ({placeholders})'
+        self.delete_sql = f'DELETE FROM "{SQLITE_TABLE}" WHERE "{_PARTITION_COLUMN}" = ?'
+
+    def replace(self, name, sha256, frame):
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(self.delete_sql, (name,))
+            if len(frame):
+                texts = _raw_texts(frame).itertuples(index=False, name=None)
+                self.conn.executemany(self.insert_sql, (row + text for row, text in zip(sqlite_rows(frame), texts)))
+            self.conn.execute('INSERT OR REPLACE INTO particiones VALUES (?, ?, ?)', (name, sha256, len(frame)))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.index[name] = sha256
+
+    def drop(self, names):
+        self.conn.execute("BEGIN")
+        for name in names:
+            self.conn.execute(self.delete_sql, (name,))
+            self.conn.execute('DELETE FROM particiones WHERE archivo = ?', (name,))
+            self.index.pop(name, None)
+        self.conn.execute("COMMIT")
+
+    def _read(self, name):
+        return pd.read_sql_query(
+            f'SELECT * FROM "{SQLITE_TABLE}" WHERE "{_PARTITION_COLUMN}" = ? ORDER BY rowid',
+            self.conn, params=(name,)
+        )
+
+    def close(self):
+        self.conn.close()
+
+# Almacenes disponibles por nombre (opción --store de run_etl.py)
+STORES = {store.name: store for store in (ParquetStore, SqliteStore)}
+
+def open_store(store_name, store_dir):
+    """Abre (o crea) el almacén `store_name` en `store_dir`."""
+    return STORES[store_name](store_dir)
@@ -0,0 +1,81 @@
+# src/summary.py
+# Resúmenes agregados del consolidado, calculados durante la carga (salida 'resumen').
+#
+# Cada bloque de filas se agrupa al llegar por DIMENSIONES_RESUMEN (cliente, NIT, mes
+# y clasificaciones) y solo se guarda su agregado: una fila por grupo con la suma de
+# MEDIDAS_RESUMEN y el número de movimientos. Como sumas y conteos son aditivos, los
+# agregados parciales se combinan entre sí y cada hoja de RESUMENES se obtiene del
+# acumulador al final, en una sola pasada y sin volver a leer el detalle.
+
+import re
+from src.config import MEDIDAS_RESUMEN, DIMENSIONES_RESUMEN, RESUMENES
+from src.frames import map_distinct
+from src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Columna con el número de filas agregadas en cada grupo
+COLUMNA_MOVIMIENTOS = 'MOVIMIENTOS'
+
+# Agregados parciales que se acumulan antes de combinarlos en uno solo
+_MAX_PENDING_PARTS = 64
+
+_ISO_DATE = re.compile(r'(\d{4}-\d{2})-\d{2}')
+
+def month_of(value):
+    """Mes 'YYYY-MM' de una fecha 'YYYY-MM-DD' ('' si el valor no es una fecha ISO)."""
+    match = _ISO_DATE.fullmatch(value) if isinstance(value, str) else None
+    return match.group(1) if match else ''
+
+def _combine(parts):
+    combined = pd.concat(parts, ignore_index=True)
+    return combined.groupby(DIMENSIONES_RESUMEN, sort=False, as_index=False).sum()
+
+class SummaryAccumulator:
+    """
+    Acumulador de agregados por DIMENSIONES_RESUMEN. `add` recibe cada bloque de filas
+    (formato de transform.py) con sus medidas numéricas; `tables` retorna las hojas de RESUMENES.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self.rows = 0
+
+    def add(self, chunk, measures):
+        """
+        Suma al acumulador el bloque `chunk`. `measures` es {columna: serie numérica}
+        de MEDIDAS_RESUMEN, con el mismo índice que el bloque.
+        """
+        if len(chunk) == 0:
+            return
+        keys = {
+            col: map_distinct(chunk['FECHA_MOVIMIENTO'], month_of) if col == 'MES' else chunk[col]
+            for col in DIMENSIONES_RESUMEN
+        }
+        frame = pd.DataFrame({**keys, **{col: measures[col] for col in MEDIDAS_RESUMEN}})
+        frame[COLUMNA_MOVIMIENTOS] = 1
+
+        grouped = frame.groupby(DIMENSIONES_RESUMEN, observed=True, dropna=False, sort=False, as_index=False)
+        part = grouped[MEDIDAS_RESUMEN + [COLUMNA_MOVIMIENTOS]].sum()
+        # Claves como texto (los bloques traen categóricas distintas; vacíos como '')
+        for col in DIMENSIONES_RESUMEN:
+            part[col] = part[col].astype(object).where(part[col].notna(), '')
+        self._parts.append(part)
+        self.rows += len(chunk)
+
+        if len(self._parts) >= _MAX_PENDING_PARTS:
+            self._parts = [_combine(self._parts)]
+
+    def tables(self):
+        """{nombre de hoja: DataFrame} de RESUMENES, ordenados por sus dimensiones."""
+        if not self._parts:
+            return {}
+        totals = _combine(self._parts)
+        self._parts = [totals]
+
+        columns = [COLUMNA_MOVIMIENTOS] + MEDIDAS_RESUMEN
+        tables = {}
+        for title, dimensions in RESUMENES.items():
+            table = totals.groupby(dimensions, sort=True, as_index=False)[columns].sum()
+            tables[title] = table[dimensions + columns]
+        return tables
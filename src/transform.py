@@ -1,36 +1,22 @@
 # src/transform.py
 
-from datetime import datetime
-import json
-import os
 import re
-from src.config import COLUMNAS_ESTANDAR, VTA_CLASSIFICATION_MAP, SUBTIPO_CLASSIFICATION_MAP 
-
-# --- RUTAS DE CONFIGURACIÓN ---
-PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
-CLIENT_MAPPING_FILE = os.path.join(PROJECT_ROOT, 'client_mapping.json') 
+import numpy as np
+import pandas as pd
+from src.config import COLUMNAS_ESTANDAR
+from src.rules import current_rules, current_client_resolver
+from src.parsing import parse_date, dates_to_iso, numbers_to_float
+from src.frames import compact_frame, map_distinct
 
 # Patrón regex para extraer el código VTA (VTA###)
 VTA_CODE_PATTERN = re.compile(r'(VTA\d{3})', re.IGNORECASE)
 
 # ==============================================================================
-# 1. CARGA DE CONFIGURACIÓN SENSIBLE (CLIENTES/NIT)
+# 1. REGLAS Y MAPA DE CLIENTES
 # ==============================================================================
 
-def _load_client_map(file_path):
-    """Función para cargar el mapa de clientes desde un archivo JSON."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            print(f"  -> Mapa de Clientes (NIT) cargado desde {os.path.basename(file_path)}.")
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"  -> ⚠️ Advertencia: Archivo de mapeo de clientes no encontrado en {file_path}. No se aplicará estandarización de clientes.")
-        return {}
-    except json.JSONDecodeError:
-        print(f"  -> ❌ Error: El archivo de mapeo de clientes {file_path} no es un JSON válido.")
-        return {}
-
-CLIENT_MAPPING = _load_client_map(CLIENT_MAPPING_FILE)
+# Las clasificaciones VTA/subtipo (reglas.json) y el mapa de clientes (client_mapping.json)
+# los carga src/rules.py al primer uso, ya compilados, y los recarga si el archivo cambia.
 
 # ==============================================================================
 # 2. FUNCIONES DE LIMPIEZA BÁSICA
@@ -38,30 +24,7 @@ CLIENT_MAPPING = _load_client_map(CLIENT_MAPPING_FILE)
 
 def _clean_date(date_value):
     """Limpia y estandariza las fechas a formato 'YYYY-MM-DD'."""
-    if isinstance(date_value, datetime):
-        return date_value.strftime('%Y-%m-%d')
-    elif isinstance(date_value, (int, float)):
-        return None
-    elif isinstance(date_value, str):
-        date_value = date_value.strip()
-        for fmt in ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d %b'):
-            try:
-                return datetime.strptime(date_value, fmt).strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-    return None
-
-def _clean_kilos(kilos_value):
-    """Limpia valores numéricos de cantidad."""
-    if isinstance(kilos_value, (int, float)):
-        return round(float(kilos_value), 2)
-    elif isinstance(kilos_value, str):
-        try:
-            kilos_value = kilos_value.replace(',', '').replace('$', '').strip() 
-            return round(float(kilos_value), 2)
-        except ValueError:
-            return 0.0
-    return 0.0
+    return parse_date(date_value)
 
 # ==============================================================================
 # 3. FUNCIONES DE CLASIFICACIÓN VTA (Mantenidas)
@@ -74,11 +37,9 @@ def _clean_and_get_vta_code(tipo_movimiento_bruto):
     return match.group(1).upper() if match else ""
 
 def _classify_vta(vta_limpio_code):
-    """Clasifica el código VTA limpio usando el mapa de config.py."""
+    """Clasifica el código VTA limpio con la tabla código -> categoría de las reglas."""
     if not vta_limpio_code: return "OTRO"
-    for category, vta_list in VTA_CLASSIFICATION_MAP.items():
-        if vta_limpio_code in vta_list: return category
-    return "OTRO"
+    return current_rules().vta_category_by_code.get(vta_limpio_code, "OTRO")
 
 # ==============================================================================
 # 4. FUNCIONES DE CLASIFICACIÓN SUBTIPO (Mantenidas)
@@ -90,11 +51,9 @@ def _clean_and_get_subtipo_code(subtipo_bruto):
     return str(subtipo_bruto).strip().upper()
 
 def _classify_subtipo(subtipo_limpio_code):
-    """Clasifica el código de subtipo limpio usando el mapa de config.py."""
+    """Clasifica el código de subtipo limpio con la tabla código -> categoría de las reglas."""
     if not subtipo_limpio_code: return "OTRO"
-    for category, subtipo_list in SUBTIPO_CLASSIFICATION_MAP.items():
-        if subtipo_limpio_code in subtipo_list: return category
-    return "OTRO"
+    return current_rules().subtipo_category_by_code.get(subtipo_limpio_code, "OTRO")
 
 # ==============================================================================
 # 5. FUNCIONES DE MAPEO DE CLIENTES (Mantenidas)
@@ -102,85 +61,142 @@ def _classify_subtipo(subtipo_limpio_code):
 
 def _get_standardized_client_info(client_name):
     """
-    Busca el nombre del cliente extraído en el mapeo cargado (CLIENT_MAPPING) 
+    Busca el nombre del cliente extraído en el mapeo de clientes vigente
     y retorna el Cliente Estandarizado y el NIT.
+    Admite variantes de escritura (tildes, puntuación, sufijos societarios) y
+    coincidencias aproximadas; ver src/clients.py.
     """
-    if not client_name:
-        return "SIN CLIENTE", "SIN NIT" 
-        
-    client_key = str(client_name).strip()
-    mapping = CLIENT_MAPPING.get(client_key)
-    
-    if mapping:
-        estandar = mapping.get('estandar', client_key.upper())
-        nit = mapping.get('nit', "SIN NIT")
-        return estandar, nit
-    else:
-        return client_key.upper(), "NO ENCONTRADO"
+    return current_client_resolver().resolve(client_name)
 
 # ==============================================================================
-# 6. FUNCIÓN PRINCIPAL DE TRANSFORMACIÓN
+# 6. FUNCIONES VECTORIZADAS (DATAFRAME)
 # ==============================================================================
 
+def _clean_dates_series(values):
+    """Versión vectorizada de _clean_date: retorna 'YYYY-MM-DD' o None por cada valor (formato detectado por columna)."""
+    return dates_to_iso(values)
+
+def _clean_kilos_series(values):
+    """
+    Limpia la columna de cantidades: número redondeado a 2 decimales (0.0 si no es válido),
+    con la convención decimal detectada en la columna (parsing.numbers_to_float).
+    Un NaN numérico se conserva como NaN, como en el recorrido por filas original.
+    """
+    numbers = numbers_to_float(values)
+    invalid = numbers.isna().to_numpy().copy()
+    if invalid.any():
+        invalid[invalid] = [not isinstance(v, float) for v in values.to_numpy(dtype=object)[invalid]]
+    return _round2(numbers.mask(invalid, 0.0))
+
+def _round2(values):
+    """Redondeo a 2 decimales idéntico a round() de Python, calculado una vez por valor distinto."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    rounded = np.array([round(float(v), 2) for v in uniques], dtype=float)
+    return pd.Series(rounded[codes], index=values.index)
+
+def _column(frame, name, default):
+    """Retorna la columna `name` del DataFrame o una serie constante con `default` si no existe."""
+    if name in frame.columns:
+        return frame[name]
+    # Lista explícita: pd.Series(None, dtype=object) se llenaría con NaN
+    return pd.Series([default] * len(frame.index), index=frame.index, dtype=object)
+
+def _vta_code_of(tipo_movimiento_bruto):
+    return "" if pd.isna(tipo_movimiento_bruto) else _clean_and_get_vta_code(str(tipo_movimiento_bruto))
+
+def clean_and_standardize_frame(raw_frame, compact=True):
+    """
+    Versión DataFrame -> DataFrame de clean_and_standardize: aplica las mismas
+    limpiezas, clasificaciones y mapeos de forma vectorizada.
+    Las limpiezas de texto se calculan una vez por valor distinto y el resultado
+    es compacto: las columnas de COLUMNAS_CATEGORICAS salen como categóricas.
+    Con `compact=False` las columnas copiadas de la entrada quedan como objetos
+    (una categórica no distingue None de NaN).
+    """
+    if raw_frame is None or raw_frame.empty:
+        return pd.DataFrame(columns=COLUMNAS_ESTANDAR)
+    raw_frame = raw_frame.reset_index(drop=True)
+
+    # 1. Extracción y Validación Inicial
+    fechas = _clean_dates_series(_column(raw_frame, 'FECHA_MOVIMIENTO', None))
+    cantidades = _clean_kilos_series(_column(raw_frame, 'CANTIDAD_MOVIMIENTO', None))
+
+    # Filtrado de filas inválidas (sin fecha o cantidad cero)
+    valid = (fechas.notna() & (cantidades != 0.0)).to_numpy()
+    frame = raw_frame[valid]
+    if frame.empty:
+        return pd.DataFrame(columns=COLUMNAS_ESTANDAR)
+
+    # 2. Obtención de datos brutos (reglas y clientes vigentes, los mismos para todo el bloque)
+    rules = current_rules()
+    client_resolver = current_client_resolver()
+    tipo_mov_bruto = _column(frame, 'TIPO_MOVIMIENTO', '')
+    subtipo_mov_bruto = _column(frame, 'SUBTIPO_MOVIMIENTO', '')
+    client_name_bruto = _column(frame, 'CLIENTE', '')
+
+    # 3. Clasificación VTA
+    vta_code_limpio = map_distinct(tipo_mov_bruto, _vta_code_of)
+    clasificacion_final_vta = map_distinct(vta_code_limpio, lambda code: rules.vta_category_by_code.get(code, "OTRO"))
+
+    # 4. Clasificación Subtipo
+    subtipo_code_limpio = map_distinct(subtipo_mov_bruto, _clean_and_get_subtipo_code)
+    clasificacion_final_subtipo = map_distinct(
+        subtipo_code_limpio, lambda code: rules.subtipo_category_by_code.get(code, "OTRO")
+    )
+
+    # 5. Mapeo de Cliente (NIT/Estandarización): una búsqueda por nombre distinto
+    cliente_estandar = map_distinct(client_name_bruto, lambda name: client_resolver.resolve(name)[0])
+    nit = map_distinct(client_name_bruto, lambda name: client_resolver.resolve(name)[1])
+
+    # 6. Estandarización al formato final (orden y columnas de COLUMNAS_ESTANDAR)
+    result = pd.DataFrame({
+        'FECHA_MOVIMIENTO': fechas[valid],
+        'CLIENTE': client_name_bruto,
+        'CLIENTE_ESTANDAR': cliente_estandar,
+        'NIT': nit,
+        'TIPO_MOVIMIENTO': tipo_mov_bruto,
+        'TIPO_MOVIMIENTO_LIMPIO': vta_code_limpio,
+        'CLASIFICACION_VTA': clasificacion_final_vta,
+        'SUBTIPO_MOVIMIENTO': subtipo_mov_bruto,
+        'SUBTIPO_MOVIMIENTO_LIMPIO': subtipo_code_limpio,
+        'CLASIFICACION_SUBTIPO': clasificacion_final_subtipo,
+        'CANTIDAD_MOVIMIENTO': cantidades[valid],
+        'TARIFA': _column(frame, 'TARIFA', None),
+        'TOTAL': _column(frame, 'TOTAL', None),
+        'OBSERVACIONES': _column(frame, 'OBSERVACIONES', ''),
+        'ORIGEN_SECCION': _column(frame, 'ORIGEN_SECCION', ''),
+        'ORIGEN_HOJA': _column(frame, 'ORIGEN_HOJA', ''),
+        'FUENTE_ARCHIVO': _column(frame, 'FUENTE_ARCHIVO', '')
+    }, index=frame.index, columns=COLUMNAS_ESTANDAR).reset_index(drop=True)
+    return compact_frame(result) if compact else result
+
+# ==============================================================================
+# 7. FUNCIÓN PRINCIPAL DE TRANSFORMACIÓN
+# ==============================================================================
+
+# Valor de las claves ausentes de una fila en clean_and_standardize (como row.get(col, defecto))
+_RAW_DEFAULTS = {
+    'FECHA_MOVIMIENTO': None, 'CANTIDAD_MOVIMIENTO': None, 'TIPO_MOVIMIENTO': '', 'SUBTIPO_MOVIMIENTO': '',
+    'CLIENTE': '', 'TARIFA': None, 'TOTAL': None, 'OBSERVACIONES': '', 'ORIGEN_SECCION': '',
+    'ORIGEN_HOJA': '', 'FUENTE_ARCHIVO': '',
+}
+
 def clean_and_standardize(raw_data_list):
     """
     Función principal que aplica todas las transformaciones, limpiezas, 
     clasificaciones y mapeos al conjunto de datos crudos.
+    Envoltorio de lista de diccionarios sobre clean_and_standardize_frame.
     """
-    transformed_data = []
-    
-    for row in raw_data_list:
-        
-        # 1. Extracción y Validación Inicial
-        fecha_limpia = _clean_date(row.get('FECHA_MOVIMIENTO'))
-        cantidad_limpia = _clean_kilos(row.get('CANTIDAD_MOVIMIENTO')) 
-        
-        # Filtrado de filas inválidas (sin fecha o cantidad cero)
-        if fecha_limpia is None or cantidad_limpia == 0.0:
-            continue
-            
-        # 2. Obtención de datos brutos
-        tipo_mov_bruto = row.get('TIPO_MOVIMIENTO', '')
-        subtipo_mov_bruto = row.get('SUBTIPO_MOVIMIENTO', '') 
-        client_name_bruto = row.get('CLIENTE', '')
-
-        # 3. Clasificación VTA
-        vta_code_limpio = _clean_and_get_vta_code(tipo_mov_bruto)
-        clasificacion_final_vta = _classify_vta(vta_code_limpio)
-        
-        # 4. Clasificación Subtipo
-        subtipo_code_limpio = _clean_and_get_subtipo_code(subtipo_mov_bruto)
-        clasificacion_final_subtipo = _classify_subtipo(subtipo_code_limpio)
-        
-        # 5. Mapeo de Cliente (NIT/Estandarización)
-        cliente_estandar, nit = _get_standardized_client_info(client_name_bruto)
-
-        # 6. Estandarización al formato final (Diccionario temporal)
-        final_row = {
-            'FECHA_MOVIMIENTO': fecha_limpia,
-            'CLIENTE': client_name_bruto, 
-            'CLIENTE_ESTANDAR': cliente_estandar, 
-            'NIT': nit, 
-            'TIPO_MOVIMIENTO': tipo_mov_bruto, 
-            'TIPO_MOVIMIENTO_LIMPIO': vta_code_limpio, 
-            'CLASIFICACION_VTA': clasificacion_final_vta, 
-            'SUBTIPO_MOVIMIENTO': subtipo_mov_bruto, 
-            'SUBTIPO_MOVIMIENTO_LIMPIO': subtipo_code_limpio, 
-            'CLASIFICACION_SUBTIPO': clasificacion_final_subtipo, 
-            'CANTIDAD_MOVIMIENTO': cantidad_limpia,
-            
-            # ✅ CORRECCIÓN CRÍTICA: Añadir las nuevas columnas de Tarifa, Total y Observaciones
-            'TARIFA': row.get('TARIFA', None), 
-            'TOTAL': row.get('TOTAL', None),
-            'OBSERVACIONES': row.get('OBSERVACIONES', ''),
-
-            'ORIGEN_SECCION': row.get('ORIGEN_SECCION', ''),
-            'ORIGEN_HOJA': row.get('ORIGEN_HOJA', ''), 
-            'FUENTE_ARCHIVO': row.get('FUENTE_ARCHIVO', '')
-        }
-        
-        # 7. Filtrado de columnas: Aseguramos que el orden y las columnas coincidan con COLUMNAS_ESTANDAR
-        transformed_row = {k: final_row.get(k, None) for k in COLUMNAS_ESTANDAR} 
-        transformed_data.append(transformed_row)
-        
-    return transformed_data
\ No newline at end of file
+    if not raw_data_list:
+        return []
+    raw_frame = pd.DataFrame(raw_data_list, dtype=object)
+    # pandas llena con NaN las claves que faltan en una fila: se les da su valor por defecto
+    for col, default in _RAW_DEFAULTS.items():
+        if col in raw_frame.columns:
+            missing = np.array([col not in row for row in raw_data_list])
+            if missing.any():
+                values = raw_frame[col].tolist()
+                raw_frame[col] = pd.Series(
+                    [default if absent else value for absent, value in zip(missing, values)], dtype=object
+                )
+    return clean_and_standardize_frame(raw_frame, compact=False).to_dict('records')
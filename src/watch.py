@@ -0,0 +1,104 @@
+# src/watch.py
+# Vigilancia de la carpeta fuente para el modo servicio (run_etl.py --watch).
+#
+# El estado de la carpeta es una foto {nombre: (tamaño, mtime)} de los libros fuente.
+# Un cambio se procesa cuando la foto deja de cambiar durante `debounce` segundos, así
+# un libro que todavía se está copiando o guardando no se lee a medias.
+# Con watchdog instalado (inotify en Linux, ReadDirectoryChangesW en Windows) los
+# eventos del sistema de archivos despiertan al vigilante al instante; sin watchdog,
+# o si no se puede vigilar la carpeta, se consulta cada `interval` segundos.
+
+import os
+import threading
+import time
+
+# Segundos entre consultas de la carpeta (sin eventos del sistema de archivos)
+WATCH_INTERVAL = 1.0
+
+# Segundos sin cambios en la carpeta antes de procesar (archivos a medio escribir)
+WATCH_DEBOUNCE = 2.0
+
+def _start_event_observer(source_dir, wake):
+    """
+    Observador de watchdog que activa `wake` ante cualquier evento de la carpeta.
+    Retorna el observador o None si watchdog no está instalado o no puede vigilar la carpeta.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class _WakeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            wake.set()
+
+    observer = Observer()
+    try:
+        observer.schedule(_WakeHandler(), source_dir, recursive=False)
+        observer.start()
+    except Exception as e:
+        print(f"  -> ⚠️ No se pudo vigilar {source_dir} por eventos ({e}); se consulta periódicamente.")
+        return None
+    return observer
+
+class FolderWatcher:
+    """
+    Detecta cambios estables en los libros de `source_dir`. `list_files(source_dir)`
+    retorna las rutas de los libros a considerar (las mismas que procesa el ETL).
+    """
+
+    def __init__(self, source_dir, list_files, interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE):
+        self.source_dir = source_dir
+        self.list_files = list_files
+        self.interval = interval
+        self.debounce = debounce
+        self._wake = threading.Event()
+        self._observer = _start_event_observer(source_dir, self._wake)
+
+    @property
+    def mode(self):
+        return 'eventos' if self._observer is not None else 'consulta periódica'
+
+    def snapshot(self):
+        """Foto {nombre: (tamaño, mtime_ns)} de los libros de la carpeta."""
+        state = {}
+        for file_path in self.list_files(self.source_dir):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                # Borrado entre el listado y el stat
+                continue
+            state[os.path.basename(file_path)] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def wait_for_change(self, processed, stop=None):
+        """
+        Espera hasta que la carpeta difiera de la foto `processed` y lleve `debounce`
+        segundos sin cambios. Retorna la nueva foto, o None si se activó `stop`.
+        """
+        current = self.snapshot()
+        changed_at = time.monotonic()
+        while stop is None or not stop.is_set():
+            if current != processed and time.monotonic() - changed_at >= self.debounce:
+                return current
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            state = self.snapshot()
+            if state != current:
+                current, changed_at = state, time.monotonic()
+        return None
+
+    @staticmethod
+    def describe_changes(before, after):
+        """Resumen (nuevos, modificados, eliminados) entre dos fotos."""
+        added = [name for name in after if name not in before]
+        modified = [name for name in after if name in before and after[name] != before[name]]
+        deleted = [name for name in before if name not in after]
+        return added, modified, deleted
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
@@ -0,0 +1,69 @@
+# tests/test_clients.py
+# Resolución de clientes: nombre exacto, clave normalizada y búsqueda aproximada
+# con umbral y margen (src/clients.py).
+
+from src.clients import (
+    ClientResolver, normalize_client_name,
+    METODO_EXACTO, METODO_NORMALIZADO, METODO_APROXIMADO, METODO_NO_ENCONTRADO,
+)
+
+MAPPING = {
+    'C.I. AGROFRUT S.A.S.': {'estandar': 'AGROFRUT', 'nit': '900100'},
+    'DISTRIBUIDORA ANDINA SAS': {'estandar': 'ANDINA', 'nit': '900200'},
+    'COMERCIAL DEL NORTE LTDA': {'estandar': 'NORTE', 'nit': '900300'},
+    'COMERCIAL DEL NORTE 2 LTDA': {'estandar': 'NORTE 2', 'nit': '900400'},
+}
+
+def test_normalize_client_name_ignora_puntuacion_tildes_y_sufijos():
+    assert normalize_client_name("C.I. AGROFRUT S.A.S.") == "CI AGROFRUT"
+    assert normalize_client_name("c.i. Agrofrut SAS") == "CI AGROFRUT"
+    assert normalize_client_name("Lácteos Andinos Ltda.") == "LACTEOS ANDINOS"
+    # Un nombre que solo tiene sufijos se conserva
+    assert normalize_client_name("S.A.S.") == "SAS"
+
+def test_match_exacto_y_normalizado():
+    resolver = ClientResolver(MAPPING)
+    assert resolver.match('C.I. AGROFRUT S.A.S.')[1:] == (METODO_EXACTO, 1.0)
+    entry, method, _ = resolver.match('c.i. agrofrut sas')
+    assert (entry['estandar'], method) == ('AGROFRUT', METODO_NORMALIZADO)
+
+def test_match_aproximado_sobre_el_umbral():
+    resolver = ClientResolver(MAPPING)
+    entry, method, score = resolver.match('DISTRIBUIDORA ANDNA')
+    assert method == METODO_APROXIMADO
+    assert entry['estandar'] == 'ANDINA'
+    assert score >= resolver.threshold
+
+def test_match_aproximado_bajo_el_umbral_no_se_asocia():
+    resolver = ClientResolver(MAPPING)
+    entry, method, score = resolver.match('DISTRIB ANDINA')
+    assert entry is None and method == METODO_NO_ENCONTRADO
+    assert 0 < score < resolver.threshold
+
+def test_margen_evita_asociar_nombres_ambiguos():
+    # "COMERCIAL DEL NORT" se parece casi igual a NORTE y a NORTE 2
+    entry, method, score = ClientResolver(MAPPING).match('COMERCIAL DEL NORT')
+    assert entry is None and method == METODO_NO_ENCONTRADO
+    assert score >= ClientResolver(MAPPING).threshold
+
+    # Sin margen gana el mejor candidato
+    entry, method, _ = ClientResolver(MAPPING, margin=0.0).match('COMERCIAL DEL NORT')
+    assert (entry['estandar'], method) == ('NORTE', METODO_APROXIMADO)
+
+def test_clave_normalizada_ambigua_no_se_usa():
+    mapping = {
+        'ACME S.A.': {'estandar': 'ACME', 'nit': '1'},
+        'ACME LTDA': {'estandar': 'ACME DOS', 'nit': '2'},
+    }
+    resolver = ClientResolver(mapping)
+    assert resolver.match('ACME SAS')[0] is None
+
+def test_resolve_memoriza_y_cuenta_metodos(capsys):
+    resolver = ClientResolver(MAPPING)
+    assert resolver.resolve('') == ("SIN CLIENTE", "SIN NIT")
+    assert resolver.resolve('  Desconocido  ') == ("DESCONOCIDO", "NO ENCONTRADO")
+    assert resolver.resolve('DISTRIBUIDORA ANDNA') == ('ANDINA', '900200')
+    assert resolver.resolve('DISTRIBUIDORA ANDNA') == ('ANDINA', '900200')
+    assert resolver.stats[METODO_APROXIMADO] == 1
+    # La asociación aproximada se informa una sola vez
+    assert capsys.readouterr().out.count("asociado por similitud") == 1
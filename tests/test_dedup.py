@@ -0,0 +1,104 @@
+# tests/test_dedup.py
+# Índice de claves con volcado a SQLite y detección de duplicados entre archivos
+# (src/dedup.py).
+
+import os
+import numpy as np
+import pandas as pd
+
+from src.config import COLUMNAS_ESTANDAR
+from src.dedup import CRITERIO_ORIGINAL, DuplicateDetector, _KeyIndex, load_order
+
+def _hashes(*values):
+    return np.array(values, dtype=np.int64)
+
+def test_key_index_en_memoria():
+    index = _KeyIndex(max_memory_keys=10)
+    assert index.lookup(_hashes(1, 2)).tolist() == [-1, -1]
+    index.add(_hashes(1, 2), _hashes(0, 3))
+    assert index.lookup(_hashes(2, 1, 9)).tolist() == [3, 0, -1]
+    assert index.spilled == 0
+    index.close()
+
+def test_key_index_vuelca_a_disco_y_sigue_encontrando_las_claves():
+    index = _KeyIndex(max_memory_keys=2)
+    index.add(_hashes(1, 2, 3), _hashes(0, 0, 1))
+    assert index.spilled == 3
+    path = index._path
+    assert os.path.exists(path)
+
+    # Claves en disco y en memoria en la misma consulta
+    index.add(_hashes(-4), _hashes(2))
+    assert index.lookup(_hashes(3, -4, 5, 1)).tolist() == [1, 2, -1, 0]
+    # La tabla de consulta se vacía entre consultas
+    assert index.lookup(_hashes(5)).tolist() == [-1]
+
+    # Un segundo volcado conserva el archivo del primero
+    index.add(_hashes(5, 6), _hashes(3, 3))
+    assert index.spilled == 6
+    assert index.lookup(_hashes(1, 5, 6, 7)).tolist() == [0, 3, 3, -1]
+
+    index.close()
+    assert not os.path.exists(path)
+
+def _frame(file_name, rows):
+    records = []
+    for i, (nit, total) in enumerate(rows):
+        record = {col: '' for col in COLUMNAS_ESTANDAR}
+        record.update({
+            'FECHA_MOVIMIENTO': '2024-03-01', 'NIT': nit, 'CLIENTE_ESTANDAR': f'CLIENTE {nit}',
+            'TIPO_MOVIMIENTO_LIMPIO': 'VTA019', 'CANTIDAD_MOVIMIENTO': 1, 'TARIFA': 10, 'TOTAL': total,
+            'FUENTE_ARCHIVO': file_name, 'ORIGEN_HOJA': 'Hoja1', 'ORIGEN_SECCION': 'VTA019',
+        })
+        records.append(record)
+    return pd.DataFrame(records, columns=COLUMNAS_ESTANDAR)
+
+def test_detector_quita_las_filas_repetidas_de_otro_archivo():
+    detector = DuplicateDetector(policy='drop', max_memory_keys=1)
+    first = _frame('a.xlsx', [('1', 10), ('2', 20), ('2', 20)])
+    # Un texto numérico equivalente es la misma clave
+    second = _frame('b.xlsx', [('2', '20.0'), ('3', 30)])
+    kept = list(detector.iter_filtered([first, second]))
+
+    # Las repeticiones dentro de un mismo archivo se conservan
+    assert len(kept[0]) == 3
+    assert kept[1]['NIT'].tolist() == ['3']
+    assert (detector.rows, detector.duplicate_rows) == (5, 1)
+    assert [f['TIPO'] for f in detector.findings] == ['filas']
+    assert detector.findings[0]['DUPLICA_A'] == 'a.xlsx'
+    assert detector.duplicate_files() == {}
+    detector.close()
+
+def test_detector_reconoce_secciones_y_archivos_copiados():
+    detector = DuplicateDetector(policy='flag')
+    first = _frame('a.xlsx', [('1', 10), ('2', 20), ('3', 30)])
+    # La misma sección en otro archivo y en otro orden
+    second = _frame('b.xlsx', [('3', 30), ('1', 10), ('2', 20)])
+    flagged = list(detector.iter_filtered([first, second]))[1]
+
+    assert flagged['OBSERVACIONES'].tolist() == ['[DUPLICADO de a.xlsx]'] * 3
+    finding = detector.findings[0]
+    assert (finding['TIPO'], finding['DUPLICA_A']) == ('seccion completa', 'a.xlsx / Hoja1 / VTA019')
+    assert detector.duplicate_files() == {'b.xlsx': 'a.xlsx'}
+    detector.close()
+
+def test_orden_de_carga_por_fecha_de_modificacion(tmp_path):
+    # La copia tiene un nombre que va antes en orden alfabético, pero es más reciente
+    paths = {}
+    for name, mtime in [('Reporte.xlsx', 1000), ('Reporte Copia_001.xlsx', 2000), ('B.xlsx', 1000), ('A.xlsx', 3000)]:
+        paths[name] = str(tmp_path / name)
+        open(paths[name], 'wb').close()
+        os.utime(paths[name], ns=(mtime, mtime))
+    ordered = load_order(list(paths.values()) + [str(tmp_path / 'borrado.xlsx')])
+    assert [os.path.basename(p) for p in ordered] == ['B.xlsx', 'Reporte.xlsx', 'Reporte Copia_001.xlsx', 'A.xlsx']
+
+def test_reporte_anota_el_criterio_del_original(tmp_path):
+    detector = DuplicateDetector(policy='report')
+    rows = [('1', 10), ('2', 20)]
+    list(detector.iter_filtered([_frame('Reporte.xlsx', rows), _frame('Reporte Copia_001.xlsx', rows)]))
+    report = pd.read_csv(detector.write_report(str(tmp_path / 'duplicados.csv')), dtype=str)
+
+    assert report['ARCHIVO'].tolist() == ['Reporte Copia_001.xlsx'] * 2
+    assert report['DUPLICA_A'].tolist() == ['Reporte.xlsx', 'Reporte.xlsx / Hoja1 / VTA019']
+    assert report['CRITERIO'].tolist() == [CRITERIO_ORIGINAL] * 2
+    detector.close()
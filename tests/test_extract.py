@@ -0,0 +1,266 @@
+# tests/test_extract.py
+# Extracción de secciones VTA (src/extract.py).
+
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.extract import (
+    _extract_data_from_section, _extract_section_frame, _find_header_indices, _find_vta_anchors,
+    extract_data_from_excel, extract_frame_from_excel,
+)
+from src.rules import current_rules, ROL_FECHA
+
+@pytest.fixture
+def damaged_workbook(tmp_path):
+    path = tmp_path / 'DANADO.xlsx'
+    path.write_bytes(b'PK\x03\x04no es un libro')
+    return str(path)
+
+def test_libro_danado_lanza_en_la_api_de_frames(damaged_workbook):
+    # run_etl.py necesita la excepción para informar el archivo y no guardarlo en la caché
+    with pytest.raises(Exception):
+        extract_frame_from_excel(damaged_workbook)
+
+def test_libro_danado_retorna_lista_vacia_en_la_api_de_listas(damaged_workbook, capsys):
+    assert extract_data_from_excel(damaged_workbook) == []
+    assert "Error en DANADO.xlsx" in capsys.readouterr().out
+
+def _section_sheet(rows):
+    header = ['Fecha', 'Cargue', 'Descargue', 'Tarifa', 'Total']
+    return pd.DataFrame([['(VTA019) SERVICIO', np.nan, np.nan, np.nan, np.nan], header] + rows, dtype=object)
+
+def test_convencion_decimal_por_columna_de_origen():
+    # Cargue y la tarifa usan coma decimal; Descargue y el total no tienen evidencia propia
+    sheet = _section_sheet([
+        ['01/03/2024', '1.234,5', '$ 4,668', '1.500,25', '$ 4,668'],
+        ['02/03/2024', '12,5', '7', '2,5', 'N/A'],
+    ])
+    frame = _extract_section_frame(sheet, '(VTA019) SERVICIO', (0, len(sheet)), 'Hoja1', 'A.xlsx', 'CLIENTE')
+
+    assert frame['SUBTIPO_MOVIMIENTO'].tolist() == ['CARGUE', 'DESCARGUE', 'CARGUE', 'DESCARGUE']
+    assert frame['CANTIDAD_MOVIMIENTO'].tolist() == [1234.5, 4668.0, 12.5, 7.0]
+    # La tarifa y el total de una fila se repiten en cada métrica; los textos no numéricos se conservan
+    assert frame['TARIFA'].tolist() == [1500.25, 1500.25, 2.5, 2.5]
+    assert frame['TOTAL'].tolist() == [4668.0, 4668.0, 'N/A', 'N/A']
+
+# ==============================================================================
+# EQUIVALENCIA CON EL RECORRIDO POR FILAS ORIGINAL: ANCLAS VTA
+# ==============================================================================
+
+def _reference_vta_anchors(sheet):
+    # Recorrido original de extract_data_from_excel: una búsqueda por fila, primera celda que coincide
+    vta_pattern = re.compile(r'\(VTA\d{3}\)', re.IGNORECASE)
+    anchors = []
+    for row_idx in range(len(sheet)):
+        row = sheet.iloc[row_idx]
+        match = row.apply(lambda x: vta_pattern.search(str(x).upper())).dropna()
+        if not match.empty:
+            anchors.append((row_idx, match.index[0], str(row.loc[match.index[0]])))
+    return anchors
+
+@pytest.mark.parametrize('rows', [
+    [],
+    [[np.nan, np.nan], [None, np.nan]],
+    [['(VTA019) SERVICIO', np.nan, np.nan], ['Fecha', 'Cargue', 'Total'], ['01/03/2024', 5, 10.5]],
+    # Minúsculas, ancla fuera de la primera columna y dos coincidencias en la misma fila
+    [[np.nan, 'servicio (vta010)', '(VTA012) SALIDA'], [1, 2.5, None], [np.nan, np.nan, 'Ingreso (Vta037)']],
+    # Celdas no texto y textos parecidos que no coinciden
+    [[datetime(2024, 3, 1), 19, True], ['(VTA19)', 'VTA019', '( VTA019 )'], ['x', '(VTA0190)', np.nan]],
+])
+def test_anclas_vta_equivalentes_al_recorrido_por_filas(rows):
+    sheet = pd.DataFrame(rows, dtype=object)
+    assert _find_vta_anchors(sheet) == _reference_vta_anchors(sheet)
+
+# ==============================================================================
+# EQUIVALENCIA CON EL RECORRIDO ORIGINAL: CABECERAS DE SECCIÓN
+# ==============================================================================
+
+def _reference_normalize(header):
+    if pd.isna(header):
+        return ""
+    s = str(header).strip().upper()
+    s = re.sub(r'[^\w\s]', '', s)
+    return s.replace(' ', '')
+
+def _reference_header_indices(sheet, section_row_start, max_rows=10):
+    # Recorrido original: una pasada por la fila para cada cabecera de los mapas de las reglas
+    rules = current_rules()
+
+    def first_match(header_row, original_header):
+        return header_row[header_row.apply(lambda x: _reference_normalize(x) == _reference_normalize(original_header))].index
+
+    header_row_index = -1
+    for i in range(section_row_start, section_row_start + max_rows):
+        if i >= len(sheet): break
+        if not first_match(sheet.iloc[i], rules.date_header).empty:
+            header_row_index = i
+            break
+    if header_row_index == -1:
+        return {}, section_row_start
+
+    header_row = sheet.iloc[header_row_index]
+    header_indices = {ROL_FECHA: first_match(header_row, rules.date_header)[0]}
+    quantity_indices = {}
+    for original_header, normalized_name in rules.quantity_headers.items():
+        q_idx = first_match(header_row, original_header)
+        if not q_idx.empty:
+            quantity_indices[normalized_name] = q_idx[0]
+    header_indices['QUANTITIES'] = quantity_indices
+    for h_map, brutos in [("TARIFA", rules.rate_headers), ("TOTAL", rules.total_headers)]:
+        for original_header in brutos:
+            idx = first_match(header_row, original_header)
+            if not idx.empty:
+                header_indices[h_map] = idx[0]
+                break
+    obs_map = {}
+    for obs_header in rules.observation_headers:
+        idx = first_match(header_row, obs_header)
+        if not idx.empty:
+            obs_map[obs_header] = idx[0]
+    header_indices['OBSERVACIONES_MAP'] = obs_map
+    return header_indices, header_row_index + 1
+
+def _assert_same_headers(sheet, start, max_rows):
+    got, got_start = _find_header_indices(sheet, start, max_rows)
+    want, want_start = _reference_header_indices(sheet, start, max_rows)
+    assert got_start == want_start
+    assert got == want
+    # El orden de las métricas decide el orden de las filas largas de la sección
+    assert list(got.get('QUANTITIES', {}).items()) == list(want.get('QUANTITIES', {}).items())
+    assert list(got.get('OBSERVACIONES_MAP', {}).items()) == list(want.get('OBSERVACIONES_MAP', {}).items())
+
+@pytest.mark.parametrize('header', [
+    ['Fecha', 'Cargue', 'Descargue', 'Tarifa', 'Total'],
+    # Orden de columnas distinto al de las reglas, puntuación, espacios y mayúsculas
+    ['Total General', 'Nota', ' kg  descargue.', 'FECHA', 'Tarifa c/u', 'Kg Cargue', 'Proveedor'],
+    # Dos cabeceras con el mismo nombre estándar: gana la posición de la primera declarada y la columna de la última
+    ['Fecha', 'Saldo inventario', 'Posiciones Ocupadas', 'Canastas', 'Cantidad', 'Subtotal', 'Total'],
+    # Cabecera repetida en la fila (gana la primera columna) y varias tarifas (gana la primera declarada)
+    ['Fecha', 'Horas', 'Horas', 'Tarifa unitaria', 'Tarifas', 'Remision', 'Nota', 'Fecha'],
+    # Celdas vacías y no texto
+    [np.nan, 'Fecha', None, 12, 'Entradas', datetime(2024, 3, 1), 'Salidas'],
+    # Sin columnas de cantidad
+    ['Fecha', 'Tarifa', 'Otra'],
+])
+def test_cabeceras_equivalentes_al_recorrido_original(header):
+    sheet = pd.DataFrame([['(VTA019) SERVICIO'] + [np.nan] * (len(header) - 1), header, ['01/03/2024'] * len(header)], dtype=object)
+    _assert_same_headers(sheet, 0, len(sheet))
+
+@pytest.mark.parametrize('start, max_rows', [(0, 10), (0, 2), (1, 1), (2, 10), (5, 10)])
+def test_cabeceras_fuera_del_rango_de_busqueda(start, max_rows):
+    sheet = pd.DataFrame([
+        ['(VTA019) SERVICIO', np.nan], ['sin cabecera', np.nan], ['Fecha', 'Cargue'], ['01/03/2024', 5],
+    ], dtype=object)
+    _assert_same_headers(sheet, start, max_rows)
+
+# ==============================================================================
+# EQUIVALENCIA CON EL RECORRIDO ORIGINAL: EXTRACCIÓN DE UNA SECCIÓN
+# ==============================================================================
+
+def _reference_section_rows(sheet, section_title, section_range, sheet_name, file_name, client_name):
+    # Recorrido original por filas y por métrica; las celdas salen sin interpretar
+    start_row, end_row = section_range
+    header_info, data_row_start = _reference_header_indices(sheet, start_row, end_row - start_row)
+    if ROL_FECHA not in header_info or not header_info.get('QUANTITIES'):
+        return []
+    fecha_idx = header_info[ROL_FECHA]
+    tarifa_idx, total_idx = header_info.get('TARIFA'), header_info.get('TOTAL')
+    extracted_data = []
+    for i in range(data_row_start, end_row):
+        row = sheet.iloc[i]
+        fecha_val = row.iloc[fecha_idx]
+        if pd.isna(fecha_val):
+            continue
+        for q_name, q_idx in header_info['QUANTITIES'].items():
+            val = row.iloc[q_idx]
+            try:
+                num_val = float(str(val).replace('$', '').replace('.', '').replace(',', '').strip()) if pd.notna(val) else 0
+            except (ValueError, TypeError):
+                continue
+            if num_val == 0:
+                continue
+            observations = [f"{name}: {row.iloc[idx]}" for name, idx in header_info['OBSERVACIONES_MAP'].items() if pd.notna(row.iloc[idx])]
+            extracted_data.append({
+                'FECHA_MOVIMIENTO': fecha_val, 'CLIENTE': client_name,
+                'TIPO_MOVIMIENTO': section_title, 'ORIGEN_SECCION': section_title,
+                'ORIGEN_HOJA': sheet_name, 'FUENTE_ARCHIVO': file_name,
+                'SUBTIPO_MOVIMIENTO': q_name, 'CANTIDAD_MOVIMIENTO': val,
+                'TARIFA': row.iloc[tarifa_idx] if tarifa_idx is not None else None,
+                'TOTAL': row.iloc[total_idx] if total_idx is not None else None,
+                'OBSERVACIONES': ' | '.join(observations),
+            })
+    return extracted_data
+
+def _reference_date(value):
+    # La fecha se interpretaba en transform.py; los textos que no son fecha se conservan
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str):
+        for fmt in ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d %b'):
+            try:
+                return datetime.strptime(value.strip(), fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+    return value
+
+def _reference_number(value):
+    # Cantidad, tarifa y total con la lectura de punto decimal; los textos que no son número se conservan
+    if isinstance(value, (int, float)) and not pd.isna(value):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(',', '').replace('$', '').strip())
+        except ValueError:
+            return value
+    return value
+
+def _assert_same_section(rows, header=('Fecha', 'Cargue', 'Descargue', 'Tarifa', 'Total', 'Nota', 'Proveedor')):
+    sheet = pd.DataFrame([['(VTA019) SERVICIO'] + [np.nan] * (len(header) - 1), list(header)] + rows, dtype=object)
+    args = (sheet, '(VTA019) SERVICIO', (0, len(sheet)), 'Hoja1', 'A.xlsx', 'CLIENTE')
+    expected = _reference_section_rows(*args)
+    result = _extract_data_from_section(*args)
+    assert len(result) == len(expected)
+    for got, want in zip(result, expected):
+        assert list(got) == list(want)
+        want = dict(want, FECHA_MOVIMIENTO=_reference_date(want['FECHA_MOVIMIENTO']),
+                    CANTIDAD_MOVIMIENTO=_reference_number(want['CANTIDAD_MOVIMIENTO']),
+                    TARIFA=_reference_number(want['TARIFA']), TOTAL=_reference_number(want['TOTAL']))
+        diff = {col: (got[col], want[col]) for col in want
+                if not (got[col] == want[col] or (pd.isna(got[col]) and pd.isna(want[col])))}
+        assert not diff
+
+def test_seccion_equivalente_al_recorrido_por_filas():
+    _assert_same_section([
+        ['01/03/2024', 10, 5.5, 1500, '$ 16,500.25', 'sin novedad', np.nan],
+        ['02/03/2024', '$ 1,234.5', 0, 2.5, np.nan, np.nan, 'PROV S.A.'],
+        [datetime(2024, 3, 3), ' 7 ', '-2', 'pendiente', 'N/A', 12, 'x'],
+        ['04/03/2024', -3, np.nan, np.nan, np.nan, np.nan, np.nan],
+    ])
+
+def test_seccion_con_fechas_vacias_o_invalidas():
+    _assert_same_section([
+        [np.nan, 10, 5, 1, 1, np.nan, np.nan],
+        [None, 10, 5, 1, 1, np.nan, np.nan],
+        ['no es fecha', 3, np.nan, 1, 1, np.nan, np.nan],
+        ['05/03/2024', 4, 6, 1, 1, np.nan, np.nan],
+    ])
+
+@pytest.mark.parametrize('cantidad', [0, 0.0, '0', '', ' ', '$', 'abc', np.nan, None, True, False, 0.004, '0.5'])
+def test_seccion_con_cantidades_cero_invalidas_o_vacias(cantidad):
+    _assert_same_section([
+        ['01/03/2024', cantidad, cantidad, 1, 1, np.nan, np.nan],
+        ['02/03/2024', 8, cantidad, 1, 1, np.nan, np.nan],
+    ])
+
+def test_seccion_sin_filas_de_datos_o_sin_cabecera():
+    _assert_same_section([])
+    _assert_same_section([[np.nan] * 7, [np.nan] * 7])
+    _assert_same_section([['01/03/2024', 0, 0, 1, 1, np.nan, np.nan]])
+    _assert_same_section([['01/03/2024', 5, 5, 1, 1]], header=('Tarifa', 'Cargue', 'Descargue', 'Fecha2', 'Total'))
+    _assert_same_section([['01/03/2024', 5, 1]], header=('Fecha', 'Otra', 'Tarifa'))
+    # Sin tarifa ni total
+    _assert_same_section([['01/03/2024', 5, 2]], header=('Fecha', 'Horas', 'Cantidad'))
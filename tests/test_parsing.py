@@ -0,0 +1,55 @@
+# tests/test_parsing.py
+# Convención decimal por columna e interpretación de números (src/parsing.py).
+
+import math
+import pandas as pd
+import pytest
+
+from src.parsing import (
+    DECIMAL_COMA, DECIMAL_PUNTO, detect_decimal_separator, numbers_to_float, parse_number_text,
+)
+
+@pytest.mark.parametrize('values, expected', [
+    (['1.234,56', '12,5', '3'], DECIMAL_COMA),
+    (['1,234.56', '12.5', '3'], DECIMAL_PUNTO),
+    # Columna mezclada: se mantiene la interpretación histórica
+    (['1.234,56', '12.5'], DECIMAL_PUNTO),
+    # Sin evidencia: solo enteros y separadores de miles ambiguos
+    (['1,234', '1.234', '7', None, 3.5], DECIMAL_PUNTO),
+    ([], DECIMAL_PUNTO),
+])
+def test_detect_decimal_separator(values, expected):
+    assert detect_decimal_separator(pd.Series(values, dtype=object)) == expected
+
+@pytest.mark.parametrize('text, decimal, expected', [
+    ('$ 1,234.5', DECIMAL_PUNTO, 1234.5),
+    ('1.234,56', DECIMAL_PUNTO, 1234.56),
+    ('1,234,567', DECIMAL_COMA, 1234567.0),
+    ('1.234.567', DECIMAL_PUNTO, 1234567.0),
+    ('12,5', DECIMAL_PUNTO, 12.5),
+    # Textos ambiguos: decide la convención de la columna
+    ('1,234', DECIMAL_PUNTO, 1234.0),
+    ('1,234', DECIMAL_COMA, 1.234),
+    ('1.234', DECIMAL_PUNTO, 1.234),
+    ('1.234', DECIMAL_COMA, 1234.0),
+    (' 12 ', DECIMAL_PUNTO, 12.0),
+    ('abc', DECIMAL_PUNTO, None),
+    ('nan', DECIMAL_PUNTO, None),
+    ('inf', DECIMAL_PUNTO, None),
+])
+def test_parse_number_text(text, decimal, expected):
+    assert parse_number_text(text, decimal) == expected
+
+def test_numbers_to_float_detecta_la_convencion_de_la_columna():
+    values = pd.Series(['1.234,56', '1,234', '2.000', 'x', None, 5], index=[10, 11, 12, 13, 14, 15], dtype=object)
+    result = numbers_to_float(values)
+    assert list(result.index) == [10, 11, 12, 13, 14, 15]
+    assert result.dtype == float
+    assert result.tolist()[:3] == [1234.56, 1.234, 2000.0]
+    assert math.isnan(result[13]) and math.isnan(result[14])
+    assert result[15] == 5.0
+
+def test_numbers_to_float_con_convencion_explicita():
+    values = pd.Series(['1,234', '1.234'], dtype=object)
+    assert numbers_to_float(values, DECIMAL_PUNTO).tolist() == [1234.0, 1.234]
+    assert numbers_to_float(values, DECIMAL_COMA).tolist() == [1.234, 1234.0]
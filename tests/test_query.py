@@ -0,0 +1,101 @@
+# tests/test_query.py
+# Descarte de partes por mínimo y máximo y consultas sobre el conjunto de datos
+# de la salida 'consulta' (src/query.py).
+
+import os
+import pytest
+
+from src.config import COLUMNAS_ESTANDAR
+from src.query import SIN_FECHA, _may_match, _normalize_filters
+
+def _fragment(low_date, high_date, nit):
+    stats = {col: [None, None] for col in ('CLIENTE_ESTANDAR', 'TIPO_MOVIMIENTO_LIMPIO',
+                                          'CLASIFICACION_VTA', 'CLASIFICACION_SUBTIPO')}
+    stats.update({'FECHA_MOVIMIENTO': [low_date, high_date], 'NIT': [nit, nit]})
+    return {'stats': stats}
+
+def test_may_match_por_fechas():
+    fragment = _fragment('2024-03-01', '2024-03-31', '900')
+    assert _may_match(fragment, None, None, {})
+    assert _may_match(fragment, '2024-03-31', None, {})
+    assert _may_match(fragment, None, '2024-03-01', {})
+    assert not _may_match(fragment, '2024-04-01', None, {})
+    assert not _may_match(fragment, None, '2024-02-29', {})
+    # Una parte sin fechas válidas no cumple ningún filtro de fecha
+    assert not _may_match(_fragment(None, None, '900'), '2024-01-01', None, {})
+    assert _may_match(_fragment(None, None, '900'), None, None, {})
+
+def test_may_match_por_valores():
+    fragment = _fragment('2024-03-01', '2024-03-31', '900')
+    assert _may_match(fragment, None, None, {'NIT': ['800', '900']})
+    assert not _may_match(fragment, None, None, {'NIT': ['800']})
+    # Columna sin valores en la parte
+    assert not _may_match(fragment, None, None, {'CLASIFICACION_VTA': ['KILOS']})
+
+def test_normalize_filters():
+    assert _normalize_filters({'NIT': [' 900a '], 'CLASIFICACION_VTA': []}) == {'NIT': ['900A']}
+    with pytest.raises(ValueError):
+        _normalize_filters({'FECHA_MOVIMIENTO': ['2024-03-01']})
+    with pytest.raises(ValueError):
+        _normalize_filters({'TOTAL': ['1']})
+
+@pytest.fixture
+def dataset(tmp_path):
+    pytest.importorskip('pyarrow')
+    from src.load import arrow_schema, to_typed_frame
+    from src.query import QueryDataset, QueryDatasetWriter
+
+    rows = [
+        ('2024-03-05', '900', 'VTA019', 'Kilos', 10),
+        ('2024-03-20', '900', 'VTA020', 'Unidades', 20),
+        ('2024-03-07', '800', 'VTA019', 'Kilos', 30),
+        ('2024-04-02', '900', 'VTA019', 'Kilos', 40),
+        ('', '800', 'VTA019', 'Kilos', 50),
+    ]
+    records = []
+    for fecha, nit, tipo, clase, total in rows:
+        record = {col: '' for col in COLUMNAS_ESTANDAR}
+        record.update({'FECHA_MOVIMIENTO': fecha, 'NIT': nit, 'TIPO_MOVIMIENTO_LIMPIO': tipo,
+                       'CLASIFICACION_VTA': clase, 'TOTAL': total})
+        records.append(record)
+
+    writer = QueryDatasetWriter(str(tmp_path / 'consulta'), arrow_schema())
+    # Dos bloques, como dos archivos fuente: la partición (2024-03, 900) tiene dos partes
+    writer.write(to_typed_frame(records[:3]))
+    writer.write(to_typed_frame(records[3:] + records[:1]))
+    return QueryDataset(writer.close())
+
+def test_writer_particiona_por_mes_y_nit(dataset):
+    partitions = sorted((f['mes'], f['nit'], f['filas']) for f in dataset.fragments)
+    assert partitions == [
+        ('2024-03', '800', 1), ('2024-03', '900', 1), ('2024-03', '900', 2),
+        ('2024-04', '900', 1), (SIN_FECHA, '800', 1),
+    ]
+    assert all(os.path.exists(os.path.join(dataset.dataset_dir, *f['path'].split('/')))
+               for f in dataset.fragments)
+
+def test_prune_descarta_partes_por_mes_nit_y_clase(dataset):
+    def kept(*args, **kwargs):
+        return sorted((f['mes'], f['nit']) for f in dataset.prune(*args, **kwargs))
+
+    assert len(kept()) == 5
+    assert kept('2024-03-01', '2024-03-31') == [('2024-03', '800'), ('2024-03', '900'), ('2024-03', '900')]
+    assert kept('2024-04-01') == [('2024-04', '900')]
+    assert kept(filters={'NIT': ['800']}) == [('2024-03', '800'), (SIN_FECHA, '800')]
+    # El texto se compara sin distinguir mayúsculas; solo la parte con 'Unidades' lo admite
+    assert kept(filters={'CLASIFICACION_VTA': ['unidades']}) == [('2024-03', '900')]
+
+def test_query_coincide_con_el_filtro_en_pandas(dataset):
+    result, fragments = dataset.query('2024-03-01', '2024-03-31', {'TIPO_MOVIMIENTO_LIMPIO': ['vta019']},
+                                      columns=['FECHA_MOVIMIENTO', 'NIT', 'TOTAL'])
+    assert len(fragments) == 3
+    assert sorted(result.itertuples(index=False, name=None)) == [
+        ('2024-03-05', '900', 10.0), ('2024-03-05', '900', 10.0), ('2024-03-07', '800', 30.0),
+    ]
+
+    result, _ = dataset.query(filters={'NIT': ['800']}, columns=['FECHA_MOVIMIENTO', 'TOTAL'])
+    assert sorted(result['TOTAL'].tolist()) == [30.0, 50.0]
+    assert result['FECHA_MOVIMIENTO'].isna().sum() == 1
+
+    empty, fragments = dataset.query('2025-01-01', columns=['NIT'])
+    assert fragments == [] and list(empty.columns) == ['NIT'] and empty.empty
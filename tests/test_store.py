@@ -0,0 +1,54 @@
+# tests/test_store.py
+# Almacén incremental particionado por archivo fuente (src/store.py).
+
+import pandas as pd
+import pytest
+
+from src.config import COLUMNAS_ESTANDAR
+from src.store import ParquetStore, SqliteStore
+
+def _frame(file_name, rows):
+    records = []
+    for subtipo, tarifa, total in rows:
+        record = {col: '' for col in COLUMNAS_ESTANDAR}
+        record.update({
+            'FECHA_MOVIMIENTO': '2024-03-01', 'NIT': '900', 'SUBTIPO_MOVIMIENTO': subtipo,
+            'CANTIDAD_MOVIMIENTO': 2.0, 'TARIFA': tarifa, 'TOTAL': total,
+            'FUENTE_ARCHIVO': file_name, 'ORIGEN_HOJA': 'Hoja1', 'ORIGEN_SECCION': 'VTA019',
+        })
+        records.append(record)
+    return pd.DataFrame(records, columns=COLUMNAS_ESTANDAR)
+
+@pytest.fixture(params=['parquet', 'sqlite'])
+def data_store(request, tmp_path):
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+        data_store = ParquetStore(str(tmp_path))
+    else:
+        data_store = SqliteStore(str(tmp_path))
+    yield data_store
+    data_store.close()
+
+def test_conserva_el_texto_de_tarifas_y_totales_no_numericos(data_store):
+    data_store.replace('a.xlsx', 'sha-a', _frame('a.xlsx', [('CARGUE', 1500.5, 'N/A'), ('CARGUE', None, 3001.0)]))
+    frame = data_store.read('a.xlsx')
+    assert frame['TARIFA'].tolist()[0] == 1500.5 and pd.isna(frame['TARIFA'].tolist()[1])
+    assert frame['TOTAL'].tolist() == ['N/A', 3001.0]
+    assert frame['FECHA_MOVIMIENTO'].tolist() == ['2024-03-01', '2024-03-01']
+    assert list(frame.columns) == COLUMNAS_ESTANDAR
+
+def test_reemplaza_la_particion_completa_y_conserva_movimientos_repetidos(data_store):
+    # Dos filas con la misma CLAVE_MOVIMIENTO: la clave no es única y ambas se conservan
+    data_store.replace('a.xlsx', 'sha-a', _frame('a.xlsx', [('CARGUE', 1.0, 2.0), ('CARGUE', 1.0, 2.0)]))
+    data_store.replace('b.xlsx', 'sha-b', _frame('b.xlsx', [('DESCARGUE', 1.0, 2.0)]))
+    assert len(data_store.read('a.xlsx')) == 2
+
+    data_store.replace('a.xlsx', 'sha-a2', _frame('a.xlsx', [('DESCARGUE', 5.0, 10.0)]))
+    assert data_store.read('a.xlsx')['SUBTIPO_MOVIMIENTO'].tolist() == ['DESCARGUE']
+    assert len(data_store.read('b.xlsx')) == 1
+
+    entries = {'a.xlsx': {'sha256': 'sha-a2'}, 'c.xlsx': {'sha256': 'sha-c'}}
+    assert data_store.stale(entries) == ['c.xlsx']
+    assert data_store.obsolete(entries) == ['b.xlsx']
+    data_store.drop(['b.xlsx'])
+    assert data_store.read('b.xlsx') is None
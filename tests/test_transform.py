@@ -0,0 +1,159 @@
+# tests/test_transform.py
+# Equivalencia de clean_and_standardize (envoltorio de lista sobre la versión DataFrame)
+# con el recorrido fila por fila original.
+
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.config import COLUMNAS_ESTANDAR
+from src.transform import (
+    clean_and_standardize, clean_and_standardize_frame,
+    _clean_and_get_vta_code, _classify_vta, _clean_and_get_subtipo_code, _classify_subtipo,
+    _get_standardized_client_info,
+)
+
+# ==============================================================================
+# REFERENCIA: RECORRIDO POR FILAS ORIGINAL
+# ==============================================================================
+
+# Las clasificaciones y el mapa de clientes son los vigentes (reglas.json, client_mapping.json);
+# la limpieza de fechas y cantidades es la original.
+
+def _reference_clean_date(date_value):
+    if isinstance(date_value, datetime):
+        return date_value.strftime('%Y-%m-%d')
+    elif isinstance(date_value, (int, float)):
+        return None
+    elif isinstance(date_value, str):
+        date_value = date_value.strip()
+        for fmt in ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d %b'):
+            try:
+                return datetime.strptime(date_value, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+    return None
+
+def _reference_clean_kilos(kilos_value):
+    if isinstance(kilos_value, (int, float)):
+        return round(float(kilos_value), 2)
+    elif isinstance(kilos_value, str):
+        try:
+            kilos_value = kilos_value.replace(',', '').replace('$', '').strip()
+            return round(float(kilos_value), 2)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+def _reference_clean_and_standardize(raw_data_list):
+    transformed_data = []
+    for row in raw_data_list:
+        fecha_limpia = _reference_clean_date(row.get('FECHA_MOVIMIENTO'))
+        cantidad_limpia = _reference_clean_kilos(row.get('CANTIDAD_MOVIMIENTO'))
+        if fecha_limpia is None or cantidad_limpia == 0.0:
+            continue
+        tipo_mov_bruto = row.get('TIPO_MOVIMIENTO', '')
+        subtipo_mov_bruto = row.get('SUBTIPO_MOVIMIENTO', '')
+        client_name_bruto = row.get('CLIENTE', '')
+        vta_code_limpio = _clean_and_get_vta_code(tipo_mov_bruto)
+        subtipo_code_limpio = _clean_and_get_subtipo_code(subtipo_mov_bruto)
+        cliente_estandar, nit = _get_standardized_client_info(client_name_bruto)
+        final_row = {
+            'FECHA_MOVIMIENTO': fecha_limpia,
+            'CLIENTE': client_name_bruto,
+            'CLIENTE_ESTANDAR': cliente_estandar,
+            'NIT': nit,
+            'TIPO_MOVIMIENTO': tipo_mov_bruto,
+            'TIPO_MOVIMIENTO_LIMPIO': vta_code_limpio,
+            'CLASIFICACION_VTA': _classify_vta(vta_code_limpio),
+            'SUBTIPO_MOVIMIENTO': subtipo_mov_bruto,
+            'SUBTIPO_MOVIMIENTO_LIMPIO': subtipo_code_limpio,
+            'CLASIFICACION_SUBTIPO': _classify_subtipo(subtipo_code_limpio),
+            'CANTIDAD_MOVIMIENTO': cantidad_limpia,
+            'TARIFA': row.get('TARIFA', None),
+            'TOTAL': row.get('TOTAL', None),
+            'OBSERVACIONES': row.get('OBSERVACIONES', ''),
+            'ORIGEN_SECCION': row.get('ORIGEN_SECCION', ''),
+            'ORIGEN_HOJA': row.get('ORIGEN_HOJA', ''),
+            'FUENTE_ARCHIVO': row.get('FUENTE_ARCHIVO', '')
+        }
+        transformed_data.append({k: final_row.get(k, None) for k in COLUMNAS_ESTANDAR})
+    return transformed_data
+
+def _same(a, b):
+    """Igualdad de valores de celda: NaN es igual a NaN, pero no a None."""
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b if a is None or b is None else a == b
+
+def _assert_equivalent(rows):
+    expected = _reference_clean_and_standardize(rows)
+    result = clean_and_standardize(rows)
+    assert len(result) == len(expected)
+    for got, want in zip(result, expected):
+        assert list(got) == list(want)
+        diff = {col: (got[col], want[col]) for col in want if not _same(got[col], want[col])}
+        assert not diff
+
+# ==============================================================================
+# CASOS
+# ==============================================================================
+
+def _row(**values):
+    row = {
+        'FECHA_MOVIMIENTO': '01/03/2024', 'CLIENTE': 'C.I. AGROFRUT S.A.S.',
+        'TIPO_MOVIMIENTO': 'Servicio (VTA019)', 'SUBTIPO_MOVIMIENTO': 'CARGUE',
+        'CANTIDAD_MOVIMIENTO': 10, 'TARIFA': 1500.5, 'TOTAL': 15005.0, 'OBSERVACIONES': 'Nota: x',
+        'ORIGEN_SECCION': 'Servicio (VTA019)', 'ORIGEN_HOJA': 'Hoja1', 'FUENTE_ARCHIVO': 'A.xlsx',
+    }
+    row.update(values)
+    return row
+
+def test_filas_completas():
+    _assert_equivalent([
+        _row(),
+        _row(FECHA_MOVIMIENTO=datetime(2024, 3, 2), CANTIDAD_MOVIMIENTO='$ 1,234.567'),
+        _row(FECHA_MOVIMIENTO='2024-03-03', CANTIDAD_MOVIMIENTO=2.005, SUBTIPO_MOVIMIENTO=' kg cargue '),
+        _row(TIPO_MOVIMIENTO='Ingreso (vta010)', SUBTIPO_MOVIMIENTO='HORAS', CLIENTE='Cliente sin mapa'),
+    ])
+
+def test_claves_ausentes():
+    rows = [_row(), _row(), _row(), _row(), _row()]
+    del rows[0]['OBSERVACIONES'], rows[0]['TARIFA']
+    del rows[1]['CLIENTE'], rows[1]['ORIGEN_HOJA']
+    del rows[2]['TIPO_MOVIMIENTO'], rows[2]['SUBTIPO_MOVIMIENTO'], rows[2]['TOTAL']
+    del rows[3]['FUENTE_ARCHIVO'], rows[3]['ORIGEN_SECCION']
+    del rows[4]['FECHA_MOVIMIENTO']
+    _assert_equivalent(rows)
+
+def test_claves_ausentes_en_todas_las_filas():
+    _assert_equivalent([
+        {'FECHA_MOVIMIENTO': '01/03/2024', 'CANTIDAD_MOVIMIENTO': 5},
+        {'FECHA_MOVIMIENTO': '02/03/2024', 'CANTIDAD_MOVIMIENTO': '7'},
+    ])
+
+@pytest.mark.parametrize('col', ['CLIENTE', 'SUBTIPO_MOVIMIENTO', 'TARIFA', 'TOTAL', 'OBSERVACIONES',
+                                 'ORIGEN_SECCION', 'ORIGEN_HOJA', 'FUENTE_ARCHIVO'])
+@pytest.mark.parametrize('empty', [None, np.nan, ''])
+def test_celdas_vacias(col, empty):
+    _assert_equivalent([_row(**{col: empty}), _row(FECHA_MOVIMIENTO='02/03/2024')])
+
+def test_tipo_movimiento_vacio():
+    # El recorrido original no admite NaN en TIPO_MOVIMIENTO (la extracción siempre lo llena)
+    _assert_equivalent([_row(TIPO_MOVIMIENTO=None), _row(TIPO_MOVIMIENTO='')])
+
+@pytest.mark.parametrize('fecha', [None, np.nan, 45000, 45000.5, 'no es fecha', '', '  01-03-2024 ', '1 Mar'])
+def test_fechas_invalidas_o_en_otros_formatos(fecha):
+    _assert_equivalent([_row(FECHA_MOVIMIENTO=fecha), _row()])
+
+@pytest.mark.parametrize('cantidad', [None, np.nan, 0, 0.0, '0', '', 'abc', '$', 0.004, -3, '-2.5', True])
+def test_cantidades_cero_invalidas_o_vacias(cantidad):
+    _assert_equivalent([_row(CANTIDAD_MOVIMIENTO=cantidad), _row()])
+
+def test_entradas_vacias_y_filtradas():
+    assert clean_and_standardize([]) == []
+    assert clean_and_standardize(None) == []
+    _assert_equivalent([_row(FECHA_MOVIMIENTO=None), _row(CANTIDAD_MOVIMIENTO=0)])
+    assert list(clean_and_standardize_frame(None).columns) == COLUMNAS_ESTANDAR